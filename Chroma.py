@@ -1,31 +1,112 @@
+import argparse
+import hashlib
+import time
+
 import pandas as pd
-import chromadb
-from sentence_transformers import SentenceTransformer
-from chromadb.config import Settings
-
-# Step 1: Load CSV
-df = pd.read_csv("clauses.csv")  # columns: clause_id, clause_type, partnership_type, text
-
-# Step 2: Initialize ChromaDB Client
-chroma_client = chromadb.PersistentClient(path="./clause_chromadb")
-collection = chroma_client.get_or_create_collection(name="clauses")
-
-# Step 3: Embed and Store
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
-
-for index, row in df.iterrows():
-    embedding = embedder.encode(row["text"]).tolist()
-    collection.add(
-        documents=[row["text"]],
-        ids=[str(row["clause_id"])],
-        metadatas=[{
-            "clause_type": row["clause_type"],
-            "partnership_type": row["partnership_type"]
-        }],
-        embeddings=[embedding]
-    )
-
-print("✅ Clauses inserted into ChromaDB.")
+
+from team_optimizer.resources import EMBEDDING_MODEL_NAME, get_embedder, get_chroma_collection
+from team_optimizer.clause_index import INDEX_PATH, build_from_collection
+
+# Usage: python Chroma.py [--csv clauses.csv] [--chunk-size 5000] [--batch-size 256] [--prune]
+#                         [--numpy-index [PATH]]
+#
+# Streams the CSV in chunks, re-embeds only clauses whose content hash changed
+# since the last run, and upserts them in bulk. Safe to re-run. With
+# --numpy-index the synced collection is also exported to the in-process
+# clause index used by MOU_CLAUSE_BACKEND=numpy.
+
+
+def content_hash(text, clause_type, partnership_type) -> str:
+    # The model name is part of the hash so switching models re-embeds everything
+    payload = "\x1f".join([EMBEDDING_MODEL_NAME, text, clause_type, partnership_type])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def ingest(csv_path, chunk_size, batch_size, upsert_size, prune):
+    # Step 1: Initialize ChromaDB collection + embedder
+    collection = get_chroma_collection()
+    embedder = get_embedder()
+
+    seen_ids = set()
+    total_rows = 0
+    embedded_rows = 0
+    start = time.perf_counter()
+
+    # Step 2: Stream the CSV (columns: clause_id, clause_type, partnership_type, text)
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+        chunk = chunk.dropna(subset=["clause_id", "text"])
+        ids = chunk["clause_id"].astype(str).tolist()
+        texts = chunk["text"].astype(str).tolist()
+        clause_types = chunk["clause_type"].astype(str).tolist()
+        partnership_types = chunk["partnership_type"].astype(str).tolist()
+        hashes = list(map(content_hash, texts, clause_types, partnership_types))
+        seen_ids.update(ids)
+        total_rows += len(ids)
+
+        # Step 3: Skip clauses whose stored hash already matches
+        existing = collection.get(ids=ids, include=["metadatas"])
+        stored = {
+            cid: (meta or {}).get("content_hash")
+            for cid, meta in zip(existing["ids"], existing["metadatas"])
+        }
+        changed = [i for i, (cid, h) in enumerate(zip(ids, hashes)) if stored.get(cid) != h]
+        if not changed:
+            continue
+
+        # Step 4: Embed all changed clauses in batches (normalized for cosine search)
+        embeddings = embedder.encode(
+            [texts[i] for i in changed],
+            batch_size=batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+
+        # Step 5: Bulk upsert
+        for offset in range(0, len(changed), upsert_size):
+            part = changed[offset:offset + upsert_size]
+            collection.upsert(
+                ids=[ids[i] for i in part],
+                documents=[texts[i] for i in part],
+                metadatas=[{
+                    "clause_type": clause_types[i],
+                    "partnership_type": partnership_types[i],
+                    "content_hash": hashes[i],
+                } for i in part],
+                embeddings=embeddings[offset:offset + len(part)].tolist(),
+            )
+        embedded_rows += len(changed)
+
+    # Step 6: Optionally drop clauses that are no longer in the CSV
+    removed = 0
+    if prune:
+        stale = [cid for cid in collection.get(include=[])["ids"] if cid not in seen_ids]
+        for offset in range(0, len(stale), upsert_size):
+            collection.delete(ids=stale[offset:offset + upsert_size])
+        removed = len(stale)
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Clauses synced into ChromaDB: {total_rows} rows read, "
+          f"{embedded_rows} embedded, {total_rows - embedded_rows} unchanged, {removed} pruned.")
+    print(f"⏱️ {elapsed:.2f}s — {total_rows / elapsed if elapsed else 0:.1f} rows/sec")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest clauses.csv into ChromaDB")
+    parser.add_argument("--csv", default="clauses.csv")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="CSV rows read per chunk")
+    parser.add_argument("--batch-size", type=int, default=256, help="texts per embedder forward pass")
+    parser.add_argument("--upsert-size", type=int, default=1000, help="records per Chroma upsert")
+    parser.add_argument("--prune", action="store_true", help="delete clauses missing from the CSV")
+    parser.add_argument("--numpy-index", nargs="?", const=INDEX_PATH, metavar="PATH",
+                        help="also export the collection to the numpy clause index")
+    args = parser.parse_args()
+
+    ingest(args.csv, args.chunk_size, args.batch_size, args.upsert_size, args.prune)
+
+    if args.numpy_index:
+        count = build_from_collection(get_chroma_collection(), args.numpy_index)
+        print(f"✅ Exported {count} clauses to numpy index at {args.numpy_index}")
 
 # # test_chroma.py
 
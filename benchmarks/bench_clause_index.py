@@ -0,0 +1,89 @@
+# bench_clause_index.py
+#
+# p50/p99 clause query latency: Chroma PersistentClient vs the in-process numpy
+# index (MOU_CLAUSE_BACKEND=numpy), unfiltered and with the partnership filter.
+#
+#   python -m benchmarks.bench_clause_index                   # real collection + ./clause_index
+#   python -m benchmarks.bench_clause_index --synthetic 20000 # random corpus, both backends
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from team_optimizer.clause_index import INDEX_PATH, NumpyClauseIndex, write_index
+from team_optimizer.clause_retrieval import build_where
+
+CLAUSE_TYPES = ["Confidentiality", "Termination", "Governing Law", "Intellectual Property", "Liability"]
+PARTNERSHIP_TYPES = ["All", "Internship", "Research"]
+
+
+def synthetic_backends(size, dim):
+    import chromadb
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((size, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    ids = [str(i) for i in range(size)]
+    documents = [f"Synthetic clause {i}" for i in range(size)]
+    metadatas = [{
+        "clause_type": CLAUSE_TYPES[i % len(CLAUSE_TYPES)],
+        "partnership_type": PARTNERSHIP_TYPES[i % len(PARTNERSHIP_TYPES)],
+    } for i in range(size)]
+
+    collection = chromadb.EphemeralClient().get_or_create_collection(name="bench_clauses")
+    for offset in range(0, size, 5000):
+        collection.add(
+            ids=ids[offset:offset + 5000],
+            documents=documents[offset:offset + 5000],
+            metadatas=metadatas[offset:offset + 5000],
+            embeddings=embeddings[offset:offset + 5000].tolist(),
+        )
+
+    index_dir = tempfile.mkdtemp(prefix="clause_index_")
+    write_index(index_dir, ids, documents, metadatas, embeddings)
+    return collection, NumpyClauseIndex(index_dir), dim
+
+
+def real_backends(index_path):
+    from team_optimizer.resources import get_chroma_collection
+
+    index = NumpyClauseIndex(index_path)
+    return get_chroma_collection(), index, index.embeddings.shape[1]
+
+
+def measure(backend, queries, n_results, where):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.query(query_embeddings=[query.tolist()], n_results=n_results,
+                      include=["documents", "metadatas", "distances"], **({"where": where} if where else {}))
+        samples.append(time.perf_counter() - start)
+    samples = np.array(samples) * 1e3
+    return np.percentile(samples, 50), np.percentile(samples, 99)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, help="size of a random corpus to build for both backends")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        chroma, numpy_index, dim = synthetic_backends(args.synthetic, args.dim)
+    else:
+        chroma, numpy_index, dim = real_backends(args.index)
+
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((args.queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"⏱️ {numpy_index.count()} clauses, {args.queries} queries, top-{args.k}")
+    for label, where in [("unfiltered", None), ("partnership filter", build_where("Internship"))]:
+        for name, backend in [("chroma", chroma), ("numpy", numpy_index)]:
+            p50, p99 = measure(backend, queries, args.k, where)
+            print(f"{name:<7} {label:<20} p50={p50:8.3f} ms   p99={p99:8.3f} ms")
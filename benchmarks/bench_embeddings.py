@@ -0,0 +1,273 @@
+# bench_embeddings.py
+#
+# Equivalence check and latency / memory benchmark of the embedding backends
+# (MOU_EMBEDDING_BACKEND: torch, onnx, server, fake) on the same texts:
+#   equivalence  cosine similarity of each vector to the reference backend's
+#                (the first one listed), and overlap of the top-k nearest
+#                clauses; below --min-cosine / --min-recall exits with status 1
+#   latency      p50/p95/p99 of single-text and batched encodes, and
+#                throughput with --clients threads encoding one text at a time
+#   memory       RSS of the embedding worker; for "server" also of the server
+#
+# Each backend runs in its own subprocess so their memory is not mixed up.
+# The "server" backend is served by a subprocess running --server-backend.
+#
+#   python -m benchmarks.bench_embeddings
+#   python -m benchmarks.bench_embeddings --backends torch,onnx,server --server-backend onnx
+#   python -m benchmarks.bench_embeddings --backends fake,server --server-backend fake   # no model needed
+#
+# onnx needs an export first: python manage.py export_onnx_embedder
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmarks.bench_pipeline import summarize, report, max_rss_mb
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. TEXTS & MEASUREMENT
+# ──────────────────────────────────────────────────────────────────────────────
+
+def load_texts(csv_path: str, count: int, seed: int = 0) -> list:
+    """Clause texts from the CSV, varied into `count` distinct MoU-like sentences."""
+    with open(csv_path, newline="", encoding="utf-8") as fh:
+        clauses = [row["text"] for row in csv.DictReader(fh) if row.get("text")]
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        picked = rng.sample(clauses, k=min(len(clauses), 1 + i % 3))
+        texts.append(f"{' '.join(picked)} This applies to partner organisation {i} from {2020 + i % 7}.")
+    return texts
+
+
+def rss_mb(pid="self") -> float:
+    with open(f"/proc/{pid}/status") as fh:
+        for line in fh:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def wait_for_socket(path: str, proc, timeout: float = 300):
+    from multiprocessing.connection import Client
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit("❌ embedding server exited during start-up")
+        try:
+            Client(path, family="AF_UNIX").close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f"❌ embedding server not listening on {path} after {timeout}s")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. SUBPROCESSES
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run_worker(backend: str, args):
+    """One backend, in this (fresh) process: writes vectors to --out, prints stats as JSON."""
+    from team_optimizer.resources import make_embedder
+
+    with open(args.texts_file) as fh:
+        texts = json.load(fh)
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    embedder = make_embedder(backend)
+    embedder.encode("warm-up")
+    load_seconds = time.perf_counter() - start
+    loaded = rss_mb()
+
+    single = []
+    for text in texts[:args.single]:
+        start = time.perf_counter()
+        embedder.encode([text], normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False)
+        single.append(time.perf_counter() - start)
+
+    batches, vectors = [], []
+    for offset in range(0, len(texts), args.batch_size):
+        start = time.perf_counter()
+        vectors.append(np.asarray(embedder.encode(
+            texts[offset:offset + args.batch_size],
+            normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False,
+        ), dtype=np.float32))
+        batches.append(time.perf_counter() - start)
+    np.save(args.out, np.concatenate(vectors))
+
+    # Concurrent single-text requests: what several request threads see
+    # (and what the server's micro-batching is for)
+    concurrent_texts = texts[:args.single * args.clients]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        list(pool.map(lambda text: embedder.encode([text], normalize_embeddings=True, convert_to_numpy=True,
+                                                   show_progress_bar=False), concurrent_texts))
+    concurrent_wall = time.perf_counter() - start
+
+    print(json.dumps({
+        "load_seconds": round(load_seconds, 3),
+        "rss_baseline_mb": round(baseline, 1),
+        "rss_loaded_mb": round(loaded, 1),
+        "rss_peak_mb": round(max_rss_mb(), 1),
+        "single": summarize(single),
+        "batch": summarize(batches),
+        "batch_texts_per_s": round(len(texts) / sum(batches), 1) if batches else 0.0,
+        "concurrent_texts_per_s": round(len(concurrent_texts) / concurrent_wall, 1) if concurrent_wall else 0.0,
+    }))
+
+
+def run_server(backend: str, args):
+    from team_optimizer.resources import make_embedder
+    from team_optimizer.embedding_server import EmbeddingServer
+
+    embedder = make_embedder(backend)
+    embedder.encode("warm-up")
+    EmbeddingServer(embedder, args.socket, args.max_batch, args.max_wait_ms).serve_forever()
+
+
+def bench_backend(backend: str, args, workdir: str) -> dict:
+    env = dict(os.environ)
+    server = None
+    if backend == "server":
+        socket_path = os.path.join(workdir, "embedder.sock")
+        env.update(MOU_EMBED_SERVER_SOCKET=socket_path, MOU_EMBEDDING_SERVER_BACKEND=args.server_backend)
+        server = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.bench_embeddings", "--serve", args.server_backend,
+            "--socket", socket_path, "--max-batch", str(args.max_batch), "--max-wait-ms", str(args.max_wait_ms),
+        ], env=env)
+        wait_for_socket(socket_path, server)
+
+    out = os.path.join(workdir, f"{backend}.npy")
+    try:
+        proc = subprocess.run([
+            sys.executable, "-m", "benchmarks.bench_embeddings", "--worker", backend,
+            "--texts-file", os.path.join(workdir, "texts.json"), "--out", out,
+            "--single", str(args.single), "--batch-size", str(args.batch_size), "--clients", str(args.clients),
+        ], env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.stderr.write(proc.stderr)
+            raise SystemExit(f"❌ {backend} backend failed")
+        stats = json.loads(proc.stdout.strip().splitlines()[-1])
+        if server is not None:
+            stats["server_rss_mb"] = round(rss_mb(server.pid), 1)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    stats["vectors"] = np.load(out)
+    return stats
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. EQUIVALENCE
+# ──────────────────────────────────────────────────────────────────────────────
+
+def compare(reference: np.ndarray, vectors: np.ndarray, queries: int, k: int) -> dict:
+    """Per-text cosine to the reference, and recall@k of each query's nearest texts."""
+    cosine = np.sum(reference * vectors, axis=1) / np.clip(
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1), 1e-12, None
+    )
+
+    # Queries are the first texts; their neighbours are searched among the rest
+    corpus = slice(queries, None)
+    expected = np.argsort(-(reference[:queries] @ reference[corpus].T), axis=1)[:, :k]
+    found = np.argsort(-(vectors[:queries] @ vectors[corpus].T), axis=1)[:, :k]
+    recall = np.mean([len(set(e) & set(f)) / k for e, f in zip(expected, found)])
+
+    return {
+        "cosine_min": round(float(cosine.min()), 5),
+        "cosine_mean": round(float(cosine.mean()), 5),
+        f"recall_at_{k}": round(float(recall), 4),
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 4. MAIN
+# ──────────────────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default="torch,onnx,server",
+                        help="comma-separated; the first is the reference for equivalence")
+    parser.add_argument("--server-backend", default="onnx", choices=["torch", "onnx", "fake"],
+                        help="what the server runs for the 'server' backend")
+    parser.add_argument("--csv", default="clauses.csv")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=100, help="texts used as queries for recall@k")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--single", type=int, default=100, help="single-text encodes timed")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=8, help="threads for the concurrent measurement")
+    parser.add_argument("--max-batch", type=int, default=64, help="server micro-batch size")
+    parser.add_argument("--max-wait-ms", type=float, default=2)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--min-recall", type=float, default=0.8)
+    parser.add_argument("--json", help="append a JSON summary line to this file")
+    # Internal: subprocess modes
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--texts-file", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    parser.add_argument("--socket", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args)
+        sys.exit(0)
+    if args.serve:
+        run_server(args.serve, args)
+        sys.exit(0)
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    workdir = tempfile.mkdtemp(prefix="mou_embed_bench_")
+    texts = load_texts(args.csv, args.texts)
+    with open(os.path.join(workdir, "texts.json"), "w") as fh:
+        json.dump(texts, fh)
+
+    print(f"⏱️ Embedding backends on {len(texts)} texts: {', '.join(backends)} "
+          f"(reference {backends[0]}, server runs {args.server_backend})")
+    results, failed = {}, False
+    for backend in backends:
+        stats = bench_backend(backend, args, workdir)
+        vectors = stats.pop("vectors")
+        if backend == backends[0]:
+            reference = vectors
+        stats["equivalence"] = compare(reference, vectors, args.queries, args.k)
+        results[backend] = stats
+
+        memory = f"RSS {stats['rss_loaded_mb']:.0f} MB loaded, {stats['rss_peak_mb']:.0f} MB peak"
+        if "server_rss_mb" in stats:
+            memory += f" (+ server {stats['server_rss_mb']:.0f} MB)"
+        print(f"\n🧠 {backend}: loaded in {stats['load_seconds']:.2f}s, {memory}")
+        report("single text", stats["single"])
+        report(f"batch of {args.batch_size}", stats["batch"], f"{stats['batch_texts_per_s']:.0f} texts/s")
+        print(f"  {args.clients} concurrent clients            {stats['concurrent_texts_per_s']:.0f} texts/s")
+
+        eq = stats["equivalence"]
+        ok = eq["cosine_min"] >= args.min_cosine and eq[f"recall_at_{args.k}"] >= args.min_recall
+        failed |= not ok
+        print(f"  {'✅' if ok else '❌'} vs {backends[0]}: cosine min {eq['cosine_min']:.4f} / mean "
+              f"{eq['cosine_mean']:.4f}, recall@{args.k} {eq[f'recall_at_{args.k}']:.3f}")
+
+    if args.json:
+        with open(args.json, "a") as fh:
+            fh.write(json.dumps({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "args": vars(args),
+                "results": results,
+            }) + "\n")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,38 @@
+# bench_graph_compile.py
+#
+# Per-request graph overhead: rebuilding + compiling the StateGraph on every
+# POST (old behaviour) versus reusing the process-wide compiled graph.
+#
+#   python -m benchmarks.bench_graph_compile [iterations]
+
+import sys
+import time
+import statistics
+
+from team_optimizer.langgraph_flow import build_graph, get_graph
+
+
+def measure(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p50 = statistics.median(samples) * 1e3
+    p99 = samples[int(len(samples) * 0.99) - 1] * 1e3
+    print(f"{label:<28} p50={p50:9.4f} ms   p99={p99:9.4f} ms   total={sum(samples):.3f} s")
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    get_graph()  # first build is a one-off startup cost, not per request
+
+    print(f"⏱️ Graph overhead per request over {iterations} iterations")
+    report("build_graph() per request", measure(build_graph, iterations))
+    report("get_graph() singleton", measure(get_graph, iterations))
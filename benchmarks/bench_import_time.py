@@ -0,0 +1,68 @@
+# bench_import_time.py
+#
+# Startup cost of importing the MoU pipeline, from `python -X importtime`.
+# Prints wall time plus the slowest imports by cumulative time, and can append
+# a JSON line per run so the numbers can be tracked over time.
+#
+#   python -m benchmarks.bench_import_time [--module M] [--top N] [--json FILE]
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+
+def run_importtime(module):
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f"❌ importing {module} failed")
+
+    # Lines look like: "import time:       123 |       4567 |   package.module"
+    # where extra indentation of the name marks a nested import.
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+
+    return wall, imports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--module", default="team_optimizer.langgraph_flow")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="append a JSON summary line to this file")
+    args = parser.parse_args()
+
+    wall, imports = run_importtime(args.module)
+    total_us = sum(cumulative for _, _, cumulative, depth in imports if depth == 1)
+
+    print(f"⏱️ import {args.module}: wall {wall:.3f}s, import time {total_us / 1e6:.3f}s")
+    print(f"{'cumulative ms':>14}  {'self ms':>9}  module")
+    for name, self_us, cumulative_us, _ in sorted(imports, key=lambda e: e[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1e3:14.1f}  {self_us / 1e3:9.1f}  {name}")
+
+    if args.json:
+        with open(args.json, "a") as fh:
+            fh.write(json.dumps({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "module": args.module,
+                "wall_seconds": round(wall, 4),
+                "import_seconds": round(total_us / 1e6, 4),
+                "slowest": [
+                    {"module": name, "cumulative_ms": round(c / 1e3, 1)}
+                    for name, _, c, _ in sorted(imports, key=lambda e: e[2], reverse=True)[:args.top]
+                ],
+            }) + "\n")
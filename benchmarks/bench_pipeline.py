@@ -0,0 +1,491 @@
+# bench_pipeline.py
+#
+# End-to-end benchmark / load test of the MoU pipeline, with no Gemini, Atlas
+# or Gmail involved. It uses:
+#   - the deterministic fake LLM (MOU_FAKE_LLM) with configurable latency
+#   - the hashing fake embedder (MOU_FAKE_EMBEDDER)
+#   - an in-memory Mongo (mongomock) behind mongo.get_client()
+#   - a local SMTP sink (aiosmtpd) that the outbox dispatcher delivers to
+#   - a synthetic clause corpus of configurable size, served by the numpy index
+#
+# It reports throughput, p50/p95/p99 latency and memory for four things:
+#   stages     each node function called directly, in pipeline order
+#   graph      whole workflows through build_graph(), N at a time (per node too)
+#   endpoints  /generate-draft/ -> park -> /approvals/ + /update-approval/ -> resume
+#   bulk       /generate-draft/bulk/ drafts per second at several batch sizes
+#
+#   python -m benchmarks.bench_pipeline
+#   python -m benchmarks.bench_pipeline --workflows 200 --concurrency 16 --clauses 20000
+#   python -m benchmarks.bench_pipeline --llm-first-token 0.5 --only graph --json bench.jsonl
+#   python -m benchmarks.bench_pipeline --only bulk --bulk-sizes 1,10,100
+#
+# mongomock and aiosmtpd are benchmark-only dependencies (pip install mongomock aiosmtpd).
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import resource
+import tempfile
+import threading
+import tracemalloc
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+CLAUSE_TYPES = ["Confidentiality", "Termination", "Governing Law", "Intellectual Property", "Liability"]
+PARTNERSHIP_TYPES = ["All", "Internship", "Research"]
+VOCABULARY = ["party", "shall", "agreement", "confidential", "term", "scope", "objective", "notice",
+              "collaboration", "obligation", "law", "intellectual", "property", "termination", "liability"]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. ENVIRONMENT (must be set before team_optimizer is imported)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_env(args, workdir: str, smtp_port: int):
+    os.environ.update({
+        "MOU_FAKE_LLM": "1",
+        "MOU_FAKE_LLM_FIRST_TOKEN_SECONDS": str(args.llm_first_token),
+        "MOU_FAKE_LLM_TOKEN_SECONDS": str(args.llm_token),
+        "MOU_FAKE_EMBEDDER": "1",
+        "MOU_FAKE_EMBEDDER_BATCH_SECONDS": str(args.embed_batch),
+        "MOU_FAKE_EMBEDDER_TEXT_SECONDS": str(args.embed_text),
+        "MOU_CLAUSE_BACKEND": "numpy",
+        "MOU_CLAUSE_INDEX_PATH": os.path.join(workdir, "clause_index"),
+        "MOU_EMBED_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite3"),
+        "MOU_PDF_STORE_PATH": os.path.join(workdir, "pdf_artifacts"),
+        "MOU_LLM_CACHE_TTL_SECONDS": "0",  # every workflow pays for its own draft
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_USE_SSL": "0",
+        "SMTP_STARTTLS": "0",
+        "GMAIL_APP_PWD": "",
+        "SMTP_MAX_PER_SECOND": "10000",
+        "MOU_OUTBOX_INPROCESS": "1",
+        "MOU_CHECKPOINTER": "mongo",
+        "MOU_PARK_AFTER_SECONDS": "0",  # endpoint runs park as soon as approvals are pending
+        "MOU_JOB_WAKER_POLL_SECONDS": "0.2",
+        "MOU_REMINDER_SCHEDULE": "86400",
+        "DJANGO_SETTINGS_MODULE": "backend.settings",
+    })
+
+
+class SmtpSink:
+    """Accepts and counts every message (aiosmtpd on a local port)."""
+
+    def __init__(self, port: int):
+        from aiosmtpd.controller import Controller
+
+        self.received = 0
+        self._lock = threading.Lock()
+        self.controller = Controller(self, hostname="127.0.0.1", port=port)
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.received += 1
+        return "250 Message accepted"
+
+    def start(self):
+        self.controller.start()
+
+    def stop(self):
+        self.controller.stop()
+
+
+def use_in_memory_mongo():
+    import mongomock
+    from team_optimizer import mongo
+
+    client = mongomock.MongoClient()
+    mongo.get_client = lambda: client
+    return client[mongo.MONGO_DB_NAME]
+
+
+def setup_django():
+    # Once per process: setup_test_environment() refuses to run twice
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()  # allows the test client's "testserver" host
+
+
+def build_synthetic_corpus(size: int, seed: int = 0):
+    import numpy as np
+    from team_optimizer.clause_index import INDEX_PATH, write_index
+    from team_optimizer.fakes import FakeEmbedder
+
+    rng = np.random.default_rng(seed)
+    documents = []
+    metadatas = []
+    for i in range(size):
+        clause_type = CLAUSE_TYPES[i % len(CLAUSE_TYPES)]
+        words = rng.choice(VOCABULARY, size=40)
+        documents.append(f"{clause_type} clause {i}: " + " ".join(words) + ".")
+        metadatas.append({
+            "clause_type": clause_type,
+            "partnership_type": PARTNERSHIP_TYPES[i % len(PARTNERSHIP_TYPES)],
+        })
+
+    # Built with a zero-latency embedder: corpus setup is not what we measure
+    embeddings = FakeEmbedder(batch_latency=0, text_latency=0).encode(documents, normalize_embeddings=True)
+    write_index(INDEX_PATH, [str(i) for i in range(size)], documents, metadatas, embeddings)
+
+
+def seed_stakeholders(db, count: int):
+    db.stakeholders.insert_many([{"name": f"Stakeholder {i}", "email": f"s{i}@bench.local"} for i in range(count)])
+    db.approvals.insert_many([{"email": f"s{i}@bench.local", "status": "Pending"} for i in range(count)])
+
+
+def set_all_approvals(db, status: str):
+    db.approvals.update_many({}, {"$set": {"status": status}})
+
+
+def form(i: int, companies: int) -> dict:
+    # Companies repeat so version chains (and diffs) grow; the objective keeps
+    # every prompt distinct
+    return {
+        "company_name": f"Bench Company {i % companies}",
+        "partnership_type": PARTNERSHIP_TYPES[i % len(PARTNERSHIP_TYPES)],
+        "objective": f"Joint research programme number {i}",
+        "scope": "Student internships, shared labs and co-authored publications",
+        "mou_date": "2026-01-01",
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. MEASUREMENT HELPERS
+# ──────────────────────────────────────────────────────────────────────────────
+
+@contextlib.contextmanager
+def quiet(verbose: bool):
+    # The pipeline logs every step; keep the report readable
+    if verbose:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, int(round(q / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples) -> dict:
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1e3, 3),
+        "p95_ms": round(percentile(samples, 95) * 1e3, 3),
+        "p99_ms": round(percentile(samples, 99) * 1e3, 3),
+        "max_ms": round(samples[-1] * 1e3, 3) if samples else 0.0,
+    }
+
+
+def report(label, stats, extra=""):
+    print(f"  {label:<28} n={stats['n']:<5} p50={stats['p50_ms']:9.2f} ms  p95={stats['p95_ms']:9.2f} ms  "
+          f"p99={stats['p99_ms']:9.2f} ms  {extra}")
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. SCENARIOS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def stage_functions():
+    from team_optimizer import langgraph_flow as flow
+
+    return [
+        ("drafting", flow.draft_mou),
+        ("persist_draft", flow.persist_draft),
+        ("clause_retrieval", flow.retrieve_clauses),
+        ("prefetch", flow.prefetch_resources),
+        ("communication", flow.communication_agent),
+        ("approval_tracker", flow.approval_tracker_agent),
+        ("version_controller", flow.version_controller_agent),
+    ]
+
+
+def run_stages_once(i, args, samples=None, memory=None):
+    state = {**form(i, args.companies), "workflow_id": f"stage-{i}-{time.time_ns()}"}
+    for name, stage in stage_functions():
+        if memory is not None:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        update = stage(state) or {}
+        seconds = time.perf_counter() - start
+        if samples is not None:
+            samples.setdefault(name, []).append(seconds)
+        if memory is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            memory.setdefault(name, []).append((peak - before, current - before))
+        state.update(update)
+
+
+def bench_stages(db, args) -> dict:
+    """Each node function in pipeline order, one workflow at a time."""
+    set_all_approvals(db, "Approved")  # the tracker returns as soon as it has read them
+    samples = {}
+    memory = {}
+    with quiet(args.verbose):
+        run_stages_once(-1, args)  # first call pays for lazy resources
+        for i in range(args.stage_iterations):
+            run_stages_once(i, args, samples=samples)
+
+        # Separate pass: tracemalloc slows allocation-heavy code down a lot
+        tracemalloc.start()
+        for i in range(args.memory_iterations):
+            run_stages_once(args.stage_iterations + i, args, memory=memory)
+        tracemalloc.stop()
+
+    result = {}
+    print(f"\n🔬 Stages ({args.stage_iterations} sequential runs; memory over {args.memory_iterations})")
+    for name, _ in stage_functions():
+        stats = summarize(samples.get(name, []))
+        peaks = [peak for peak, _ in memory.get(name, [])] or [0]
+        retained = [kept for _, kept in memory.get(name, [])] or [0]
+        stats["peak_alloc_kb"] = round(max(peaks) / 1024, 1)
+        stats["retained_kb"] = round(sum(retained) / len(retained) / 1024, 1)
+        report(name, stats, f"peak alloc={stats['peak_alloc_kb']:8.1f} KB  retained={stats['retained_kb']:7.1f} KB")
+        result[name] = stats
+    return result
+
+
+def bench_graph(db, args) -> dict:
+    """Whole workflows through a freshly built graph, `concurrency` at a time."""
+    from team_optimizer.langgraph_flow import build_graph
+
+    set_all_approvals(db, "Approved")
+    graph = build_graph()
+    latencies = []
+    node_samples = {}
+    lock = threading.Lock()
+
+    def run(i):
+        workflow_id = f"graph-{i}-{time.time_ns()}"
+        config = {"configurable": {"thread_id": workflow_id}}
+        start = time.perf_counter()
+        state = graph.invoke({**form(i, args.companies), "workflow_id": workflow_id}, config)
+        seconds = time.perf_counter() - start
+        if graph.checkpointer is not None:
+            graph.checkpointer.delete_thread(workflow_id)
+        with lock:
+            latencies.append(seconds)
+            for node, node_seconds in (state.get("node_timings") or {}).items():
+                node_samples.setdefault(node, []).append(node_seconds)
+
+    with quiet(args.verbose):
+        run(-1)  # warm-up
+        latencies.clear()
+        node_samples.clear()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(run, range(args.workflows)))
+        wall = time.perf_counter() - start
+
+    throughput = args.workflows / wall if wall else 0.0
+    print(f"\n🕸️ Graph ({args.workflows} workflows, concurrency {args.concurrency}): "
+          f"{throughput:.2f} workflows/s, max RSS {max_rss_mb():.1f} MB")
+    result = {"throughput_per_s": round(throughput, 3), "workflow": summarize(latencies), "nodes": {}}
+    report("workflow (end to end)", result["workflow"])
+    for node, samples in sorted(node_samples.items(), key=lambda item: -sum(item[1])):
+        result["nodes"][node] = summarize(samples)
+        report(f"node {node}", result["nodes"][node])
+    return result
+
+
+def bench_endpoints(db, args) -> dict:
+    """HTTP flow through Django's test client: submit, park, approve, resume."""
+    from django.test import Client
+
+    samples = {}
+    lock = threading.Lock()
+
+    def timed_request(label, method, *call_args, **kwargs):
+        client = Client()
+        start = time.perf_counter()
+        response = getattr(client, method)(*call_args, **kwargs)
+        with lock:
+            samples.setdefault(label, []).append(time.perf_counter() - start)
+        return response
+
+    def wait_for(job_ids, statuses, timeout=120):
+        pending = set(job_ids)
+        deadline = time.monotonic() + timeout
+        while pending and time.monotonic() < deadline:
+            for job_id in list(pending):
+                status = timed_request("GET /api/jobs/<id>/", "get", f"/api/jobs/{job_id}/").json()["status"]
+                if status in statuses:
+                    pending.discard(job_id)
+                elif status == "failed":
+                    raise RuntimeError(f"job {job_id} failed")
+            time.sleep(0.02)
+        if pending:
+            raise TimeoutError(f"{len(pending)} jobs not {statuses} after {timeout}s")
+
+    def submit(i):
+        response = timed_request(
+            "POST /api/generate-draft/", "post", "/api/generate-draft/",
+            data=json.dumps(form(i, args.companies)), content_type="application/json",
+        )
+        return response.json()["job_id"]
+
+    flow = []
+    start = time.perf_counter()
+    with quiet(args.verbose), ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for offset in range(0, args.workflows, args.concurrency):
+            set_all_approvals(db, "Pending")
+            batch = range(offset, min(offset + args.concurrency, args.workflows))
+            job_ids = list(pool.map(submit, batch))
+            wait_for(job_ids, {"waiting"})
+
+            approvals = timed_request("GET /api/approvals/", "get", "/api/approvals/").json()["approvals"]
+            approved_at = time.perf_counter()
+            for approval in approvals:
+                timed_request(
+                    "POST /api/update-approval/", "post", "/api/update-approval/",
+                    data=json.dumps({"email": approval["email"], "status": "Approved"}),
+                    content_type="application/json",
+                )
+            wait_for(job_ids, {"succeeded"})
+            flow.append(time.perf_counter() - approved_at)
+    wall = time.perf_counter() - start
+
+    throughput = args.workflows / wall if wall else 0.0
+    print(f"\n🌐 Endpoints ({args.workflows} workflows, batches of {args.concurrency}): "
+          f"{throughput:.2f} workflows/s, max RSS {max_rss_mb():.1f} MB")
+    result = {"throughput_per_s": round(throughput, 3), "requests": {}}
+    for label, values in samples.items():
+        result["requests"][label] = summarize(values)
+        report(label, result["requests"][label])
+    result["approve_to_done"] = summarize(flow)
+    report("approve -> batch done", result["approve_to_done"])
+    return result
+
+
+def bench_bulk(db, args) -> dict:
+    """/generate-draft/bulk/: the same drafts sent in batches of each size in --bulk-sizes."""
+    from django.test import Client
+
+    total = args.workflows
+    print(f"\n📦 Bulk ({total} drafts per batch size)")
+    result = {}
+    for size in args.bulk_sizes:
+        samples, errors = [], 0
+        start = time.perf_counter()
+        with quiet(args.verbose):
+            for offset in range(0, total, size):
+                # Distinct objectives per run, so the LLM cache never answers
+                items = [form(i, args.companies) | {"objective": f"Bulk {size} programme {i}"}
+                         for i in range(offset, min(offset + size, total))]
+                request_start = time.perf_counter()
+                response = Client().post("/api/generate-draft/bulk/", data=json.dumps({"items": items}),
+                                         content_type="application/json")
+                lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+                samples.append(time.perf_counter() - request_start)
+                errors += sum(line["status"] != "ok" for line in lines)
+        wall = time.perf_counter() - start
+
+        throughput = total / wall if wall else 0.0
+        result[str(size)] = {"drafts_per_s": round(throughput, 3), "errors": errors, "request": summarize(samples)}
+        report(f"batch of {size}", result[str(size)]["request"], f"{throughput:8.2f} drafts/s, {errors} errors")
+    return result
+
+
+def wait_for_outbox(db, sink, timeout=30) -> dict:
+    """Lets the dispatcher drain, then compares the sink with the outbox."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and db.outbox.count_documents({"status": {"$in": ["pending", "sending"]}}):
+        time.sleep(0.1)
+    result = {
+        "queued": db.outbox.count_documents({}),
+        "sent": db.outbox.count_documents({"status": "sent"}),
+        "received_by_sink": sink.received,
+    }
+    return result
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 4. MAIN
+# ──────────────────────────────────────────────────────────────────────────────
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workflows", type=int, default=50, help="workflows per graph / endpoint run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stage-iterations", type=int, default=30)
+    parser.add_argument("--memory-iterations", type=int, default=5)
+    parser.add_argument("--clauses", type=int, default=5000, help="synthetic clause corpus size")
+    parser.add_argument("--stakeholders", type=int, default=3)
+    parser.add_argument("--companies", type=int, default=10)
+    parser.add_argument("--llm-first-token", type=float, default=0.2, help="fake Gemini seconds to first token")
+    parser.add_argument("--llm-token", type=float, default=0.002, help="fake Gemini seconds per word")
+    parser.add_argument("--embed-batch", type=float, default=0.002, help="fake embedder seconds per batch")
+    parser.add_argument("--embed-text", type=float, default=0.001, help="fake embedder seconds per text")
+    parser.add_argument("--bulk-sizes", type=lambda v: [int(x) for x in v.split(",")], default=[1, 10, 50],
+                        help="comma-separated batch sizes for the bulk scenario")
+    parser.add_argument("--only", choices=["stages", "graph", "endpoints", "bulk"], action="append",
+                        help="run only these scenarios (repeatable)")
+    parser.add_argument("--json", help="append a JSON summary line to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own logging")
+    args = parser.parse_args()
+    scenarios = args.only or ["stages", "graph", "endpoints", "bulk"]
+
+    workdir = tempfile.mkdtemp(prefix="mou_bench_")
+    smtp_port = _free_port()
+    configure_env(args, workdir, smtp_port)
+
+    sink = SmtpSink(smtp_port)
+    sink.start()
+    db = use_in_memory_mongo()
+    seed_stakeholders(db, args.stakeholders)
+
+    setup_start = time.perf_counter()
+    build_synthetic_corpus(args.clauses)
+    print(f"⏱️ MoU pipeline benchmark: {args.clauses} synthetic clauses, {args.stakeholders} stakeholders, "
+          f"fake LLM {args.llm_first_token}s + {args.llm_token}s/word (setup {time.perf_counter() - setup_start:.2f}s)")
+
+    results = {}
+    if "stages" in scenarios:
+        results["stages"] = bench_stages(db, args)
+    if "graph" in scenarios:
+        results["graph"] = bench_graph(db, args)
+    if "endpoints" in scenarios or "bulk" in scenarios:
+        setup_django()
+    if "endpoints" in scenarios:
+        results["endpoints"] = bench_endpoints(db, args)
+    if "bulk" in scenarios:
+        results["bulk"] = bench_bulk(db, args)
+    with quiet(args.verbose):
+        results["smtp"] = wait_for_outbox(db, sink)
+    print(f"\n📬 SMTP sink: {results['smtp']['received_by_sink']} received, "
+          f"outbox {results['smtp']['sent']}/{results['smtp']['queued']} sent")
+    results["max_rss_mb"] = round(max_rss_mb(), 1)
+    print(f"💾 Max RSS: {results['max_rss_mb']} MB")
+    sink.stop()
+
+    if args.json:
+        with open(args.json, "a") as fh:
+            fh.write(json.dumps({
+                "at": datetime.now(timezone.utc).isoformat(),
+                "args": vars(args),
+                "results": results,
+            }) + "\n")
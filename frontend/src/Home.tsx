@@ -1,5 +1,4 @@
 import { useState } from 'react'
-import axios from 'axios'
 
 export default function Home() {
   const [form, setForm] = useState({
@@ -18,6 +17,8 @@ export default function Home() {
   const [overallStatus, setOverallStatus] = useState('')
   const [versionNumber, setVersionNumber] = useState('')
   const [versionDiff, setVersionDiff] = useState('')
+  const [currentNode, setCurrentNode] = useState('')
+  const [pdfUrl, setPdfUrl] = useState('')
 
   const handleChange = (e) => {
     setForm({ ...form, [e.target.name]: e.target.value })
@@ -31,18 +32,64 @@ export default function Home() {
     </div>
   )
 
+  // Applies the fields a finished node (or the whole run) reported
+  const applyResult = (result) => {
+    if (result.draft_text !== undefined) setDraft(result.draft_text || '')
+    if (result.retrieved_clauses !== undefined) setClauses(result.retrieved_clauses || [])
+    if (result.emails_sent !== undefined) setEmailsSent(result.emails_sent || [])
+    if (result.approval_status !== undefined) setApprovalStatus(result.approval_status || {})
+    if (result.overall_mou_status !== undefined) setOverallStatus(result.overall_mou_status || '')
+    if (result.version_number !== undefined) setVersionNumber(result.version_number || '')
+    if (result.version_diff !== undefined) setVersionDiff(result.version_diff || '')
+    if (result.pdf_url !== undefined) setPdfUrl(result.pdf_url || '')
+  }
+
+  // The backend streams server-sent events: draft tokens as Gemini writes
+  // them, then one event per finished agent, then `done` with the result
+  const handleEvent = (event: string, data) => {
+    if (event === 'token') setDraft((prev) => prev + data.text)
+    else if (event === 'node') {
+      setCurrentNode(data.node)
+      applyResult(data.data || {})
+    } else if (event === 'done' || event === 'waiting') applyResult(data.result || {})
+    else if (event === 'error') throw new Error(data.error)
+  }
+
   const generateDraft = async () => {
     setLoading(true)
+    setCurrentNode('')
+    setDraft('')
+    setPdfUrl('')
     try {
-      const res = await axios.post('http://localhost:8000/api/generate-draft/', form)
-      const result = res.data.result || {}
-      setDraft(result.draft_text || '')
-      setClauses(result.retrieved_clauses || [])
-      setEmailsSent(result.emails_sent || [])
-      setApprovalStatus(result.approval_status || {})
-      setOverallStatus(result.overall_mou_status || '')
-      setVersionNumber(result.version_number || '')
-      setVersionDiff(result.version_diff || '')
+      const res = await fetch('http://localhost:8000/api/generate-draft/stream/', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(form),
+      })
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`)
+
+      const reader = res.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        // Events are separated by a blank line: "event: x\ndata: {...}\n\n"
+        let boundary
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const block = buffer.slice(0, boundary)
+          buffer = buffer.slice(boundary + 2)
+          let event = 'message'
+          let data = ''
+          for (const line of block.split('\n')) {
+            if (line.startsWith('event: ')) event = line.slice(7)
+            else if (line.startsWith('data: ')) data += line.slice(6)
+          }
+          if (data) handleEvent(event, JSON.parse(data))
+        }
+      }
     } catch (error) {
       alert('Error generating MoU. Please check backend.')
     } finally {
@@ -130,7 +177,7 @@ export default function Home() {
                   d="M4 12a8 8 0 018-8V0C5.373 0 0 5.373 0 12h4zm2 5.291A7.962 7.962 0 014 12H0c0 3.042 1.135 5.824 3 7.938l3-2.647z"
                 />
               </svg>
-              Generating...
+              {currentNode ? `Finished ${currentNode}...` : 'Generating...'}
             </>
           ) : (
             'Generate MoU Draft'
@@ -143,6 +190,14 @@ export default function Home() {
             <pre className="text-gray-800 whitespace-pre-wrap bg-gray-100 p-4 pt-10 rounded-md border border-gray-300">
               {draft}
             </pre>
+            {pdfUrl && (
+              <a
+                href={`http://localhost:8000${pdfUrl}`}
+                className="inline-block text-blue-700 font-semibold underline"
+              >
+                📥 Download PDF
+              </a>
+            )}
           </Card>
         )}
 
@@ -184,7 +239,10 @@ export default function Home() {
         {versionNumber && (
           <Card title="Agent 5 - Version Control Agent Executed">
             <p className="text-gray-700">📄 Version Number: <strong>{versionNumber}</strong></p>
-            <p className="text-gray-700">🆕 Version Diff: <strong>{versionDiff}</strong></p>
+            <p className="text-gray-700">🆕 Version Diff:</p>
+            <pre className="text-gray-800 whitespace-pre-wrap bg-gray-100 p-4 rounded-md border border-gray-300 text-sm">
+              {versionDiff}
+            </pre>
           </Card>
         )}
       </div>
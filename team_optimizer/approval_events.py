@@ -0,0 +1,185 @@
+#approval_events.py
+
+import os
+import time
+import asyncio
+import threading
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# How long a waiting tracker sleeps before re-reading statuses even without an
+# event. Only matters when change streams are unavailable (standalone Mongo)
+# and the status was changed from another process.
+RECHECK_SECONDS = float(os.getenv("MOU_APPROVAL_RECHECK_SECONDS", "300"))
+
+# Reconnect backoff after the change stream drops (network error, failover)
+WATCH_RETRY_SECONDS = float(os.getenv("MOU_APPROVAL_WATCH_RETRY_SECONDS", "1"))
+WATCH_RETRY_MAX_SECONDS = float(os.getenv("MOU_APPROVAL_WATCH_RETRY_MAX_SECONDS", "60"))
+
+# "$changeStream is only supported on replica sets", unknown $changeStream
+# stage (very old servers), command not supported
+CHANGE_STREAMS_UNSUPPORTED = {40573, 40324, 115}
+# The resume token fell off the oplog or is not valid any more
+RESUME_TOKEN_LOST = {286, 260, 280}
+
+
+class Subscription:
+    """A set of emails a tracker is waiting on. Wakes when any of them changes."""
+
+    def __init__(self, bus, emails):
+        self._bus = bus
+        self.emails = set(emails)
+        self._event = threading.Event()
+        # Set by wait_async: the waiting coroutine's loop and event
+        self._async_event = None
+        self._loop = None
+
+    def wait(self, timeout=RECHECK_SECONDS) -> bool:
+        """Blocks (without polling) until a watched email changes. Returns False on timeout."""
+        changed = self._event.wait(timeout)
+        self._event.clear()
+        return changed
+
+    async def wait_async(self, timeout=RECHECK_SECONDS) -> bool:
+        """Like wait(), but suspends the calling coroutine instead of a thread."""
+        if self._loop is None:
+            self._async_event = asyncio.Event()
+            self._loop = asyncio.get_running_loop()  # published last: notify() checks it
+        if not self._event.is_set():
+            try:
+                await asyncio.wait_for(self._async_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        changed = self._event.is_set()
+        self._event.clear()
+        self._async_event.clear()
+        return changed
+
+    def notify(self):
+        # Publishers may be on any thread (views, change stream, another loop)
+        self._event.set()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._async_event.set)
+            except RuntimeError:
+                pass  # loop already closed: nobody is waiting any more
+
+    def close(self):
+        self._bus.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ApprovalBus:
+    """
+    In-process pub/sub for approval status changes.
+
+    `update_approval` publishes directly; a Mongo change stream (when the
+    deployment supports it) publishes writes made by other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # email -> set of Subscription
+        self._watcher = None
+        self._watch_unavailable = False
+
+    def subscribe(self, emails) -> Subscription:
+        sub = Subscription(self, emails)
+        with self._lock:
+            for email in sub.emails:
+                self._subscribers.setdefault(email, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            for email in sub.emails:
+                subs = self._subscribers.get(email)
+                if subs:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._subscribers[email]
+
+    def publish(self, email: str, status: str = None):
+        with self._lock:
+            subs = list(self._subscribers.get(email, ()))
+        for sub in subs:
+            sub.notify()
+
+    def publish_all(self):
+        """Wakes every subscriber, e.g. after changes may have been missed."""
+        with self._lock:
+            subs = {sub for subs in self._subscribers.values() for sub in subs}
+        for sub in subs:
+            sub.notify()
+
+    # ── Cross-process notifications ──────────────────────────────────────────
+
+    def ensure_watching(self, approvals_collection):
+        """Starts (once per process) a change-stream listener on the approvals collection."""
+        with self._lock:
+            if self._watch_unavailable:
+                return
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._watcher = threading.Thread(
+                target=self._watch,
+                args=(approvals_collection,),
+                name="approval-change-stream",
+                daemon=True
+            )
+            self._watcher.start()
+
+    def _watch(self, approvals_collection):
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        resume_token = None
+        delay = WATCH_RETRY_SECONDS
+        missed = False
+        while True:
+            try:
+                with approvals_collection.watch(
+                    pipeline, full_document="updateLookup", resume_after=resume_token
+                ) as stream:
+                    print("👂 Listening for approval changes via change stream")
+                    delay = WATCH_RETRY_SECONDS
+                    if missed:
+                        # Changes made while we were disconnected and not
+                        # covered by a resume token: let every tracker re-read
+                        self.publish_all()
+                        missed = False
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change.get("fullDocument") or {}
+                        if doc.get("email"):
+                            self.publish(doc["email"], doc.get("status"))
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAMS_UNSUPPORTED:
+                    self._give_up(e)
+                    return
+                if e.code in RESUME_TOKEN_LOST:
+                    resume_token = None
+                missed = missed or resume_token is None
+                print(f"⚠️ Approval change stream failed, reconnecting in {delay:g}s:", e)
+            except PyMongoError as e:
+                # Network error, failover, ... : resume where we left off
+                missed = missed or resume_token is None
+                print(f"⚠️ Approval change stream interrupted, reconnecting in {delay:g}s:", e)
+            except Exception as e:
+                # Not a pymongo error: this client cannot watch at all
+                self._give_up(e)
+                return
+            time.sleep(delay)
+            delay = min(delay * 2, WATCH_RETRY_MAX_SECONDS)
+
+    def _give_up(self, error):
+        # Standalone servers have no change streams; trackers fall back to
+        # in-process events plus the periodic recheck.
+        print("⚠️ Approval change stream unavailable:", error)
+        self._watch_unavailable = True
+
+
+approval_bus = ApprovalBus()
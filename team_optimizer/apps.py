@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TeamOptimizerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'team_optimizer'
+
+    def ready(self):
+        # Optional: set MOU_WARMUP (e.g. "embedder,llm,graph" or "all") to load
+        # heavy resources at startup instead of on the first request.
+        from .resources import warm_up
+        warm_up()
@@ -0,0 +1,105 @@
+#bulk.py
+
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .langgraph_flow import draft_mou
+from .clause_retrieval import search_clauses_many
+from . import version_store
+from .metrics import registry
+from .instrumentation import timed
+
+# Bulk MoU generation (/api/generate-draft/bulk/): many form payloads in one
+# request. Drafts are written by up to BULK_LLM_CONCURRENCY concurrent Gemini
+# calls. Drafts that finish while earlier ones are being retrieved and stored
+# form the next wave. Each wave costs one embedding encode, one clause-index
+# query per partnership type and one insert_many, however many drafts it has.
+# Only the drafting step runs per item. The approval workflow is not started;
+# submit /api/generate-draft/ for that.
+
+BULK_LLM_CONCURRENCY = int(os.getenv("MOU_BULK_LLM_CONCURRENCY", "8"))
+BULK_MAX_ITEMS = int(os.getenv("MOU_BULK_MAX_ITEMS", "500"))
+
+REQUIRED_FIELDS = ("company_name", "partnership_type", "objective", "scope", "mou_date")
+
+
+def _missing_fields(item) -> list:
+    if not isinstance(item, dict):
+        return list(REQUIRED_FIELDS)
+    return [field for field in REQUIRED_FIELDS if not item.get(field)]
+
+
+def _error(index: int, item, error: str) -> dict:
+    company = item.get("company_name") if isinstance(item, dict) else None
+    registry.counter("mou_bulk_items_total", status="error").inc()
+    return {"index": index, "company_name": company, "status": "error", "error": error}
+
+
+def _process_wave(wave: list) -> list:
+    """Clause retrieval and storage for [(index, item, draft_text)], in as few calls as possible."""
+    with timed("mou_bulk_wave_seconds", span="bulk.wave"):
+        clauses = search_clauses_many(
+            [draft for _index, _item, draft in wave],
+            [item["partnership_type"] for _index, item, _draft in wave],
+            modes=[item.get("retrieval_mode") for _index, item, _draft in wave],
+        )
+        saved = version_store.save_versions([
+            (item["company_name"], draft, item["partnership_type"]) for _index, item, draft in wave
+        ])
+
+    results = []
+    for (index, item, draft), retrieved, stored in zip(wave, clauses, saved):
+        registry.counter("mou_bulk_items_total", status="ok").inc()
+        results.append({
+            "index": index,
+            "company_name": item["company_name"],
+            "status": "ok",
+            "draft_id": stored["draft_id"],
+            "version_number": stored["version"],
+            "pdf_url": f"/api/drafts/{stored['draft_id']}/pdf/",
+            "draft_text": draft,
+            "retrieved_clauses": retrieved,
+        })
+    return results
+
+
+def generate_bulk(items: list, concurrency: int = BULK_LLM_CONCURRENCY):
+    """
+    Drafts, retrieves clauses for and stores every item, yielding one result
+    dict per item ({"index", "status": "ok" | "error", ...}) as it completes,
+    so the order differs from the input order.
+    """
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="mou-bulk")
+    try:
+        for index, item in enumerate(items):
+            missing = _missing_fields(item)
+            if missing:
+                yield _error(index, item, f"Missing fields: {', '.join(missing)}")
+                continue
+            pending[executor.submit(draft_mou, item)] = (index, item)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            wave = []
+            for future in done:
+                index, item = pending.pop(future)
+                try:
+                    wave.append((index, item, future.result()["draft_text"]))
+                except Exception as e:
+                    traceback.print_exc()
+                    yield _error(index, item, str(e))
+            if not wave:
+                continue
+
+            try:
+                results = _process_wave(wave)
+            except Exception as e:
+                traceback.print_exc()
+                results = [_error(index, item, str(e)) for index, item, _draft in wave]
+            print(f"📦 Bulk wave: {len(wave)} drafts, {len(pending)} still drafting")
+            yield from results
+    finally:
+        # A client that disconnects mid-stream should not leave drafts queued
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,272 @@
+#checkpoints.py
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from bson.binary import Binary
+from pymongo import ASCENDING, DESCENDING
+
+from .mongo import get_db, get_async_db
+
+# LangGraph checkpointer backed by the shared Mongo client. Every completed
+# node writes a checkpoint keyed by thread_id (our workflow/job id), so a run
+# can continue from its last completed node after a crash or redeploy, and a
+# parked run needs no memory in any worker until it is resumed.
+
+
+def checkpoints_collection():
+    return get_db()["checkpoints"]
+
+
+def checkpoint_writes_collection():
+    return get_db()["checkpoint_writes"]
+
+
+def _thread_config(thread_id, checkpoint_ns, checkpoint_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+
+class MongoCheckpointSaver(BaseCheckpointSaver):
+    """
+    Stores each checkpoint as one document (the serialized checkpoint holds
+    the whole pipeline state, which is small) and pending writes as one
+    document per (task, write index).
+    """
+
+    _indexes_ready = False
+
+    # (collection, index keys)
+    _INDEXES = [
+        ("checkpoints", [("thread_id", ASCENDING), ("checkpoint_ns", ASCENDING), ("checkpoint_id", DESCENDING)]),
+        ("checkpoint_writes", [("thread_id", ASCENDING), ("checkpoint_ns", ASCENDING), ("checkpoint_id", ASCENDING)]),
+    ]
+
+    def _ensure_indexes(self):
+        if not MongoCheckpointSaver._indexes_ready:
+            db = get_db()
+            for collection, keys in self._INDEXES:
+                db[collection].create_index(keys)
+            MongoCheckpointSaver._indexes_ready = True
+
+    async def _aensure_indexes(self):
+        # Same indexes through the event loop's AsyncMongoClient (never block the loop)
+        if not MongoCheckpointSaver._indexes_ready:
+            db = get_async_db()
+            for collection, keys in self._INDEXES:
+                await db[collection].create_index(keys)
+            MongoCheckpointSaver._indexes_ready = True
+
+    def _load(self, value_type, value):
+        return self.serde.loads_typed((value_type, bytes(value)))
+
+    def _dump(self, value):
+        value_type, data = self.serde.dumps_typed(value)
+        return value_type, Binary(data)
+
+    def _to_tuple(self, doc, writes) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id = doc["thread_id"], doc["checkpoint_ns"], doc["checkpoint_id"]
+        return CheckpointTuple(
+            config=_thread_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self._load(doc["type"], doc["checkpoint"]),
+            metadata=self._load(doc["metadata_type"], doc["metadata"]),
+            parent_config=(
+                _thread_config(thread_id, checkpoint_ns, doc["parent_checkpoint_id"])
+                if doc.get("parent_checkpoint_id") else None
+            ),
+            pending_writes=[
+                (w["task_id"], w["channel"], self._load(w["type"], w["value"])) for w in writes
+            ],
+        )
+
+    # ── Queries and documents (shared by the sync and async interfaces) ─────
+
+    @staticmethod
+    def _writes_query(doc) -> dict:
+        return {"thread_id": doc["thread_id"], "checkpoint_ns": doc["checkpoint_ns"], "checkpoint_id": doc["checkpoint_id"]}
+
+    @staticmethod
+    def _get_query(config) -> dict:
+        configurable = config["configurable"]
+        query = {
+            "thread_id": configurable["thread_id"],
+            "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+        }
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id:
+            query["checkpoint_id"] = checkpoint_id
+        return query
+
+    @staticmethod
+    def _list_query(config, before) -> dict:
+        query = {}
+        if config:
+            configurable = config["configurable"]
+            query["thread_id"] = configurable["thread_id"]
+            if configurable.get("checkpoint_ns") is not None:
+                query["checkpoint_ns"] = configurable["checkpoint_ns"]
+            if get_checkpoint_id(config):
+                query["checkpoint_id"] = get_checkpoint_id(config)
+        if before and get_checkpoint_id(before):
+            query.setdefault("checkpoint_id", {})
+            if isinstance(query["checkpoint_id"], dict):
+                query["checkpoint_id"]["$lt"] = get_checkpoint_id(before)
+        return query
+
+    @staticmethod
+    def _keep(checkpoint_tuple, filter) -> bool:
+        return not filter or all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items())
+
+    def _checkpoint_doc(self, config, checkpoint, metadata):
+        """Returns (_id, document, config of the stored checkpoint)."""
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+
+        checkpoint_type, checkpoint_data = self._dump(checkpoint)
+        metadata_type, metadata_data = self._dump(metadata)
+        doc = {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+            "parent_checkpoint_id": configurable.get("checkpoint_id"),
+            "type": checkpoint_type,
+            "checkpoint": checkpoint_data,
+            "metadata_type": metadata_type,
+            "metadata": metadata_data,
+            "step": metadata.get("step"),
+        }
+        return (
+            f"{thread_id}:{checkpoint_ns}:{checkpoint['id']}",
+            doc,
+            _thread_config(thread_id, checkpoint_ns, checkpoint["id"]),
+        )
+
+    def _write_ops(self, config, writes, task_id, task_path):
+        """Returns [(key, update, is_replace)] for put_writes."""
+        configurable = config["configurable"]
+        thread_id = configurable["thread_id"]
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        checkpoint_id = configurable["checkpoint_id"]
+
+        ops = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            value_type, data = self._dump(value)
+            doc = {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+                "task_id": task_id,
+                "task_path": task_path,
+                "idx": write_idx,
+                "channel": channel,
+                "type": value_type,
+                "value": data,
+            }
+            key = {"_id": f"{thread_id}:{checkpoint_ns}:{checkpoint_id}:{task_id}:{write_idx}"}
+            if write_idx >= 0:
+                # Regular writes are recorded once; a replayed task must not change them
+                ops.append((key, {"$setOnInsert": doc}, False))
+            else:
+                # Special writes (errors, interrupts, resume values) keep the latest
+                ops.append((key, doc, True))
+        return ops
+
+    # ── BaseCheckpointSaver interface ────────────────────────────────────────
+
+    def _fetch_writes(self, doc):
+        return checkpoint_writes_collection().find(self._writes_query(doc)).sort(
+            [("task_id", ASCENDING), ("idx", ASCENDING)]
+        )
+
+    def get_tuple(self, config):
+        doc = checkpoints_collection().find_one(self._get_query(config), sort=[("checkpoint_id", DESCENDING)])
+        return None if doc is None else self._to_tuple(doc, self._fetch_writes(doc))
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        cursor = checkpoints_collection().find(self._list_query(config, before)).sort("checkpoint_id", DESCENDING)
+        for doc in cursor:
+            checkpoint_tuple = self._to_tuple(doc, self._fetch_writes(doc))
+            if not self._keep(checkpoint_tuple, filter):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    return
+                limit -= 1
+            yield checkpoint_tuple
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        self._ensure_indexes()
+        key, doc, stored_config = self._checkpoint_doc(config, checkpoint, metadata)
+        checkpoints_collection().replace_one({"_id": key}, doc, upsert=True)
+        return stored_config
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self._ensure_indexes()
+        for key, update, is_replace in self._write_ops(config, writes, task_id, task_path):
+            if is_replace:
+                checkpoint_writes_collection().replace_one(key, update, upsert=True)
+            else:
+                checkpoint_writes_collection().update_one(key, update, upsert=True)
+
+    def delete_thread(self, thread_id):
+        checkpoints_collection().delete_many({"thread_id": thread_id})
+        checkpoint_writes_collection().delete_many({"thread_id": thread_id})
+
+    # ── Async interface (graph.ainvoke / astream, AsyncMongoClient) ──────────
+
+    async def _afetch_writes(self, doc):
+        return await get_async_db()["checkpoint_writes"].find(self._writes_query(doc)).sort(
+            [("task_id", ASCENDING), ("idx", ASCENDING)]
+        ).to_list()
+
+    async def aget_tuple(self, config):
+        doc = await get_async_db()["checkpoints"].find_one(
+            self._get_query(config), sort=[("checkpoint_id", DESCENDING)]
+        )
+        return None if doc is None else self._to_tuple(doc, await self._afetch_writes(doc))
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        cursor = get_async_db()["checkpoints"].find(self._list_query(config, before)).sort("checkpoint_id", DESCENDING)
+        async for doc in cursor:
+            checkpoint_tuple = self._to_tuple(doc, await self._afetch_writes(doc))
+            if not self._keep(checkpoint_tuple, filter):
+                continue
+            if limit is not None:
+                if limit <= 0:
+                    return
+                limit -= 1
+            yield checkpoint_tuple
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        await self._aensure_indexes()
+        key, doc, stored_config = self._checkpoint_doc(config, checkpoint, metadata)
+        await get_async_db()["checkpoints"].replace_one({"_id": key}, doc, upsert=True)
+        return stored_config
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await self._aensure_indexes()
+        collection = get_async_db()["checkpoint_writes"]
+        for key, update, is_replace in self._write_ops(config, writes, task_id, task_path):
+            if is_replace:
+                await collection.replace_one(key, update, upsert=True)
+            else:
+                await collection.update_one(key, update, upsert=True)
+
+    async def adelete_thread(self, thread_id):
+        db = get_async_db()
+        await db["checkpoints"].delete_many({"thread_id": thread_id})
+        await db["checkpoint_writes"].delete_many({"thread_id": thread_id})
+
+
+_saver = None
+
+
+def get_checkpointer() -> MongoCheckpointSaver:
+    global _saver
+    if _saver is None:
+        _saver = MongoCheckpointSaver()
+    return _saver
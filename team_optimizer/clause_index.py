@@ -0,0 +1,142 @@
+#clause_index.py
+
+import os
+import json
+
+import numpy as np
+
+# In-process clause index: a memory-mapped float32 matrix of normalized clause
+# embeddings plus metadata arrays. It answers the same `query(...)` calls as a
+# Chroma collection (same result shape, same `where` subset), so retrieval code
+# can use either backend. Built from the Chroma collection by
+# `python Chroma.py --numpy-index`.
+
+INDEX_PATH = os.getenv("MOU_CLAUSE_INDEX_PATH", "./clause_index")
+
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.json"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. BUILD
+# ──────────────────────────────────────────────────────────────────────────────
+
+def write_index(path, ids, documents, metadatas, embeddings):
+    """Writes the index atomically enough for a read-mostly corpus (files are swapped in last)."""
+    os.makedirs(path, exist_ok=True)
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.where(norms == 0, 1, norms)
+
+    tmp_embeddings = os.path.join(path, EMBEDDINGS_FILE + ".tmp")
+    tmp_metadata = os.path.join(path, METADATA_FILE + ".tmp")
+    with open(tmp_embeddings, "wb") as fh:
+        np.save(fh, matrix)
+    with open(tmp_metadata, "w", encoding="utf-8") as fh:
+        json.dump({
+            "ids": list(ids),
+            "documents": list(documents),
+            "metadatas": [dict(m or {}) for m in metadatas],
+        }, fh)
+
+    os.replace(tmp_embeddings, os.path.join(path, EMBEDDINGS_FILE))
+    os.replace(tmp_metadata, os.path.join(path, METADATA_FILE))
+
+
+def build_from_collection(collection, path=INDEX_PATH, page_size=5000):
+    """Exports every clause (with its stored embedding) from a Chroma collection."""
+    ids, documents, metadatas, embeddings = [], [], [], []
+    offset = 0
+    while True:
+        page = collection.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=page_size,
+            offset=offset,
+        )
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        documents.extend(page["documents"])
+        metadatas.extend(page["metadatas"])
+        embeddings.extend(page["embeddings"])
+        offset += len(page["ids"])
+
+    write_index(path, ids, documents, metadatas, embeddings)
+    return len(ids)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. QUERY
+# ──────────────────────────────────────────────────────────────────────────────
+
+class NumpyClauseIndex:
+    def __init__(self, path=INDEX_PATH):
+        # Memory-mapped: pages are shared between forked workers via the page cache
+        self.embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(path, METADATA_FILE), encoding="utf-8") as fh:
+            data = json.load(fh)
+
+        self.ids = data["ids"]
+        self.documents = data["documents"]
+        self.metadatas = data["metadatas"]
+
+        # One array per metadata field so `where` filters become vectorized masks
+        fields = {key for meta in self.metadatas for key in meta}
+        self.columns = {
+            field: np.array([str(meta.get(field, "")) for meta in self.metadatas])
+            for field in fields
+        }
+
+    def count(self):
+        return len(self.ids)
+
+    def _mask(self, where):
+        """Boolean row mask for the Chroma `where` subset we use: field equality, $in, $and."""
+        if not where:
+            return None
+
+        masks = []
+        for key, condition in where.items():
+            if key == "$and":
+                masks.extend(self._mask(part) for part in condition)
+                continue
+
+            column = self.columns.get(key)
+            if column is None:
+                masks.append(np.zeros(len(self.ids), dtype=bool))
+            elif isinstance(condition, dict) and "$in" in condition:
+                masks.append(np.isin(column, [str(v) for v in condition["$in"]]))
+            elif isinstance(condition, dict) and "$eq" in condition:
+                masks.append(column == str(condition["$eq"]))
+            else:
+                masks.append(column == str(condition))
+
+        return np.logical_and.reduce(masks)
+
+    def query(self, query_embeddings, n_results=10, where=None, include=None):
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        # Stored rows are normalized at build time; callers' queries may not be
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+        scores = queries @ self.embeddings.T  # cosine similarity: both sides are normalized
+
+        mask = self._mask(where)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+            available = int(mask.sum())
+        else:
+            available = len(self.ids)
+
+        k = min(n_results, available)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row in scores:
+            if k == 0:
+                top = np.array([], dtype=int)
+            else:
+                top = np.argpartition(-row, k - 1)[:k]
+                top = top[np.argsort(-row[top])]
+            result["ids"].append([self.ids[i] for i in top])
+            result["documents"].append([self.documents[i] for i in top])
+            result["metadatas"].append([self.metadatas[i] for i in top])
+            result["distances"].append([float(1.0 - row[i]) for i in top])
+        return result
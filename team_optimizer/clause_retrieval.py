@@ -0,0 +1,265 @@
+#clause_retrieval.py
+
+import os
+import re
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from .embedding_cache import embed_texts
+from .instrumentation import timed
+from .resources import CLAUSE_BACKEND, get_clause_collection
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+# "sections": embed each section of the draft and fuse the results (default)
+# "whole":    embed the whole draft as one vector (model truncates at 256 tokens)
+RETRIEVAL_MODE = os.getenv("MOU_RETRIEVAL_MODE", "sections")
+TOP_K = int(os.getenv("MOU_RETRIEVAL_TOP_K", "5"))
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces; ~150 words stays under that
+MAX_SECTION_WORDS = int(os.getenv("MOU_SECTION_MAX_WORDS", "150"))
+MIN_SECTION_WORDS = int(os.getenv("MOU_SECTION_MIN_WORDS", "20"))
+MAX_SECTIONS = int(os.getenv("MOU_MAX_SECTIONS", "32"))
+
+# Per-clause_type cap on results (0 = no cap) and clause types that should be
+# represented whenever the filtered collection has one
+CLAUSE_TYPE_QUOTA = int(os.getenv("MOU_CLAUSE_TYPE_QUOTA", "0"))
+REQUIRED_CLAUSE_TYPES = [
+    t.strip() for t in os.getenv("MOU_REQUIRED_CLAUSE_TYPES", "").split(",") if t.strip()
+]
+# How many candidates per section to fetch when a quota may discard some
+QUOTA_OVERFETCH = int(os.getenv("MOU_RETRIEVAL_OVERFETCH", "3"))
+
+# Threads for embedding + index search when called from the event loop (async
+# pipeline). Both are CPU-bound; a few threads keep the loop responsive.
+EMBED_THREADS = int(os.getenv("MOU_EMBED_THREADS", "2"))
+
+# Reciprocal-rank-fusion constant (the usual 60 from the RRF paper)
+RRF_K = 60
+
+_NUMBERED_HEADING = re.compile(r"^(\d+[\.\)]|article\b|section\b|clause\b)", re.IGNORECASE)
+_CAPS_HEADING = re.compile(r"^[A-Z][A-Z0-9 &/,()-]{3,}:?$")
+
+
+def _is_heading(line: str) -> bool:
+    return bool(_NUMBERED_HEADING.match(line) or _CAPS_HEADING.match(line))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. SECTION SPLITTING
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _split_long(text: str) -> list:
+    """Splits an over-long paragraph on sentence boundaries, then on words."""
+    pieces, current = [], []
+    for sentence in re.split(r"(?<=[.;:!?])\s+", text):
+        words = sentence.split()
+        while len(words) > MAX_SECTION_WORDS:
+            if current:
+                pieces.append(" ".join(current))
+                current = []
+            pieces.append(" ".join(words[:MAX_SECTION_WORDS]))
+            words = words[MAX_SECTION_WORDS:]
+        if current and len(current) + len(words) > MAX_SECTION_WORDS:
+            pieces.append(" ".join(current))
+            current = []
+        current.extend(words)
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def split_into_sections(draft: str) -> list:
+    """
+    Splits an MoU into retrieval-sized sections: a numbered/ALL-CAPS heading or
+    a blank line starts a new block, short blocks are merged into their
+    neighbour and long ones are split so each fits the embedder's window.
+    """
+    blocks, current = [], []
+    for line in draft.splitlines():
+        stripped = line.strip()
+        if not stripped or _is_heading(stripped):
+            if current:
+                blocks.append(" ".join(current))
+                current = []
+        if stripped:
+            current.append(stripped)
+    if current:
+        blocks.append(" ".join(current))
+
+    sections = []
+    for block in blocks:
+        for piece in _split_long(block):
+            if sections and len(sections[-1].split()) + len(piece.split()) <= MAX_SECTION_WORDS \
+                    and len(piece.split()) < MIN_SECTION_WORDS:
+                sections[-1] = f"{sections[-1]} {piece}"
+            else:
+                sections.append(piece)
+
+    return sections[:MAX_SECTIONS]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. QUERY + FUSION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _to_clause(clause_id, text, metadata, score):
+    return {
+        "clause_id": clause_id,
+        "clause_type": metadata.get("clause_type"),
+        "partnership_type": metadata.get("partnership_type"),
+        "text": text,
+        "score": score,
+    }
+
+
+def fuse_results(results: dict, top_k: int, per_type_quota: int = 0) -> list:
+    """
+    Merges a multi-query Chroma result with reciprocal rank fusion, keeping one
+    entry per clause_id (a clause matched by several sections ranks higher).
+    With `per_type_quota`, at most that many clauses of each clause_type are kept.
+    """
+    fused = {}
+    for ids, texts, metadatas in zip(results["ids"], results["documents"], results["metadatas"]):
+        for rank, (clause_id, text, metadata) in enumerate(zip(ids, texts, metadatas)):
+            entry = fused.setdefault(clause_id, {"text": text, "metadata": metadata or {}, "score": 0.0})
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+
+    ranked = sorted(fused.items(), key=lambda item: item[1]["score"], reverse=True)
+
+    selected, per_type = [], {}
+    for clause_id, entry in ranked:
+        clause_type = entry["metadata"].get("clause_type")
+        if per_type_quota and per_type.get(clause_type, 0) >= per_type_quota:
+            continue
+        per_type[clause_type] = per_type.get(clause_type, 0) + 1
+        selected.append(_to_clause(clause_id, entry["text"], entry["metadata"], round(entry["score"], 6)))
+        if len(selected) == top_k:
+            break
+    return selected
+
+
+def build_where(partnership_type: str = None, clause_types: list = None):
+    """Chroma `where` filter: the request's partnership type plus "All", optionally by clause type."""
+    conditions = []
+    if partnership_type:
+        conditions.append({"partnership_type": {"$in": sorted({partnership_type, "All"})}})
+    if clause_types:
+        conditions.append({"clause_type": {"$in": list(clause_types)}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+def _query(embeddings, n_results, where):
+    kwargs = {"where": where} if where else {}
+    with timed("clause_query_seconds", span="clause_index.query", backend=CLAUSE_BACKEND):
+        return get_clause_collection().query(
+            query_embeddings=embeddings.tolist(),
+            n_results=n_results,
+            include=["documents", "metadatas", "distances"],
+            **kwargs
+        )
+
+
+def _query_sections(draft: str, mode: str) -> list:
+    sections = split_into_sections(draft) if mode == "sections" else []
+    return sections or [draft]
+
+
+def _select(embeddings, results, top_k, partnership_type, per_type_quota, required_types) -> list:
+    """Fuses one draft's results; tops up required clause types that did not make the cut."""
+    selected = fuse_results(results, top_k, per_type_quota)
+
+    # Second (filtered) query only when a required clause type did not make the cut
+    present = {clause["clause_type"] for clause in selected}
+    missing = [t for t in required_types if t not in present]
+    if missing:
+        extra = _query(embeddings, len(missing) * QUOTA_OVERFETCH, build_where(partnership_type, missing))
+        best = {}
+        candidates = sum(len(ids) for ids in extra["ids"])
+        for clause in fuse_results(extra, candidates):
+            best.setdefault(clause["clause_type"], clause)
+
+        additions = [best[t] for t in missing if t in best]
+        keep = top_k - len(additions)
+        selected_ids = {clause["clause_id"] for clause in additions}
+        selected = [c for c in selected if c["clause_id"] not in selected_ids][:max(keep, 0)] + additions
+
+    return selected
+
+
+def search_clauses(draft: str, mode: str = None, top_k: int = TOP_K, partnership_type: str = None,
+                   per_type_quota: int = None, required_types: list = None) -> list:
+    mode = mode or RETRIEVAL_MODE
+    per_type_quota = CLAUSE_TYPE_QUOTA if per_type_quota is None else per_type_quota
+    required_types = REQUIRED_CLAUSE_TYPES if required_types is None else required_types
+
+    # One batched (and cached) encode, one filtered Chroma round-trip for every section
+    embeddings = embed_texts(_query_sections(draft, mode))
+    n_results = top_k * QUOTA_OVERFETCH if (per_type_quota or required_types) else top_k
+    results = _query(embeddings, n_results, build_where(partnership_type))
+    return _select(embeddings, results, top_k, partnership_type, per_type_quota, required_types)
+
+
+def search_clauses_many(drafts: list, partnership_types: list, modes: list = None, top_k: int = TOP_K,
+                        per_type_quota: int = None, required_types: list = None) -> list:
+    """
+    search_clauses for a batch of drafts (bulk generation): the sections of all
+    drafts are embedded in one encode, and every draft with the same partnership
+    type shares one index query. `modes` gives each draft's retrieval mode
+    (None = the default). Returns one clause list per draft, in order.
+    """
+    modes = modes or [None] * len(drafts)
+    per_type_quota = CLAUSE_TYPE_QUOTA if per_type_quota is None else per_type_quota
+    required_types = REQUIRED_CLAUSE_TYPES if required_types is None else required_types
+
+    sections, spans = [], []
+    for draft, mode in zip(drafts, modes):
+        # The mode only decides how a draft is split into query sections, so
+        # drafts with different modes still share the encode and the queries
+        draft_sections = _query_sections(draft, mode or RETRIEVAL_MODE)
+        spans.append((len(sections), len(sections) + len(draft_sections)))
+        sections.extend(draft_sections)
+    embeddings = embed_texts(sections)
+
+    # The partnership-type filter is applied inside the index, so drafts are
+    # grouped by it: a batch of one type is a single query
+    groups = {}
+    for i, partnership_type in enumerate(partnership_types):
+        groups.setdefault(partnership_type, []).append(i)
+
+    n_results = top_k * QUOTA_OVERFETCH if (per_type_quota or required_types) else top_k
+    selected = [None] * len(drafts)
+    for partnership_type, members in groups.items():
+        rows = [row for i in members for row in range(*spans[i])]
+        results = _query(embeddings[rows], n_results, build_where(partnership_type))
+
+        offset = 0
+        for i in members:
+            start, end = spans[i]
+            count = end - start
+            # Each query embedding has its own row in the result lists
+            own = {key: results[key][offset:offset + count] for key in ("ids", "documents", "metadatas")}
+            selected[i] = _select(embeddings[start:end], own, top_k, partnership_type, per_type_quota, required_types)
+            offset += count
+
+    return selected
+
+
+_executor = None
+
+
+async def asearch_clauses(draft: str, **kwargs) -> list:
+    """search_clauses on the embedding executor, so the event loop is never blocked."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=EMBED_THREADS, thread_name_prefix="mou-embed")
+    # Carry the caller's context (trace span, stream writer) into the worker thread
+    call = functools.partial(contextvars.copy_context().run, search_clauses, draft, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_executor, call)
@@ -0,0 +1,169 @@
+#embedders.py
+
+import os
+import json
+
+import numpy as np
+
+# ONNX Runtime embedder (MOU_EMBEDDING_BACKEND=onnx): the SentenceTransformer
+# exported once to ONNX and int8-quantized, then run on the CPU without
+# importing PyTorch. Export it with (needs torch, sentence-transformers and onnx):
+#   python manage.py export_onnx_embedder [--model all-MiniLM-L6-v2] [--out ./embedder_onnx]
+# Serving needs only onnxruntime and tokenizers.
+
+ONNX_MODEL_PATH = os.getenv("MOU_ONNX_MODEL_PATH", "./embedder_onnx")
+ONNX_QUANTIZED = os.getenv("MOU_ONNX_QUANTIZED", "1") == "1"  # 0 = the float32 export
+ONNX_THREADS = int(os.getenv("MOU_ONNX_THREADS", "0"))        # 0 = ONNX Runtime's default
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+CONFIG_FILE = "embedder.json"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. EXPORT
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _pooling_mode(model) -> str:
+    pooling = model[1]
+    if getattr(pooling, "pooling_mode_mean_tokens", False):
+        return "mean"
+    if getattr(pooling, "pooling_mode_cls_token", False):
+        return "cls"
+    raise ValueError("Only mean and CLS pooling can be exported")
+
+
+def quantize_int8(model_path: str, out_path: str):
+    """Dynamic int8 quantization: int8 weights, activations quantized per batch at run time."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    # Shape inference and graph fusion first, as ONNX Runtime recommends
+    prepared_path = f"{out_path}.prep"
+    quant_pre_process(model_path, prepared_path)
+    try:
+        quantize_dynamic(prepared_path, out_path, weight_type=QuantType.QInt8)
+    finally:
+        os.remove(prepared_path)
+
+
+def export_onnx(model_name: str, out_dir: str = ONNX_MODEL_PATH, opset: int = 17) -> dict:
+    """
+    Exports `model_name`'s transformer to out_dir/model.onnx plus an int8
+    dynamically-quantized copy, with the tokenizer and the pooling /
+    normalization settings OnnxEmbedder needs to reproduce encode().
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    os.makedirs(out_dir, exist_ok=True)
+
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, *inputs):
+            return self.inner(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "tokens"} for name in input_names + ["last_hidden_state"]}
+    model_path = os.path.join(out_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStates(transformer),
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            dynamo=False,
+        )
+
+    quantize_int8(model_path, os.path.join(out_dir, QUANTIZED_MODEL_FILE))
+
+    # tokenizer.json carries the normalizer (e.g. lower-casing) and vocabulary
+    tokenizer.backend_tokenizer.save(os.path.join(out_dir, TOKENIZER_FILE))
+    config = {
+        "model_name": model_name,
+        "dim": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "pooling": _pooling_mode(model),
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+        "pad_id": tokenizer.pad_token_id,
+        "pad_token": tokenizer.pad_token,
+    }
+    with open(os.path.join(out_dir, CONFIG_FILE), "w") as fh:
+        json.dump(config, fh, indent=2)
+    return config
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. INFERENCE
+# ──────────────────────────────────────────────────────────────────────────────
+
+class OnnxEmbedder:
+    """Drop-in for SentenceTransformer.encode() over an export_onnx() directory."""
+
+    def __init__(self, path: str = ONNX_MODEL_PATH, quantized: bool = ONNX_QUANTIZED, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(path, CONFIG_FILE)) as fh:
+            self.config = json.load(fh)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(path, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def _forward(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {k: v for k, v in feed.items() if k in self.input_names})[0]
+
+        if self.config["pooling"] == "cls":
+            return hidden[:, 0]
+        weights = mask[:, :, None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               convert_to_numpy: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        vectors = np.empty((len(texts), self.config["dim"]), dtype=np.float32)
+
+        # Longest first, like SentenceTransformer: texts of similar length share
+        # a batch, so little compute goes to padding
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            vectors[rows] = self._forward([texts[i] for i in rows])
+
+        if normalize_embeddings or self.config["normalize"]:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors[0] if single else vectors
@@ -0,0 +1,190 @@
+#embedding_cache.py
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from .metrics import registry
+from .instrumentation import timed
+from .resources import EMBEDDING_MODEL_NAME, get_embedder
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+CACHE_PATH = os.getenv("MOU_EMBED_CACHE_PATH", "./embedding_cache.sqlite3")
+MEMORY_ITEMS = int(os.getenv("MOU_EMBED_CACHE_MEMORY_ITEMS", "1024"))
+DISK_ITEMS = int(os.getenv("MOU_EMBED_CACHE_DISK_ITEMS", "100000"))
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace/Unicode-insensitive form used for cache keys."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(text: str, model_name: str = EMBEDDING_MODEL_NAME) -> str:
+    payload = f"{model_name}\x1f{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. TWO-TIER CACHE (in-memory LRU in front of SQLite)
+# ──────────────────────────────────────────────────────────────────────────────
+
+class EmbeddingCache:
+    def __init__(self, path=CACHE_PATH, memory_items=MEMORY_ITEMS, disk_items=DISK_ITEMS):
+        self.path = path
+        self.memory_items = memory_items
+        self.disk_items = disk_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _db(self):
+        # SQLite connections must not cross a fork; reopen in the child
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            registry.counter("embedding_cache_evictions_total", tier="memory").inc()
+
+    def get_many(self, keys) -> dict:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            registry.counter("embedding_cache_hits_total", tier="memory").inc(len(found))
+
+            missing = [key for key in keys if key not in found]
+            disk_hits = 0
+            db = self._db() if missing else None
+            # Stay well under SQLite's bound-parameter limit
+            for offset in range(0, len(missing), 500):
+                part = missing[offset:offset + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self._remember(key, vector)
+                if rows:
+                    db.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                        [time.time(), *part]
+                    )
+                disk_hits += len(rows)
+            if disk_hits:
+                db.commit()
+            registry.counter("embedding_cache_hits_total", tier="disk").inc(disk_hits)
+
+            registry.counter("embedding_cache_misses_total").inc(len(keys) - len(found))
+        return found
+
+    def put_many(self, items: dict):
+        now = time.time()
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+
+            db = self._db()
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(v, dtype=np.float32).tobytes(), now) for key, v in items.items()]
+            )
+            self._evict_disk(db)
+            db.commit()
+
+    def _evict_disk(self, db):
+        (count,) = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.disk_items
+        if overflow > 0:
+            # Trim an extra 10% so we do not evict on every single insert
+            overflow += self.disk_items // 10
+            db.execute(
+                "DELETE FROM embeddings WHERE key IN ("
+                " SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            registry.counter("embedding_cache_evictions_total", tier="disk").inc(overflow)
+
+    def stats(self) -> dict:
+        with self._lock:
+            (disk_items,) = self._db().execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            return {
+                "memory_items": len(self._memory),
+                "disk_items": disk_items,
+                "hits_memory": registry.counter("embedding_cache_hits_total", tier="memory").value,
+                "hits_disk": registry.counter("embedding_cache_hits_total", tier="disk").value,
+                "misses": registry.counter("embedding_cache_misses_total").value,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. CACHED ENCODING
+# ──────────────────────────────────────────────────────────────────────────────
+
+def embed_texts(texts: list) -> np.ndarray:
+    """
+    Normalized float32 embeddings for `texts`, shape (len(texts), dim).
+    Cache hits skip the transformer; all misses go through one batched encode.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    cache = get_embedding_cache()
+    keys = [cache_key(text) for text in texts]
+    found = cache.get_many(list(dict.fromkeys(keys)))
+
+    missing = list(dict.fromkeys(key for key in keys if key not in found))
+    if missing:
+        text_for_key = dict(zip(keys, texts))
+        with timed("embedding_encode_seconds", span="embedding.encode"):
+            vectors = get_embedder().encode(
+                [text_for_key[key] for key in missing],
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            ).astype(np.float32)
+        registry.counter("embedding_texts_encoded_total").inc(len(missing))
+        new_items = dict(zip(missing, vectors))
+        cache.put_many(new_items)
+        found.update(new_items)
+
+    return np.stack([found[key] for key in keys])
@@ -0,0 +1,189 @@
+#embedding_server.py
+
+import os
+import json
+import time
+import queue
+import threading
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+# Shared embedding server (MOU_EMBEDDING_BACKEND=server): one process holds
+# the model (MOU_EMBEDDING_SERVER_BACKEND: torch, onnx or fake) and web workers
+# send it texts over a Unix socket instead of each loading their own copy.
+# Requests that arrive within MAX_WAIT_MS of each other are encoded together
+# (up to MAX_BATCH texts), so concurrent retrievals share one forward pass.
+#   python manage.py run_embedding_server
+
+SOCKET_PATH = os.getenv("MOU_EMBED_SERVER_SOCKET", "/tmp/mou-embedder.sock")
+MAX_BATCH = int(os.getenv("MOU_EMBED_SERVER_MAX_BATCH", "64"))
+MAX_WAIT_MS = float(os.getenv("MOU_EMBED_SERVER_MAX_WAIT_MS", "2"))
+REQUEST_TIMEOUT = float(os.getenv("MOU_EMBED_SERVER_TIMEOUT_SECONDS", "60"))
+
+# Wire format, one multiprocessing.connection message each (no pickling):
+#   request   {"texts": [...]} as UTF-8 JSON
+#   response  {"shape": [n, dim]} or {"error": "..."}, then n*dim float32 bytes
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. SERVER
+# ──────────────────────────────────────────────────────────────────────────────
+
+class _Request:
+    def __init__(self, texts):
+        self.texts = texts
+        self.vectors = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EmbeddingServer:
+    def __init__(self, embedder, path=SOCKET_PATH, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.embedder = embedder
+        self.path = path
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._listener = None
+        self.batches = 0
+        self.texts = 0
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left over from a previous run
+        # Only this user may connect
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.path, family="AF_UNIX")
+        finally:
+            os.umask(umask)
+
+        threading.Thread(target=self._batch_loop, name="embed-batcher", daemon=True).start()
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    return  # closed by stop()
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _serve_connection(self, conn):
+        # One connection per client thread; requests on it are sequential
+        with conn:
+            while True:
+                try:
+                    request = _Request(json.loads(conn.recv_bytes())["texts"])
+                except (EOFError, OSError):
+                    return
+
+                self._queue.put(request)
+                request.done.wait()
+                try:
+                    if request.error:
+                        conn.send_bytes(json.dumps({"error": request.error}).encode("utf-8"))
+                    else:
+                        conn.send_bytes(json.dumps({"shape": list(request.vectors.shape)}).encode("utf-8"))
+                        conn.send_bytes(request.vectors.tobytes())
+                except OSError:
+                    return
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0].texts)
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._encode(batch)
+
+    def _encode(self, batch):
+        texts = [text for request in batch for text in request.texts]
+        try:
+            vectors = np.asarray(self.embedder.encode(
+                texts,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            ), dtype=np.float32).reshape(len(texts), -1)
+        except Exception as e:
+            vectors = None
+            for request in batch:
+                request.error = f"{type(e).__name__}: {e}"
+
+        self.batches += 1
+        self.texts += len(texts)
+        offset = 0
+        for request in batch:
+            if vectors is not None:
+                request.vectors = vectors[offset:offset + len(request.texts)]
+                offset += len(request.texts)
+            request.done.set()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. CLIENT
+# ──────────────────────────────────────────────────────────────────────────────
+
+class EmbeddingClient:
+    """Drop-in for SentenceTransformer.encode() that asks the embedding server (vectors come back normalized)."""
+
+    def __init__(self, path=SOCKET_PATH, timeout=REQUEST_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        # Per thread, and reopened after a fork: a socket must not be shared
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.conn = Client(self.path, family="AF_UNIX")
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = self._local.pid = None
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+
+    def _request(self, texts: list) -> np.ndarray:
+        conn = self._connection()
+        conn.send_bytes(json.dumps({"texts": texts}).encode("utf-8"))
+        if not conn.poll(self.timeout):
+            self._close()  # a late reply would be read by the next request
+            raise TimeoutError(f"Embedding server did not answer within {self.timeout}s")
+        header = json.loads(conn.recv_bytes())
+        if "error" in header:
+            raise RuntimeError(f"Embedding server failed: {header['error']}")
+        return np.frombuffer(conn.recv_bytes(), dtype=np.float32).reshape(header["shape"])
+
+    def encode(self, sentences, normalize_embeddings=True, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        try:
+            vectors = self._request(texts)
+        except TimeoutError:
+            raise
+        except (EOFError, OSError):
+            # The server restarted since this connection was opened: retry once
+            self._close()
+            vectors = self._request(texts)
+        return vectors[0] if single else vectors
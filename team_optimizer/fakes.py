@@ -0,0 +1,103 @@
+#fakes.py
+
+import re
+import time
+import asyncio
+import hashlib
+
+import numpy as np
+
+# Local stand-ins for external services, used by benchmarks and local runs.
+# Enable them with MOU_FAKE_LLM=1 / MOU_FAKE_EMBEDDER=1 (see resources.py).
+
+
+class FakeMessage:
+    """Minimal stand-in for a LangChain AIMessage / AIMessageChunk."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+    def __add__(self, other):
+        return FakeMessage(self.content + other.content)
+
+
+class FakeStreamingLLM:
+    """
+    Deterministic Gemini replacement: the same prompt always yields the same
+    MoU text, streamed in word chunks with configurable latency.
+    """
+
+    def __init__(self, first_token_latency=0.2, token_latency=0.005, words=400):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.words = words
+
+    def _text(self, prompt: str) -> str:
+        seed = hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+        lines = ["MEMORANDUM OF UNDERSTANDING", ""]
+        vocabulary = ["party", "shall", "agreement", "confidential", "term", "scope", "objective",
+                      "collaboration", "obligation", "notice", "law", "intellectual", "property"]
+        words = []
+        for i in range(self.words):
+            words.append(vocabulary[int(seed[i % len(seed)], 16) % len(vocabulary)])
+            if i % 60 == 59:
+                lines += [f"{len(lines) // 2}. SECTION", " ".join(words) + ".", ""]
+                words = []
+        if words:
+            lines.append(" ".join(words) + ".")
+        return "\n".join(lines)
+
+    def _chunks(self, prompt):
+        return [piece + " " for piece in self._text(prompt).split(" ")]
+
+    def invoke(self, prompt, *args, **kwargs):
+        time.sleep(self.first_token_latency + self.token_latency * self.words)
+        return FakeMessage(self._text(prompt))
+
+    def stream(self, prompt, *args, **kwargs):
+        time.sleep(self.first_token_latency)
+        for chunk in self._chunks(prompt):
+            time.sleep(self.token_latency)
+            yield FakeMessage(chunk)
+
+    async def ainvoke(self, prompt, *args, **kwargs):
+        await asyncio.sleep(self.first_token_latency + self.token_latency * self.words)
+        return FakeMessage(self._text(prompt))
+
+    async def astream(self, prompt, *args, **kwargs):
+        await asyncio.sleep(self.first_token_latency)
+        for chunk in self._chunks(prompt):
+            await asyncio.sleep(self.token_latency)
+            yield FakeMessage(chunk)
+
+
+class FakeEmbedder:
+    """
+    SentenceTransformer replacement: hashed bag-of-words vectors, so texts
+    sharing words are close. `batch_latency` + `text_latency` per text
+    simulate the model's cost.
+    """
+
+    def __init__(self, dim=384, batch_latency=0.002, text_latency=0.001):
+        self.dim = dim
+        self.batch_latency = batch_latency
+        self.text_latency = text_latency
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        return vector
+
+    def encode(self, sentences, normalize_embeddings=False, convert_to_numpy=True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        time.sleep(self.batch_latency + self.text_latency * len(texts))
+
+        matrix = np.stack([self._vector(text) for text in texts]) if texts else np.empty((0, self.dim), np.float32)
+        if normalize_embeddings:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms == 0, 1, norms)
+        return matrix[0] if single else matrix
@@ -0,0 +1,109 @@
+#instrumentation.py
+
+import os
+import time
+import uuid
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from .metrics import registry
+
+# Timers and trace spans around the pipeline's nodes and the slow calls inside
+# them (LLM, embeddings, clause index, SMTP; Mongo commands are timed by the
+# listener in mongo.py). Every timer feeds a latency histogram on
+# /api/metrics/. With MOU_TRACE=1 the same timers also record spans per
+# workflow id in the `traces` collection (see /api/jobs/<id>/trace/).
+
+TRACE_ENABLED = os.getenv("MOU_TRACE", "0") == "1"
+
+_workflow = contextvars.ContextVar("mou_workflow", default=None)
+_span = contextvars.ContextVar("mou_span", default=None)
+
+
+def traces_collection():
+    from .mongo import get_db
+    return get_db()["traces"]
+
+
+class _Span:
+    def __init__(self, name, workflow_id, parent, attrs):
+        self.name = name
+        self.workflow_id = workflow_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.attrs = attrs
+        self.started_at = datetime.now(timezone.utc)
+        self.seconds = None
+        self.error = None
+        # Children are flushed together with their root span, in one insert
+        self.finished = [] if parent is None else parent.finished
+
+    def as_doc(self):
+        return {
+            "workflow_id": self.workflow_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "started_at": self.started_at,
+            "seconds": self.seconds,
+            "attrs": self.attrs,
+            "error": self.error,
+        }
+
+
+@contextmanager
+def workflow_context(workflow_id):
+    """Spans opened inside this block (same thread/context) belong to `workflow_id`."""
+    token = _workflow.set(workflow_id)
+    try:
+        yield
+    finally:
+        _workflow.reset(token)
+
+
+@contextmanager
+def timed(metric: str, span: str = None, ignore: tuple = (), **labels):
+    """
+    Observes the block's duration in the `metric` histogram (labels as given)
+    and, when tracing a workflow, records it as span `span` (default: metric).
+    Exceptions are counted in `<metric>_errors_total` and re-raised, except
+    `ignore` types (control flow such as LangGraph interrupts).
+    """
+    workflow_id = _workflow.get()
+    current = None
+    if TRACE_ENABLED and workflow_id:
+        current = _Span(span or metric, workflow_id, _span.get(), {k: str(v) for k, v in labels.items()})
+    token = _span.set(current) if current else None
+
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        if not isinstance(e, ignore):
+            registry.counter(f"{metric}_errors_total", **labels).inc()
+            if current:
+                current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        registry.histogram(metric, **labels).observe(seconds)
+        if current:
+            _span.reset(token)
+            current.seconds = round(seconds, 6)
+            current.finished.append(current.as_doc())
+            if current.parent is None:
+                _flush(current.finished)
+
+
+def _flush(spans):
+    try:
+        traces_collection().insert_many(spans, ordered=False)
+    except Exception as e:
+        # Tracing must never break a workflow
+        print("⚠️ Could not store trace spans:", e)
+
+
+def get_trace(workflow_id: str) -> list:
+    spans = traces_collection().find({"workflow_id": workflow_id}, {"_id": 0}).sort("started_at", 1)
+    return [{**span, "started_at": span["started_at"].isoformat()} for span in spans]
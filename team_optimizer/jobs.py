@@ -0,0 +1,548 @@
+#jobs.py
+
+import os
+import uuid
+import socket
+import asyncio
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+from .langgraph_flow import get_graph
+from .outbox import workflow_deliveries
+from .mongo import get_db, get_async_db
+from .metrics import registry
+from .instrumentation import timed, workflow_context
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. JOB STORE & WORKER POOL
+# ──────────────────────────────────────────────────────────────────────────────
+
+MAX_WORKERS = int(os.getenv("MOU_JOB_WORKERS", "32"))
+
+# A running job's lease is renewed by its process; once it lapses (crash,
+# redeploy) any process's waker resumes the job from its last checkpoint.
+JOB_LEASE_SECONDS = float(os.getenv("MOU_JOB_LEASE_SECONDS", "300"))
+WAKER_POLL_SECONDS = float(os.getenv("MOU_JOB_WAKER_POLL_SECONDS", "30"))
+WAKER_INPROCESS = os.getenv("MOU_JOB_WAKER_INPROCESS", "1") == "1"
+
+# Async pipeline (ASGI only): jobs run as tasks on the server's event loop via
+# graph.astream instead of holding a pool thread each
+ASYNC_PIPELINE = os.getenv("MOU_ASYNC_PIPELINE", "0") == "1"
+
+_active = set()  # ids of jobs running in this process
+_pending = set() # ids handed to the worker pool / event loop but not started yet
+_jobs_lock = threading.Lock()
+_loop = None     # event loop async jobs run on (set by asubmit_job)
+_tasks = set()   # running async jobs; the loop itself only keeps weak references
+
+
+def _worker_id() -> str:
+    # Evaluated per call: forked web workers must not share an id
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="mou-job")
+
+# Fields of the final graph state that are returned to the client
+RESULT_FIELDS = {
+    "draft_text": "",
+    "retrieved_clauses": [],
+    "emails_sent": [],
+    "delivery_results": [],
+    "approval_status": {},
+    "overall_mou_status": "",
+    "version_number": "",
+    "version_diff": "",
+    "pdf_url": "",
+    "node_timings": {},
+}
+
+
+def job_collection():
+    # Job records live in Mongo so any Django worker can answer status requests,
+    # while the pipeline itself runs on this process's thread pool.
+    return get_db()["jobs"]
+
+
+def async_job_collection():
+    return get_async_db()["jobs"]
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def summarize_result(state: dict) -> dict:
+    """Picks the client-facing fields out of a final pipeline state."""
+    return {key: state.get(key, default) for key, default in RESULT_FIELDS.items()}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. RUNNING A JOB
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _node_event(node: str, update: dict) -> dict:
+    # The draft text already reached streaming clients token by token; resend
+    # the cleaned-up version once with the drafting node only
+    fields = {
+        key: value for key, value in (update or {}).items()
+        if key in RESULT_FIELDS and (key != "draft_text" or node == "drafting")
+    }
+    return {"event": "node", "node": node, "data": fields}
+
+
+def _thread_config(job_id: str) -> dict:
+    return {"configurable": {"thread_id": job_id}}
+
+
+def _resume_input(graph, job_id: str, data: dict):
+    """
+    What to feed graph.stream to continue a job from its checkpoint: a resume
+    Command for a parked run, None to carry on after the last completed step
+    (a no-op if the run had already finished), or the original input if it
+    never checkpointed. Returns (input, state so far).
+    """
+    from langgraph.types import Command
+
+    snapshot = graph.get_state(_thread_config(job_id))
+    if not snapshot.values:
+        return data, data
+    if any(task.interrupts for task in snapshot.tasks):
+        return Command(resume={"resumed_at": _now().isoformat()}), snapshot.values
+    return None, snapshot.values
+
+
+async def _aresume_input(graph, job_id: str, data: dict):
+    from langgraph.types import Command
+
+    snapshot = await graph.aget_state(_thread_config(job_id))
+    if not snapshot.values:
+        return data, data
+    if any(task.interrupts for task in snapshot.tasks):
+        return Command(resume={"resumed_at": _now().isoformat()}), snapshot.values
+    return None, snapshot.values
+
+
+# Job record updates (shared by the thread and event-loop runners)
+
+def _running_update() -> dict:
+    return {"$set": {
+        "status": "running",
+        "started_at": _now(),
+        "worker": _worker_id(),
+        "lease_until": _now() + timedelta(seconds=JOB_LEASE_SECONDS),
+    }}
+
+
+def _progress_update(node: str) -> dict:
+    return {
+        "$set": {"current_node": node},
+        "$push": {"progress": {"node": node, "finished_at": _now()}}
+    }
+
+
+def _waiting_update(wake_at: datetime, waiting_on) -> dict:
+    return {
+        "$set": {"status": "waiting", "wake_at": wake_at, "waiting_on": waiting_on},
+        "$unset": {"lease_until": "", "worker": ""}
+    }
+
+
+def _succeeded_update(final_state: dict) -> dict:
+    return {
+        "$set": {
+            "status": "succeeded",
+            "finished_at": _now(),
+            "result": summarize_result(final_state)
+        },
+        "$unset": {"lease_until": "", "worker": "", "wake_at": "", "waiting_on": ""}
+    }
+
+
+def _failed_update(error: Exception) -> dict:
+    # The checkpoint is kept, so a failed job can still be resumed by hand
+    return {
+        "$set": {"status": "failed", "finished_at": _now(), "error": str(error)},
+        "$unset": {"lease_until": "", "worker": ""}
+    }
+
+
+def _stream_modes(listener) -> list:
+    # "updates" tells us which node just finished, "values" carries the state,
+    # "custom" carries draft tokens written by draft_mou
+    return ["updates", "values", "custom"] if listener else ["updates", "values"]
+
+
+def _job_dispatched(job_id: str):
+    with _jobs_lock:
+        _pending.add(job_id)
+
+
+def _job_started(job_id: str):
+    with _jobs_lock:
+        _pending.discard(job_id)
+        _active.add(job_id)
+    registry.gauge("mou_jobs_running").inc()
+
+
+def _job_finished(job_id: str, outcome: str):
+    with _jobs_lock:
+        _active.discard(job_id)
+    registry.gauge("mou_jobs_running").dec()
+    registry.counter("mou_jobs_total", outcome=outcome).inc()
+
+
+def _run_job(job_id: str, data: dict, listener=None, resume=False):
+    """
+    Runs (or, with resume=True, continues) the pipeline for one job.
+    `listener`, if given, is called with {"event": "token" | "node" | "waiting"
+    | "done" | "error", ...} dicts as the run progresses.
+    """
+    notify = listener or (lambda _event: None)
+    _job_started(job_id)
+    outcome = "failed"
+
+    # One root span per run: node and sub-call spans nest under it in the trace
+    try:
+        job_collection().update_one({"_id": job_id}, _running_update())
+        with workflow_context(job_id), timed("mou_job_run_seconds", span="job.run"):
+            outcome = _stream_job(job_id, data, notify, listener, resume)
+    except Exception as e:
+        traceback.print_exc()
+        job_collection().update_one({"_id": job_id}, _failed_update(e))
+        notify({"event": "error", "error": str(e)})
+
+    finally:
+        _job_finished(job_id, outcome)
+
+
+def _stream_job(job_id: str, data: dict, notify, listener, resume) -> str:
+    """Streams the graph for one job; returns "succeeded" or "waiting"."""
+    graph = get_graph()
+    config = _thread_config(job_id)
+    inputs, final_state = data, data
+    if resume and graph.checkpointer is not None:
+        inputs, final_state = _resume_input(graph, job_id, data)
+        print(f"♻️ Resuming job {job_id} from its checkpoint")
+
+    parked = None
+    for mode, chunk in graph.stream(inputs, config, stream_mode=_stream_modes(listener)):
+        if mode == "values":
+            final_state = chunk
+            continue
+
+        if mode == "custom":
+            notify(chunk)
+            continue
+
+        if "__interrupt__" in chunk:
+            parked = chunk["__interrupt__"][0].value
+            continue
+
+        for node, update in chunk.items():
+            print(f"📍 Job {job_id}: node '{node}' finished")
+            notify(_node_event(node, update))
+            job_collection().update_one({"_id": job_id}, _progress_update(node))
+
+    if parked is not None:
+        # Release the worker thread; the waker resumes the job from its checkpoint
+        wake_at = datetime.fromtimestamp(parked["wake_at"], timezone.utc)
+        job_collection().update_one({"_id": job_id}, _waiting_update(wake_at, parked["waiting_on"]))
+        print(f"💤 Job {job_id} parked until {wake_at.isoformat()}")
+        notify({"event": "waiting", "wake_at": wake_at.isoformat(), "result": summarize_result(final_state)})
+        return "waiting"
+
+    job_collection().update_one({"_id": job_id}, _succeeded_update(final_state))
+    if graph.checkpointer is not None:
+        graph.checkpointer.delete_thread(job_id)
+    notify({"event": "done", "result": summarize_result(final_state)})
+    return "succeeded"
+
+
+async def _arun_job(job_id: str, data: dict, listener=None, resume=False):
+    """_run_job for the async pipeline: graph.astream and Mongo calls on the event loop."""
+    notify = listener or (lambda _event: None)
+    _job_started(job_id)
+    outcome = "failed"
+    jobs = async_job_collection()
+
+    try:
+        await jobs.update_one({"_id": job_id}, _running_update())
+        with workflow_context(job_id), timed("mou_job_run_seconds", span="job.run"):
+            outcome = await _astream_job(job_id, data, notify, listener, resume)
+    except Exception as e:
+        traceback.print_exc()
+        await jobs.update_one({"_id": job_id}, _failed_update(e))
+        notify({"event": "error", "error": str(e)})
+
+    finally:
+        _job_finished(job_id, outcome)
+
+
+async def _astream_job(job_id: str, data: dict, notify, listener, resume) -> str:
+    graph = get_graph()
+    jobs = async_job_collection()
+    config = _thread_config(job_id)
+    inputs, final_state = data, data
+    if resume and graph.checkpointer is not None:
+        inputs, final_state = await _aresume_input(graph, job_id, data)
+        print(f"♻️ Resuming job {job_id} from its checkpoint")
+
+    parked = None
+    async for mode, chunk in graph.astream(inputs, config, stream_mode=_stream_modes(listener)):
+        if mode == "values":
+            final_state = chunk
+            continue
+
+        if mode == "custom":
+            notify(chunk)
+            continue
+
+        if "__interrupt__" in chunk:
+            parked = chunk["__interrupt__"][0].value
+            continue
+
+        for node, update in chunk.items():
+            print(f"📍 Job {job_id}: node '{node}' finished")
+            notify(_node_event(node, update))
+            await jobs.update_one({"_id": job_id}, _progress_update(node))
+
+    if parked is not None:
+        wake_at = datetime.fromtimestamp(parked["wake_at"], timezone.utc)
+        await jobs.update_one({"_id": job_id}, _waiting_update(wake_at, parked["waiting_on"]))
+        print(f"💤 Job {job_id} parked until {wake_at.isoformat()}")
+        notify({"event": "waiting", "wake_at": wake_at.isoformat(), "result": summarize_result(final_state)})
+        return "waiting"
+
+    await jobs.update_one({"_id": job_id}, _succeeded_update(final_state))
+    if graph.checkpointer is not None:
+        await graph.checkpointer.adelete_thread(job_id)
+    notify({"event": "done", "result": summarize_result(final_state)})
+    return "succeeded"
+
+
+def _spawn(job_id: str, data: dict, listener=None, resume=False):
+    # Must run on _loop; keeps a reference so the task is not collected mid-run
+    task = _loop.create_task(_arun_job(job_id, data, listener, resume))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def _dispatch(job_id: str, data: dict, listener=None, resume=False):
+    """Starts a job on the async pipeline's event loop if there is one, else on the worker pool."""
+    # Its lease is renewed from now on, even while it waits for a free worker
+    _job_dispatched(job_id)
+    if ASYNC_PIPELINE and _loop is not None and _loop.is_running():
+        # Thread-safe: the waker thread dispatches resumed jobs through here too
+        _loop.call_soon_threadsafe(_spawn, job_id, data, listener, resume)
+    else:
+        _executor.submit(_run_job, job_id, data, listener, resume)
+
+
+def _queued_job(job_id: str, data: dict) -> dict:
+    return {
+        "_id": job_id,
+        "status": "queued",
+        "created_at": _now(),
+        "current_node": None,
+        "progress": [],
+        "input": data,
+        "worker": _worker_id(),
+        "lease_until": _now() + timedelta(seconds=JOB_LEASE_SECONDS),
+    }
+
+
+def submit_job(data: dict, listener=None) -> str:
+    """Records a queued job, hands it to the worker pool and returns its id."""
+    job_id = uuid.uuid4().hex
+
+    job_collection().insert_one(_queued_job(job_id, data))
+
+    # The job id doubles as the workflow id (outbox keys, checkpoints, traces)
+    _dispatch(job_id, {**data, "workflow_id": job_id}, listener)
+    if WAKER_INPROCESS:
+        waker.start()
+    print(f"📥 Queued MoU job {job_id}")
+    return job_id
+
+
+async def asubmit_job(data: dict, listener=None) -> str:
+    """submit_job for async views: the job runs as a task on the calling event loop."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    job_id = uuid.uuid4().hex
+
+    await async_job_collection().insert_one(_queued_job(job_id, data))
+
+    _job_dispatched(job_id)
+    _spawn(job_id, {**data, "workflow_id": job_id}, listener)
+    if WAKER_INPROCESS:
+        waker.start()
+    print(f"📥 Queued MoU job {job_id}")
+    return job_id
+
+
+def resume_job(job_id: str) -> bool:
+    """Resumes a parked, failed or orphaned job from its last checkpoint."""
+    now = _now()
+    doc = job_collection().find_one_and_update(
+        {"_id": job_id, "$or": [
+            {"status": {"$in": ["waiting", "failed"]}},
+            # A queued or running job is only an orphan once its worker's lease ran out
+            {"status": {"$in": ["queued", "running"]}, "lease_until": {"$not": {"$gt": now}}},
+        ]},
+        {"$set": {"status": "queued", "worker": _worker_id(),
+                  "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS)}},
+        projection={"input": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        return False
+    _dispatch(job_id, {**doc["input"], "workflow_id": job_id}, None, True)
+    return True
+
+
+def wake_jobs_waiting_on(email: str):
+    """Makes parked jobs waiting on `email` due now (any process's waker picks them up)."""
+    result = job_collection().update_many(
+        {"status": "waiting", "waiting_on": email},
+        {"$set": {"wake_at": _now()}}
+    )
+    if result.modified_count and WAKER_INPROCESS:
+        waker.start()
+        waker.wake()
+
+
+async def awake_jobs_waiting_on(email: str):
+    result = await async_job_collection().update_many(
+        {"status": "waiting", "waiting_on": email},
+        {"$set": {"wake_at": _now()}}
+    )
+    if result.modified_count and WAKER_INPROCESS:
+        waker.start()
+        waker.wake()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. WAKER (parked and orphaned jobs)
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _busy_workers() -> int:
+    with _jobs_lock:
+        return len(_active) + len(_pending)
+
+
+class JobWaker:
+    """
+    Background thread that keeps this process's job leases fresh and resumes
+    jobs from their checkpoints: parked jobs once they are due, and jobs whose
+    worker died (lease expired) after a crash or redeploy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self.run_forever, name="job-waker", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def _claim(self):
+        now = _now()
+        due = [{"status": "waiting", "wake_at": {"$lte": now}}]
+        if get_graph().checkpointer is not None:
+            # Without checkpoints an orphan would restart from scratch; leave it failed-in-place
+            due.append({"status": {"$in": ["queued", "running"]}, "lease_until": {"$lte": now}})
+        return job_collection().find_one_and_update(
+            {"$or": due},
+            {
+                "$set": {"status": "queued", "worker": _worker_id(),
+                         "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS)},
+                "$inc": {"resumes": 1},
+            },
+            projection={"input": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def run_once(self) -> int:
+        # Queued jobs too: one still waiting for a pool thread must not look
+        # orphaned to another process's waker
+        with _jobs_lock:
+            owned = list(_active | _pending)
+        if owned:
+            job_collection().update_many(
+                {"_id": {"$in": owned}, "worker": _worker_id()},
+                {"$set": {"lease_until": _now() + timedelta(seconds=JOB_LEASE_SECONDS)}}
+            )
+
+        # Claim only what the pool can start now: a claimed job sits on its
+        # lease, so claiming more than that just delays it
+        resumed = 0
+        while _busy_workers() < MAX_WORKERS:
+            doc = self._claim()
+            if doc is None:
+                break
+            _dispatch(doc["_id"], {**doc["input"], "workflow_id": doc["_id"]}, None, True)
+            resumed += 1
+        return resumed
+
+    def run_forever(self):
+        while not self._stopping:
+            try:
+                self.run_once()
+            except Exception:
+                traceback.print_exc()
+            self._wake.wait(WAKER_POLL_SECONDS)
+            self._wake.clear()
+
+
+waker = JobWaker()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 4. READING JOBS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _serialize(job: dict) -> dict:
+    job["job_id"] = job.pop("_id")
+    job.pop("lease_until", None)
+    for key in ("created_at", "started_at", "finished_at", "wake_at"):
+        if job.get(key):
+            job[key] = job[key].isoformat()
+    job["progress"] = [
+        {**step, "finished_at": step["finished_at"].isoformat()}
+        for step in job.get("progress", [])
+    ]
+    return job
+
+
+def get_job(job_id: str):
+    """Returns the job's status, per-node progress and email deliveries, without the result."""
+    job = job_collection().find_one({"_id": job_id}, {"input": 0, "result": 0})
+    if job is None:
+        return None
+    # The run only queues emails; the outbox records whether each one went out
+    job["deliveries"] = workflow_deliveries(job_id)
+    return _serialize(job)
+
+
+def get_job_result(job_id: str):
+    """Returns the full job record including the result once it is finished."""
+    job = job_collection().find_one({"_id": job_id}, {"input": 0})
+    return _serialize(job) if job else None
@@ -2,67 +2,61 @@
 
 import os
 from dotenv import load_dotenv
-from pymongo import MongoClient
 from langchain_core.tools import tool
 
-from langgraph.graph import StateGraph, END
-from langchain_core.runnables import RunnableLambda
-from langchain_google_genai import ChatGoogleGenerativeAI
 
-import chromadb
-from sentence_transformers import SentenceTransformer
-
-import smtplib
-from email.mime.text import MIMEText
-
-from difflib import unified_diff
-
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
-from io import BytesIO
-import base64
 
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 import json
-
 import time
+import uuid
+import asyncio
+import threading
+from typing import Annotated, Optional, TypedDict
+
+from . import repository
+from . import approval_events
+from .approval_events import approval_bus
+from .resources import get_llm, LLM_MODEL_NAME
+from .llm_cache import get_llm_cache, prompt_key
+from .clause_retrieval import search_clauses, asearch_clauses
+from . import outbox
+from .mailer import send_message, prewarm_smtp
+from . import version_store
+from .pdf_artifacts import draft_hash, get_or_render
+from .metrics import registry
+from .instrumentation import timed, workflow_context
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 1. ENVIRONMENT & DB SETUP
 # ──────────────────────────────────────────────────────────────────────────────
 load_dotenv()
 
-# LLM for drafting
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    temperature=0.5
-)
-
-# MongoDB for storing drafts
-client = MongoClient(os.getenv("MONGO_URI"))
-db = client["AgenticAI"]
-draft_collection = db["MoUDrafts"]
+# MongoDB access goes through the shared, pooled client in repository.py
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 2. CHROMADB VECTOR STORE SETUP (INGESTED ALREADY)
+# 2. LLM, CHROMADB & EMBEDDER (INGESTED ALREADY)
 # ──────────────────────────────────────────────────────────────────────────────
 
-chroma_client = chromadb.PersistentClient(path="./clause_chromadb")
-clause_collection = chroma_client.get_or_create_collection(name="clauses")
-
-# Sentence-Transformer for embeddings
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+# Gemini, the Chroma collection and the SentenceTransformer are created lazily
+# on first use by resources.py (get_llm / get_clause_collection / get_embedder).
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 3. AGENT 1: MoU Drafting
 # ──────────────────────────────────────────────────────────────────────────────
 
-def draft_mou(state: dict):
-    print("🔁 Drafting MoU with form data:", state)
+def _stream_writer():
+    """LangGraph's custom-stream writer, or a no-op outside a streaming graph run."""
+    try:
+        from langgraph.config import get_stream_writer
+        return get_stream_writer()
+    except (ImportError, RuntimeError, KeyError):
+        return lambda _chunk: None
 
 
-    prompt = f"""
+def _draft_prompt(state: dict) -> str:
+    return f"""
 You are a legal assistant. Create a formal Memorandum of Understanding (MoU) document.
 
 Details:
@@ -74,54 +68,100 @@ Details:
 
 Respond in professional business language. Format as an MoU.Dont reveal that it is ai generated in the content    
 """ 
-    response = llm.invoke(prompt)
-    draft = response.content.replace("**", "").strip()
-
-    # ✅ Generate PDF using ReportLab
-    pdf_buffer = BytesIO()
-    p = canvas.Canvas(pdf_buffer, pagesize=A4)
-    width, height = A4
-    p.setFont("Helvetica", 12)
-
-    y = height - 50  # Start from top margin
-
-    for line in draft.split("\n"):
-        if y < 50:
-            p.showPage()
-            p.setFont("Helvetica", 12)
-            y = height - 50
-        p.drawString(50, y, line.strip())
-        y -= 20  # Line spacing
-
-    p.showPage()
-    p.save()
-
-    # ✅ Encode PDF to base64
-    pdf_buffer.seek(0)
-    pdf_bytes = pdf_buffer.getvalue()
-    pdf_base64 = base64.b64encode(pdf_bytes).decode("utf-8")
-
-    # ✅ Versioning
-    company_drafts = list(draft_collection.find({"company_name": state["company_name"]}))
-    version = f"v{len(company_drafts) + 1}"
-
-    # ✅ Save to MongoDB
-    draft_collection.insert_one({
-        "company_name": state["company_name"],
-        "draft": draft,
-        "type": state["partnership_type"],
-        "version": version,
-        "pdf_base64": pdf_base64
-    })
-
-    print("✅ Draft + PDF saved to MongoDB.")
-    print("📄 Draft Text:", draft)
 
+
+class _DraftStream:
+    """Collects streamed chunks, forwarding each to SSE clients as it arrives."""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.parts = []
+        self.start = time.perf_counter()
+
+    def add(self, chunk):
+        if chunk.content:
+            if not self.parts:
+                registry.histogram("llm_first_token_seconds", model=LLM_MODEL_NAME).observe(
+                    time.perf_counter() - self.start
+                )
+            self.parts.append(chunk.content)
+            self.writer({"event": "token", "text": chunk.content})
+
+    def text(self) -> str:
+        registry.counter("llm_output_chars_total", model=LLM_MODEL_NAME).inc(sum(map(len, self.parts)))
+        return "".join(self.parts).replace("**", "").strip()
+
+
+def _draft_result(draft: str, source: str, writer) -> dict:
+    if source != "miss":
+        print(f"♻️ Reusing draft ({source})")
+        writer({"event": "token", "text": draft})
+
+    print(f"📄 Draft ready ({len(draft)} chars)")
+    return {"draft_text": draft}
+
+
+def draft_mou(state: dict):
+    print(f"🔁 Drafting MoU for {state['company_name']} ({state['partnership_type']})")
+    prompt = _draft_prompt(state)
+    writer = _stream_writer()
+
+    def generate():
+        # Stream the response so SSE clients see the draft as it is written
+        stream = _DraftStream(writer)
+        with timed("llm_seconds", span="llm.stream", model=LLM_MODEL_NAME):
+            for chunk in get_llm().stream(prompt):
+                stream.add(chunk)
+        return stream.text()
+
+    # Identical submissions reuse a cached draft, and concurrent ones (double
+    # clicks, retries) share a single Gemini call; force_regenerate skips the cache
+    draft, source = get_llm_cache().get_or_compute(
+        prompt_key(prompt, LLM_MODEL_NAME),
+        generate,
+        force=bool(state.get("force_regenerate")),
+    )
+    return _draft_result(draft, source, writer)
+
+
+async def adraft_mou(state: dict):
+    """draft_mou for the async pipeline: astream, and cache waits that do not block the loop."""
+    print(f"🔁 Drafting MoU for {state['company_name']} ({state['partnership_type']})")
+    prompt = _draft_prompt(state)
+    writer = _stream_writer()
+
+    async def generate():
+        stream = _DraftStream(writer)
+        with timed("llm_seconds", span="llm.stream", model=LLM_MODEL_NAME):
+            async for chunk in get_llm().astream(prompt):
+                stream.add(chunk)
+        return stream.text()
+
+    draft, source = await get_llm_cache().aget_or_compute(
+        prompt_key(prompt, LLM_MODEL_NAME),
+        generate,
+        force=bool(state.get("force_regenerate")),
+    )
+    return _draft_result(draft, source, writer)
+
+
+def persist_draft(state: dict):
+    """Versions and saves the draft (runs alongside clause retrieval)."""
+    # ✅ Versioning + save: stored as a delta against the previous version, or
+    # not at all when it repeats the latest one (its version is reused).
+    # The PDF is rendered on first download (see pdf_artifacts)
+    saved = version_store.save_version(state["company_name"], state["draft_text"], state["partnership_type"])
+    draft_id = saved["draft_id"]
+
+    if saved["unchanged"]:
+        print(f"✅ Draft unchanged, reusing {saved['version']}.")
+    else:
+        print("✅ Draft saved to MongoDB.")
     return {
-        **state,
-        "draft_text": draft,
-        "version_number": version,
-        "pdf_base64": pdf_base64
+        "version_number": saved["version"],
+        "draft_id": draft_id,
+        "previous_version": saved["previous"],
+        "pdf_url": f"/api/drafts/{draft_id}/pdf/"
     }
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -131,69 +171,66 @@ Respond in professional business language. Format as an MoU.Dont reveal that it
 def retrieve_clauses(state: dict):
     """
     Agent 2: Retrieve top-5 clauses, including their IDs, using raw chromadb client.
+
+    In "sections" mode (default) every section of the draft is embedded in one
+    batch and queried in one call, then merged by reciprocal rank fusion.
     """
     draft = state.get("draft_text", "")
     print("🔎 Retrieving clauses for draft length:", len(draft))
 
-    # 1) Embed the draft
-    query_emb = embedder.encode(draft).tolist()
-
-    # 2) Query raw ChromaDB (no include arg needed)
-    results = clause_collection.query(
-        query_embeddings=[query_emb],
-        n_results=5
+    # Filter to this partnership type (plus "All") inside Chroma, before the ANN search
+    retrieved = search_clauses(
+        draft,
+        mode=state.get("retrieval_mode"),
+        partnership_type=state.get("partnership_type"),
     )
-    print("🔍 Query results:", results)
-
-    ids       = results["ids"][0]        # List[str]
-    texts     = results["documents"][0]  # List[str]
-    metadatas = results["metadatas"][0]  # List[dict]
-
-    # 3) Zip into structured list
-    retrieved = []
-    for i in range(len(ids)):
-        retrieved.append({
-            "clause_id": ids[i],
-            "clause_type": metadatas[i].get("clause_type"),
-            "partnership_type": metadatas[i].get("partnership_type"),
-            "text": texts[i]
-        })
 
     # print("📚 Retrieved Clauses:", retrieved)
-    return {
-        **state,
-        "retrieved_clauses": retrieved
-    }
+    return {"retrieved_clauses": retrieved}
+
+
+async def aretrieve_clauses(state: dict):
+    # Embedding and search are CPU-bound: they run on the embedding executor
+    draft = state.get("draft_text", "")
+    print("🔎 Retrieving clauses for draft length:", len(draft))
+    retrieved = await asearch_clauses(
+        draft,
+        mode=state.get("retrieval_mode"),
+        partnership_type=state.get("partnership_type"),
+    )
+    return {"retrieved_clauses": retrieved}
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 # 5. AGENT 3: Communication Handler Agent
 # ──────────────────────────────────────────────────────────────────────────────
+DRAFT_EMAIL_SUBJECT = "MoU Draft for Review"
+REMINDER_EMAIL_SUBJECT = "Reminder: MoU Draft Awaiting Your Approval"
+
+# Seconds to wait after each notification before the next reminder (the last
+# value repeats), and how many reminder rounds to send before giving up.
+REMINDER_SCHEDULE = [
+    float(s) for s in os.getenv("MOU_REMINDER_SCHEDULE", "86400").split(",") if s.strip()
+]
+MAX_REMINDERS = int(os.getenv("MOU_MAX_REMINDERS", "3"))
+
+
 @tool
 def get_stakeholders_from_db() -> list:
     """Fetches all stakeholders from the 'stakeholders' collection in MongoDB."""
 
-    client = MongoClient(os.getenv("MONGO_URI"))
-    db = client["AgenticAI"]
-    collection_stakeholders = db["stakeholders"]
-
-    stakeholders = list(collection_stakeholders.find({}, {"_id": 0}))
-    print("👥 Retrieved Stakeholders:", stakeholders)
+    stakeholders = repository.list_stakeholders()
+    print("👥 Retrieved Stakeholders:", len(stakeholders))
     return stakeholders
 
-@tool(description="Send MoU draft email to a stakeholder using their name, email, and draft content.")
-def send_email_to_stakeholder(name: str, email: str, draft_text: str, retrieved_clauses: list) -> str:
-    sender_email = "rahulsnsihub@gmail.com"
-    app_password = os.getenv("GMAIL_APP_PWD")
-    print("📌 Loaded App Password:", app_password)
-
+def compose_draft_email(name: str, draft_text: str, retrieved_clauses: list) -> str:
     # Format clause text nicely
     clauses_str = "\n\n".join(
         [f"Clause {i+1}: {c['text']}" for i, c in enumerate(retrieved_clauses)]
     )
 
     # Compose the full email
-    email_body = f"""
+    return f"""
 Dear {name},
 
 Please find the initial draft of the MoU below:
@@ -211,48 +248,136 @@ Regards,
 MoU-GENIUS Agent
 """
 
-    msg = MIMEText(email_body)
-    msg["Subject"] = "MoU Draft for Review"
-    msg["From"] = sender_email
-    msg["To"] = email
 
-    try:
-        server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
-        server.login(sender_email, app_password)
-        server.sendmail(sender_email, [email], msg.as_string())
-        server.quit()
+@tool(description="Send MoU draft email to a stakeholder using their name, email, and draft content.")
+def send_email_to_stakeholder(name: str, email: str, draft_text: str, retrieved_clauses: list) -> str:
+    result = send_message(email, DRAFT_EMAIL_SUBJECT, compose_draft_email(name, draft_text, retrieved_clauses))
 
+    if result["status"] == "sent":
         print(f"📨 Real email sent to {email}")
         return f"Email sent to {email}"
 
-    except Exception as e:
-        print("❌ Email failed:", e)
-        return "Email failed"
+    print(f"❌ Email to {email} failed:", result["error"])
+    return f"Email to {email} failed: {result['error']}"
+
+
+def compose_reminder_email(name: str, status: str) -> str:
+    return f"""
+Dear {name},
+
+This is a reminder that the MoU draft shared with you earlier is still awaiting
+your approval (current status: {status}).
+
+--- Link for the approval ---
+Link : http://localhost:5173/approval
+
+Regards,
+MoU-GENIUS Agent
+"""
+
+
+def next_reminder_due(state: dict):
+    """Epoch seconds when the next reminder round may go out, or None once the cap is reached."""
+    reminder_round = state.get("reminder_round", 0)
+    if reminder_round >= MAX_REMINDERS or not REMINDER_SCHEDULE:
+        return None
+    delay = REMINDER_SCHEDULE[min(reminder_round, len(REMINDER_SCHEDULE) - 1)]
+    return state.get("last_notified_at", time.time()) + delay
+
+
+def _notification_round(state: dict, stakeholders) -> tuple:
+    """
+    Messages for the next notification round plus the state keys they imply.
+    `stakeholders` is only needed for the first round.
+    """
+    retrieved_clauses = state.get("retrieved_clauses", [])
+    workflow_id = state.get("workflow_id") or uuid.uuid4().hex
+    reminder_round = state.get("reminder_round", -1) + 1
+
+    if reminder_round == 0:
+        # 1. First pass: full draft + clauses to every stakeholder
+        messages = [
+            {
+                "to": person["email"],
+                "subject": DRAFT_EMAIL_SUBJECT,
+                "body": compose_draft_email(person["name"], state["draft_text"], retrieved_clauses)
+            }
+            for person in stakeholders
+        ]
+        sent_emails = [person["email"] for person in stakeholders]
+        contacts = [{"name": person["name"], "email": person["email"]} for person in stakeholders]
+    else:
+        # 1. Reminder pass: short note, only to people who have not approved yet
+        contacts = state.get("stakeholder_contacts", [])
+        approval_status = state.get("approval_status", {})
+        pending = [
+            person for person in contacts
+            if approval_status.get(person["email"], "Pending").lower() != "approved"
+        ]
+        messages = [
+            {
+                "to": person["email"],
+                "subject": REMINDER_EMAIL_SUBJECT,
+                "body": compose_reminder_email(person["name"], approval_status.get(person["email"], "Pending"))
+            }
+            for person in pending
+        ]
+        sent_emails = state.get("emails_sent", [])
+
+    return messages, {
+        "workflow_id": workflow_id,
+        "reminder_round": reminder_round,
+        "stakeholder_contacts": contacts,
+        "emails_sent": sent_emails,
+    }
+
+
+def _first_round(state: dict) -> bool:
+    return state.get("reminder_round", -1) + 1 == 0
+
+
+def _communication_result(messages, update, delivery_results) -> dict:
+    print(f"✅ Emails Queued For: {[m['to'] for m in messages]} (round {update['reminder_round']})")
+    return {**update, "last_notified_at": time.time(), "delivery_results": delivery_results}
 
 
 def communication_agent(state: dict):
     print("📨 Starting Communication Agent...")
-    retrieved_clauses = state.get("retrieved_clauses", [])
+    stakeholders = None
+    if _first_round(state):
+        # Usually already loaded by the prefetch branch while drafting ran
+        stakeholders = state.get("stakeholders")
+        if stakeholders is None:
+            stakeholders = get_stakeholders_from_db.invoke({})
+    messages, update = _notification_round(state, stakeholders)
+
+    # 2. Queue the emails in the outbox; the dispatcher delivers (and retries)
+    #    them, so the graph never waits on SMTP
+    delivery_results = outbox.enqueue(
+        update["workflow_id"],
+        state.get("version_number", "v1"),
+        update["reminder_round"],
+        messages
+    )
+    return _communication_result(messages, update, delivery_results)
 
-    # 1. Get stakeholders
-    stakeholders = get_stakeholders_from_db.invoke({})
-
-    # 2. Send email to each
-    sent_emails = []
-    for person in stakeholders:
-        send_email_to_stakeholder.invoke({
-            "name": person["name"],
-            "email": person["email"],
-            "draft_text": state["draft_text"],
-            "retrieved_clauses": retrieved_clauses
-        })
-        sent_emails.append(person["email"])
-
-    print("✅ Emails Sent To:", sent_emails)
-    return {
-        **state,
-        "emails_sent": sent_emails
-    }
+
+async def acommunication_agent(state: dict):
+    print("📨 Starting Communication Agent...")
+    stakeholders = None
+    if _first_round(state):
+        stakeholders = state.get("stakeholders")
+        if stakeholders is None:
+            stakeholders = await repository.alist_stakeholders()
+    messages, update = _notification_round(state, stakeholders)
+
+    delivery_results = await outbox.aenqueue(
+        update["workflow_id"],
+        state.get("version_number", "v1"),
+        update["reminder_round"],
+        messages
+    )
+    return _communication_result(messages, update, delivery_results)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -261,11 +386,7 @@ def communication_agent(state: dict):
 
 @csrf_exempt
 def get_approvals(request):
-    client = MongoClient(os.getenv("MONGO_URI"))
-    db = client["AgenticAI"]
-    approvals = db["approvals"]
-
-    data = list(approvals.find({}, {"_id": 0}))  # excludes _id
+    data = repository.list_approvals()  # excludes _id
     return JsonResponse({"approvals": data}, safe=False)
 
 @csrf_exempt
@@ -276,12 +397,35 @@ def update_approval(request):
             email = data.get("email")
             status = data.get("status")
 
-            client = MongoClient(os.getenv("MONGO_URI"))
-            db = client["AgenticAI"]
-            approvals = db["approvals"]
+            if repository.set_approval_status(email, status):
+                # Wake any tracker in this process waiting on this stakeholder,
+                # and any parked workflow (in whichever process resumes it)
+                approval_bus.publish(email, status)
+                from .jobs import wake_jobs_waiting_on
+                wake_jobs_waiting_on(email)
+                return JsonResponse({"message": "Status updated successfully"})
+            else:
+                return JsonResponse({"message": "No changes made"}, status=200)
+
+        except Exception as e:
+            return JsonResponse({"error": str(e)}, status=500)
 
-            result = approvals.update_one({"email": email}, {"$set": {"status": status}})
-            if result.modified_count > 0:
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+
+@csrf_exempt
+async def update_approval_async(request):
+    """update_approval for the async pipeline (MOU_ASYNC_PIPELINE=1)."""
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            email = data.get("email")
+            status = data.get("status")
+
+            if await repository.aset_approval_status(email, status):
+                approval_bus.publish(email, status)
+                from .jobs import awake_jobs_waiting_on
+                await awake_jobs_waiting_on(email)
                 return JsonResponse({"message": "Status updated successfully"})
             else:
                 return JsonResponse({"message": "No changes made"}, status=200)
@@ -292,46 +436,121 @@ def update_approval(request):
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
 
+# With checkpointing on, a tracker that has waited PARK_AFTER_SECONDS in a
+# worker thread parks the run instead (see park_agent): the thread is released
+# and the job resumes from its checkpoint when an approval arrives or the next
+# reminder is due. MOU_PARK_AFTER_SECONDS=-1 keeps waiting in-thread.
+CHECKPOINTER = os.getenv("MOU_CHECKPOINTER", "mongo")  # "mongo" or "none"
+PARK_AFTER_SECONDS = float(os.getenv("MOU_PARK_AFTER_SECONDS", "60"))
+PARKED_RECHECK_SECONDS = float(os.getenv("MOU_PARKED_RECHECK_SECONDS", "3600"))
+PARKING_ENABLED = CHECKPOINTER != "none" and PARK_AFTER_SECONDS >= 0
+
+
+def _next_wait(approval_status: dict, reminder_due, started: float) -> tuple:
+    """
+    One pass of the tracker's wait loop. Returns (timeout, wake_at): how long
+    to wait for an approval event, or timeout None to stop waiting (with
+    wake_at set when the run should park instead).
+    """
+    all_approved = all(status.lower() == "approved" for status in approval_status.values())
+    idle_detected = any(status.lower() == "idle" for status in approval_status.values())
+
+    if all_approved:
+        return None, None
+
+    if reminder_due is None:
+        # No reminders left: just wait for everyone to respond
+        if not idle_detected:
+            return None, None
+        timeout = approval_events.RECHECK_SECONDS
+    else:
+        timeout = reminder_due - time.time()
+        if timeout <= 0:
+            return None, None  # next reminder round is due
+        timeout = min(timeout, approval_events.RECHECK_SECONDS)
+
+    if PARKING_ENABLED:
+        budget = PARK_AFTER_SECONDS - (time.monotonic() - started)
+        if budget <= 0:
+            return None, reminder_due or time.time() + PARKED_RECHECK_SECONDS
+        timeout = min(timeout, budget)
+    return timeout, None
+
+
 def approval_tracker_agent(state: dict):
     print("⏳ Running Approval Tracker Agent with Idle-Watch...")
 
     emails_sent = state.get("emails_sent", [])
-    idle_detected = True
+    approval_bus.ensure_watching(repository.approvals_collection())
+
+    reminder_due = next_reminder_due(state)
+    started = time.monotonic()
+
+    # Subscribe before reading so a change between the read and the wait is not lost
+    with approval_bus.subscribe(emails_sent) as subscription:
+        while True:
+            approval_status = repository.find_approval_statuses(emails_sent)
+            timeout, wake_at = _next_wait(approval_status, reminder_due, started)
+            if timeout is None:
+                break
 
-    while idle_detected:
-        approval_status = {}
-        idle_detected = False  # assume all are active initially
+            print("🕒 Waiting for approvals (or the next reminder)...")
+            subscription.wait(timeout)  # ⏳ Sleeps until update_approval / change stream fires
 
-        for email in emails_sent:
-            client = MongoClient(os.getenv("MONGO_URI"))
-            db = client["AgenticAI"]
-            approvals = db["approvals"]
+    return _approval_result(approval_status, wake_at)
 
-            result = approvals.find_one({"email": email}, {"_id": 0, "status": 1})
-            status = result.get("status", "Pending") if result else "Pending"
 
-            approval_status[email] = status
+async def aapproval_tracker_agent(state: dict):
+    """approval_tracker_agent for the async pipeline: waiting suspends a coroutine, not a thread."""
+    print("⏳ Running Approval Tracker Agent with Idle-Watch...")
+
+    emails_sent = state.get("emails_sent", [])
+    approval_bus.ensure_watching(repository.approvals_collection())
+
+    reminder_due = next_reminder_due(state)
+    started = time.monotonic()
 
-            if status.lower() == "idle":
-                idle_detected = True
+    with approval_bus.subscribe(emails_sent) as subscription:
+        while True:
+            approval_status = await repository.afind_approval_statuses(emails_sent)
+            timeout, wake_at = _next_wait(approval_status, reminder_due, started)
+            if timeout is None:
+                break
 
-        if idle_detected:
-            print("🕒 Some stakeholders still 'Idle'. Waiting for changes in DB...")
-            time.sleep(5)  # ⏳ Wait for 5 seconds and recheck
+            print("🕒 Waiting for approvals (or the next reminder)...")
+            await subscription.wait_async(timeout)
 
+    return _approval_result(approval_status, wake_at)
+
+
+def _approval_result(approval_status: dict, wake_at) -> dict:
     # ✅ Final pass: decide overall status
     all_approved = all(status.lower() == "approved" for status in approval_status.values())
     overall_status = "Approved" if all_approved else "Pending"
 
-    print("✅ Approval Status:", approval_status)
+    approved = sum(status.lower() == "approved" for status in approval_status.values())
+    print(f"✅ Approvals: {approved}/{len(approval_status)}")
     print("📝 Overall MoU Status:", overall_status)
 
     return {
-        **state,
         "approval_status": approval_status,
-        "overall_mou_status": overall_status
+        "overall_mou_status": overall_status,
+        "awaiting_approvals": wake_at is not None,
+        "wake_at": wake_at
     }
 
+
+def park_agent(state: dict):
+    """
+    Suspends the run until jobs.py resumes it (approval event or wake_at).
+    Nothing stays in memory meanwhile: the state is in the last checkpoint.
+    """
+    from langgraph.types import interrupt
+
+    resumed = interrupt({"wake_at": state.get("wake_at"), "waiting_on": state.get("emails_sent", [])})
+    print("⏰ Workflow resumed:", resumed)
+    return {"awaiting_approvals": False}
+
 # ──────────────────────────────────────────────────────────────────────────────
 # 7. Router AGENT : Router Decision Agent
 # ──────────────────────────────────────────────────────────────────────────────
@@ -340,9 +559,15 @@ def router_decision_agent(state: dict) -> str:
     print("🧭 Router Agent: Deciding next step...")
     status = state.get("overall_mou_status", "Pending").lower()
 
-    if status == "approved":
+    if state.get("awaiting_approvals"):
+        print("💤 Still waiting on approvals. Parking the workflow.")
+        return "park"
+    elif status == "approved":
         print("✅ MoU Approved. Proceeding to version controller.")
         return "version_controller"
+    elif state.get("reminder_round", 0) >= MAX_REMINDERS:
+        print("🛑 Reminder cap reached without full approval. Ending workflow.")
+        return "end"
     else:
         print("❌ MoU not approved. Returning to communication agent for reminder.")
         return "communication"
@@ -358,89 +583,222 @@ def version_controller_agent(state: dict):
     company = state.get("company_name")
     curr_text = state.get("draft_text", "")
     curr_type = state.get("partnership_type", "")
+    version_number = state.get("version_number")
 
-    if not company or not curr_text:
-        return {**state, "version_diff": "Missing input data"}
+    if not company or not curr_text or not version_number:
+        return {"version_diff": "Missing input data"}
 
-    history = list(draft_collection.find({
-        "company_name": company,
-        "draft": {"$ne": curr_text}
-    }).sort("_id", 1))
+    # persist_draft already stored this version (or reused an identical
+    # latest one, which is then its own previous); compare with the one before it
+    prev = state.get("previous_version")
 
-    if history:
-        prev_doc = history[-1]  # Get the actual previous version
-        prev_text = prev_doc.get("draft", "")
-        prev_type = prev_doc.get("type", "")
-        prev_version = prev_doc.get("version", "v1")
+    if prev:
+        prev_type = prev.get("type", "")
+        prev_version = prev["version"]
 
         print(f"📜 Comparing with previous version {prev_version}...")
         print(f"Previous Type: {prev_type}, Current Type: {curr_type}")
 
         type_changed = curr_type != prev_type
-        text_changed = curr_text != prev_text
+        text_changed = draft_hash(curr_text) != prev.get("draft_sha256")
 
         if not type_changed and not text_changed:
             print("⚠️ No changes from last version.")
             return {
-                **state,
-                "version_number": prev_version,  # ← use previous version
+                "version_number": version_number,  # the reused version, as stored
                 "version_diff": "No change from previous version."
             }
 
-        version_number = f"v{len(history) + 1}"
         diff_sections = []
 
         if type_changed:
             diff_sections.append(f"⚠️ Partnership type changed from '{prev_type}' to '{curr_type}'")
 
         if text_changed:
-            diff = list(unified_diff(
-                prev_text.splitlines(),
-                curr_text.splitlines(),
-                fromfile='Previous Draft',
-                tofile='Current Draft',
-                lineterm=''
+            diff_sections.append(version_store.diff_texts(
+                version_store.get_version_text(company, prev_version),
+                curr_text,
+                prev_version,
+                version_number
             ))
-            diff_sections.append("\n".join(diff))
 
         diff_text = "\n\n".join(diff_sections)
 
     else:
         print("📘 First version, no diff to compare.")
-        version_number = "v1"
         diff_text = "Initial version created."
 
-    # 🆕 Only insert if there's a change
-    draft_collection.insert_one({
-        "company_name": company,
-        "draft": curr_text,
-        "version": version_number,
-        "type": curr_type
-    })
-    print(f"✅ Saved {version_number} to database.")
+    # The draft itself was saved under this version by draft_mou
+    print(f"✅ Recorded {version_number}.")
 
     return {
-        **state,
         "version_number": version_number,
-        "version_diff": "Yes, changes have been made"
+        "version_diff": diff_text
     }
 
 # ──────────────────────────────────────────────────────────────────────────────
-# 9. LANGGRAPH PIPELINE DEFINITION
+# 9. SUPPORT NODES (off the critical path)
 # ──────────────────────────────────────────────────────────────────────────────
 
-def build_graph():
-    g = StateGraph(dict)
+# Render the PDF while clauses are retrieved, so the first download is a file
+# read. Off by default: most drafts are never downloaded (see pdf_artifacts).
+PRERENDER_PDF = os.getenv("MOU_PRERENDER_PDF", "0") == "1"
+
+
+def prefetch_resources(state: dict):
+    """
+    Runs alongside drafting: loads the stakeholders and warms the embedder,
+    clause index and an SMTP session, none of which depend on the draft.
+    """
+    stakeholders = repository.list_stakeholders()
+    print("👥 Prefetched Stakeholders:", len(stakeholders))
+    _warm_up_branch(smtp=outbox.INPROCESS_DISPATCHER)
+    return {"stakeholders": stakeholders}
+
+
+async def aprefetch_resources(state: dict):
+    stakeholders = await repository.alist_stakeholders()
+    print("👥 Prefetched Stakeholders:", len(stakeholders))
+    # Loading the model / index is blocking work; the async dispatcher opens
+    # its own SMTP sessions, so the sync pool is not warmed here
+    await asyncio.to_thread(_warm_up_branch, smtp=False)
+    return {"stakeholders": stakeholders}
+
+
+def _warm_up_branch(smtp: bool):
+    try:
+        from .resources import warm_up
+        warm_up(["embedder", "clauses"])
+        if smtp:
+            prewarm_smtp()
+    except Exception as e:
+        # Only a head start: the real call later fails (or succeeds) on its own
+        print("⚠️ Prefetch warm-up failed:", e)
 
-    g.add_node("drafting", RunnableLambda(draft_mou))
-    g.add_node("clause_retrieval", RunnableLambda(retrieve_clauses))
-    g.add_node("communication", RunnableLambda(communication_agent))
-    g.add_node("approval_tracker", RunnableLambda(approval_tracker_agent))
-    g.add_node("version_controller", RunnableLambda(version_controller_agent)) 
 
-    g.set_entry_point("drafting")
+def render_pdf_agent(state: dict):
+    get_or_render(draft_hash(state["draft_text"]), lambda: state["draft_text"])
+    return {}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 10. LANGGRAPH PIPELINE DEFINITION
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _add_timings(left: dict, right: dict) -> dict:
+    # Nodes that run more than once (reminder rounds) accumulate their time
+    merged = dict(left or {})
+    for node, seconds in (right or {}).items():
+        merged[node] = round(merged.get(node, 0.0) + seconds, 4)
+    return merged
+
+
+class MoUState(TypedDict, total=False):
+    # Form input
+    company_name: str
+    partnership_type: str
+    objective: str
+    scope: str
+    mou_date: str
+    workflow_id: str
+    force_regenerate: bool
+    retrieval_mode: str
+    # Drafting / versioning
+    draft_text: str
+    version_number: str
+    draft_id: str
+    previous_version: Optional[dict]
+    pdf_url: str
+    version_diff: str
+    # Retrieval
+    retrieved_clauses: list
+    # Communication / approvals
+    stakeholders: list
+    stakeholder_contacts: list
+    reminder_round: int
+    last_notified_at: float
+    emails_sent: list
+    delivery_results: list
+    approval_status: dict
+    overall_mou_status: str
+    awaiting_approvals: bool
+    wake_at: Optional[float]
+    # Seconds spent in each node
+    node_timings: Annotated[dict, _add_timings]
+
+
+def _timed(name: str, node):
+    from langgraph.errors import GraphBubbleUp
+
+    def run(state: dict):
+        start = time.perf_counter()
+        # Interrupts (parking) are control flow, not node failures
+        with workflow_context(state.get("workflow_id")), \
+                timed("mou_node_seconds", span=f"node.{name}", ignore=(GraphBubbleUp,), node=name):
+            update = node(state) or {}
+        return {**update, "node_timings": {name: round(time.perf_counter() - start, 4)}}
+    return run
+
+
+def _atimed(name: str, node):
+    from langgraph.errors import GraphBubbleUp
+
+    async def run(state: dict):
+        start = time.perf_counter()
+        with workflow_context(state.get("workflow_id")), \
+                timed("mou_node_seconds", span=f"node.{name}", ignore=(GraphBubbleUp,), node=name):
+            update = await node(state) or {}
+        return {**update, "node_timings": {name: round(time.perf_counter() - start, 4)}}
+    return run
+
+
+# Nodes with a native async implementation, used by graph.ainvoke / astream
+# (the async pipeline). The rest are short Mongo or CPU steps that LangGraph
+# runs on its executor in async mode.
+ASYNC_NODES = {
+    "drafting": adraft_mou,
+    "prefetch": aprefetch_resources,
+    "clause_retrieval": aretrieve_clauses,
+    "communication": acommunication_agent,
+    "approval_tracker": aapproval_tracker_agent,
+}
+
+
+def build_graph():
+    from langgraph.graph import StateGraph, START, END
+    from langchain_core.runnables import RunnableLambda
+
+    # Nodes return only the keys they change, so parallel branches can write
+    # to the state in the same step
+    g = StateGraph(MoUState)
+
+    nodes = {
+        "drafting": draft_mou,
+        "prefetch": prefetch_resources,
+        "persist_draft": persist_draft,
+        "clause_retrieval": retrieve_clauses,
+        "communication": communication_agent,
+        "approval_tracker": approval_tracker_agent,
+        "version_controller": version_controller_agent,
+        "park": park_agent,
+    }
+    if PRERENDER_PDF:
+        nodes["render_pdf"] = render_pdf_agent
+    for name, node in nodes.items():
+        anode = ASYNC_NODES.get(name)
+        g.add_node(name, RunnableLambda(_timed(name, node), afunc=_atimed(name, anode) if anode else None))
+
+    # Fan out: drafting || prefetch, then persist || retrieval (|| PDF)
+    g.add_edge(START, "drafting")
+    g.add_edge(START, "prefetch")
+    g.add_edge("drafting", "persist_draft")
     g.add_edge("drafting", "clause_retrieval")
-    g.add_edge("clause_retrieval", "communication")
+    if PRERENDER_PDF:
+        g.add_edge("drafting", "render_pdf")
+        g.add_edge("render_pdf", END)
+
+    # Join: communication starts once all three branches are done
+    g.add_edge(["prefetch", "persist_draft", "clause_retrieval"], "communication")
     g.add_edge("communication", "approval_tracker")
     # 🔥 Conditional routing (no router node needed now)
     g.add_conditional_edges(
@@ -448,10 +806,39 @@ def build_graph():
         router_decision_agent,  # directly use function
         path_map={
             "version_controller": "version_controller",
-            "communication": "communication"
+            "communication": "communication",
+            "park": "park",
+            "end": END
         }
     )
+    g.add_edge("park", "approval_tracker")
     g.add_edge("version_controller", END)  
 
-    return g.compile()
+    # Per-node checkpoints keyed by thread_id = workflow_id (see jobs.py)
+    checkpointer = None
+    if CHECKPOINTER == "mongo":
+        from .checkpoints import get_checkpointer
+        checkpointer = get_checkpointer()
+
+    return g.compile(checkpointer=checkpointer)
+
+
+_compiled_graph = None
+_compiled_graph_lock = threading.Lock()
+
+
+def get_graph():
+    """
+    Returns the process-wide compiled graph, building it on first use.
+
+    A compiled graph holds no per-run state (each invoke/stream call gets its
+    own config and channels), so one instance is safely shared by all request
+    and job threads.
+    """
+    global _compiled_graph
+    if _compiled_graph is None:
+        with _compiled_graph_lock:
+            if _compiled_graph is None:
+                _compiled_graph = build_graph()
+    return _compiled_graph
 
@@ -0,0 +1,192 @@
+#llm_cache.py
+
+import os
+import re
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .metrics import registry
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Drafts for an identical form submission are reused for LLM_CACHE_TTL seconds.
+# The key is the full prompt, so changing the prompt template (or the model)
+# never serves an answer written for a different one.
+LLM_CACHE_TTL = float(os.getenv("MOU_LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MAX_ITEMS = int(os.getenv("MOU_LLM_CACHE_MAX_ITEMS", "512"))
+
+
+def prompt_key(prompt: str, model_name: str = "") -> str:
+    normalized = re.sub(r"[ \t]+", " ", prompt).strip()
+    payload = f"{model_name}\x1f{normalized}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. CACHE + SINGLE-FLIGHT
+# ──────────────────────────────────────────────────────────────────────────────
+
+class _InFlight:
+    """One running LLM call that identical concurrent requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self._waiters = []  # (loop, future) of coroutines waiting
+        self._lock = threading.Lock()
+
+    def finish(self):
+        with self._lock:
+            self.done.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self.done.is_set():
+                return
+            self._waiters.append((loop, future))
+        await future
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMResponseCache:
+    """
+    TTL + LRU cache of LLM responses with request coalescing: while a call for
+    a key is running, other callers for the same key wait for its result
+    instead of issuing their own.
+    """
+
+    def __init__(self, ttl=LLM_CACHE_TTL, max_items=LLM_CACHE_MAX_ITEMS):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key):
+        with self._lock:
+            return self._get_locked(key)
+
+    def put(self, key, value):
+        if self.ttl <= 0 or self.max_items <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _begin(self, key, force):
+        """Returns ("hit", value), ("wait", flight) or ("lead", flight)."""
+        with self._lock:
+            if not force:
+                value = self._get_locked(key)
+                if value is not None:
+                    registry.counter("llm_cache_requests_total", result="hit").inc()
+                    return "hit", value
+
+            flight = self._inflight.get(key)
+            if flight is not None:
+                registry.counter("llm_cache_requests_total", result="coalesced").inc()
+                return "wait", flight
+            flight = self._inflight[key] = _InFlight()
+
+        registry.counter("llm_cache_requests_total", result="forced" if force else "miss").inc()
+        return "lead", flight
+
+    def _finish(self, key, flight, value=None, error=None):
+        if error is None:
+            flight.value = value
+            self.put(key, value)
+        else:
+            flight.error = error  # not cached: the next request tries again
+        with self._lock:
+            self._inflight.pop(key, None)
+        flight.finish()
+
+    def get_or_compute(self, key, compute, force=False):
+        """
+        Returns (value, source) where source is "hit", "coalesced" or "miss".
+
+        `force=True` skips the cached value and stores the fresh one in its
+        place; it still joins a call for the same key that is already running,
+        since that one is fresh too.
+        """
+        role, found = self._begin(key, force)
+        if role == "hit":
+            return found, "hit"
+        if role == "wait":
+            found.done.wait()
+            if found.error is not None:
+                raise found.error
+            return found.value, "coalesced"
+
+        try:
+            value = compute()
+        except BaseException as e:
+            self._finish(key, found, error=e)
+            raise
+        self._finish(key, found, value)
+        return value, "miss"
+
+    async def aget_or_compute(self, key, acompute, force=False):
+        """get_or_compute for coroutines: `acompute` is async and waiting never blocks the loop."""
+        role, found = self._begin(key, force)
+        if role == "hit":
+            return found, "hit"
+        if role == "wait":
+            await found.wait_async()
+            if found.error is not None:
+                raise found.error
+            return found.value, "coalesced"
+
+        try:
+            value = await acompute()
+        except BaseException as e:
+            self._finish(key, found, error=e)
+            raise
+        self._finish(key, found, value)
+        return value, "miss"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"items": len(self._entries), "in_flight": len(self._inflight)}
+
+
+_cache = LLMResponseCache()
+
+
+def get_llm_cache() -> LLMResponseCache:
+    return _cache
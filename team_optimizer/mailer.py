@@ -0,0 +1,359 @@
+#mailer.py
+
+import os
+import time
+import queue
+import asyncio
+import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from dotenv import load_dotenv
+
+from .metrics import registry
+from .instrumentation import timed
+
+load_dotenv()
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Defaults target Gmail; point SMTP_HOST/SMTP_PORT at a local aiosmtpd with
+# SMTP_USE_SSL=0 (and no password) for tests.
+SENDER_EMAIL = os.getenv("MOU_SENDER_EMAIL", "rahulsnsihub@gmail.com")
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", "1") == "1"
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "0") == "1"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+# Concurrent authenticated sessions, and the provider's send-rate ceiling
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_MAX_PER_SECOND = float(os.getenv("SMTP_MAX_PER_SECOND", "5"))
+
+# Sessions idle longer than this are NOOP-checked before reuse
+SMTP_IDLE_CHECK_SECONDS = float(os.getenv("SMTP_IDLE_CHECK_SECONDS", "60"))
+
+
+def _password():
+    return os.getenv("GMAIL_APP_PWD")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. RATE LIMITING
+# ──────────────────────────────────────────────────────────────────────────────
+
+class RateLimiter:
+    """Token bucket: allows `rate` sends per second with bursts up to `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Takes a token if one is available; otherwise returns how long to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        if self.rate <= 0:
+            return
+        while (wait := self._take()) > 0:
+            await asyncio.sleep(wait)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. CONNECTION POOL
+# ──────────────────────────────────────────────────────────────────────────────
+
+class SMTPPool:
+    """Keeps up to `size` logged-in SMTP sessions and hands them out one per sender thread."""
+
+    def __init__(self, size=SMTP_POOL_SIZE):
+        self.size = size
+        self._idle = queue.LifoQueue()  # most recently used first: least likely to be stale
+        self._created = 0
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _connect(self):
+        if SMTP_USE_SSL:
+            server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        else:
+            server = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+            if SMTP_STARTTLS:
+                server.starttls()
+        password = _password()
+        if password:
+            server.login(SENDER_EMAIL, password)
+        return server
+
+    def _reusable(self, server, last_used):
+        if time.monotonic() - last_used < SMTP_IDLE_CHECK_SECONDS:
+            return True
+        try:
+            if server.noop()[0] == 250:
+                return True
+        except smtplib.SMTPException:
+            pass
+        self.discard(server)
+        return False
+
+    def acquire(self):
+        if self._pid != os.getpid():
+            # Forked child: the parent's sockets are not ours to use
+            self._idle = queue.LifoQueue()
+            self._created = 0
+            self._pid = os.getpid()
+
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+                if self._reusable(server, last_used):
+                    return server
+                continue
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+
+            # Pool exhausted: wait for a session to come back (or a slot to free up)
+            try:
+                server, last_used = self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+            if self._reusable(server, last_used):
+                return server
+
+    def release(self, server):
+        self._idle.put((server, time.monotonic()))
+
+    def discard(self, server):
+        with self._lock:
+            self._created -= 1
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self.discard(server)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 4. DELIVERY
+# ──────────────────────────────────────────────────────────────────────────────
+
+_pool = SMTPPool()
+_limiter = RateLimiter(SMTP_MAX_PER_SECOND)
+_executor = ThreadPoolExecutor(max_workers=SMTP_POOL_SIZE, thread_name_prefix="smtp")
+
+
+def build_message(to: str, subject: str, body: str) -> MIMEText:
+    msg = MIMEText(body)
+    msg["Subject"] = subject
+    msg["From"] = SENDER_EMAIL
+    msg["To"] = to
+    return msg
+
+
+def _describe(code, text) -> str:
+    return f"{code} {text.decode(errors='replace') if isinstance(text, bytes) else text}"
+
+
+def _deliver(message: dict) -> dict:
+    result = _send_with_retry(message)
+    registry.counter("smtp_messages_total", status=result["status"]).inc()
+    registry.histogram("smtp_delivery_seconds", status=result["status"]).observe(result["seconds"])
+    return result
+
+
+def _send_with_retry(message: dict) -> dict:
+    """Sends one message, retrying once on a fresh session if a pooled one went stale."""
+    to = message["to"]
+    raw = build_message(to, message["subject"], message["body"]).as_string()
+    start = time.perf_counter()
+    error = None
+
+    for attempt in (1, 2):
+        _limiter.acquire()
+        try:
+            server = _pool.acquire()
+        except Exception as e:
+            error = f"connect failed: {e}"
+            break
+
+        try:
+            with timed("smtp_send_seconds", span="smtp.send"):
+                refused = server.sendmail(SENDER_EMAIL, [to], raw)
+        except smtplib.SMTPServerDisconnected as e:
+            _pool.discard(server)
+            error = f"disconnected: {e}"
+            continue
+        except smtplib.SMTPRecipientsRefused as e:
+            _pool.release(server)
+            error = f"recipient refused: {_describe(*e.recipients[to])}" if to in e.recipients else str(e)
+            break
+        except smtplib.SMTPResponseException as e:
+            _pool.release(server)
+            error = _describe(e.smtp_code, e.smtp_error)
+            break
+        except Exception as e:
+            _pool.discard(server)
+            error = str(e)
+            break
+
+        _pool.release(server)
+        if refused:
+            error = f"recipient refused: {_describe(*refused[to])}"
+            break
+        return {
+            "email": to,
+            "status": "sent",
+            "attempts": attempt,
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+
+    return {
+        "email": to,
+        "status": "failed",
+        "error": error,
+        "attempts": attempt,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+def send_messages(messages: list) -> list:
+    """
+    Delivers [{"to", "subject", "body"}, ...] over pooled SMTP sessions with
+    bounded concurrency and rate limiting. Returns one result per message,
+    in order: {"email", "status": "sent"|"failed", "error"?, "attempts", "seconds"}.
+    """
+    return list(_executor.map(_deliver, messages))
+
+
+def prewarm_smtp(sessions: int = 1):
+    """Opens (and logs in) pooled sessions ahead of the first send."""
+    servers = []
+    try:
+        for _ in range(min(sessions, _pool.size)):
+            servers.append(_pool.acquire())
+    finally:
+        for server in servers:
+            _pool.release(server)
+
+
+def send_message(to: str, subject: str, body: str) -> dict:
+    return _deliver({"to": to, "subject": subject, "body": body})
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 5. ASYNC SENDING (async pipeline mode)
+# ──────────────────────────────────────────────────────────────────────────────
+
+async def _adeliver_batch(aiosmtplib, messages: list, results: list):
+    """Sends `messages` one after another over one aiosmtplib session."""
+    smtp = None
+    for index, message in messages:
+        to = message["to"]
+        raw = build_message(to, message["subject"], message["body"]).as_string()
+        start = time.perf_counter()
+        error = None
+
+        for attempt in (1, 2):
+            await _limiter.acquire_async()
+            try:
+                if smtp is None:
+                    smtp = aiosmtplib.SMTP(hostname=SMTP_HOST, port=SMTP_PORT, use_tls=SMTP_USE_SSL,
+                                           start_tls=SMTP_STARTTLS, timeout=SMTP_TIMEOUT)
+                    await smtp.connect()
+                    if _password():
+                        await smtp.login(SENDER_EMAIL, _password())
+                with timed("smtp_send_seconds", span="smtp.send"):
+                    refused, _ = await smtp.sendmail(SENDER_EMAIL, [to], raw)
+            except aiosmtplib.SMTPServerDisconnected as e:
+                smtp = None  # stale session: retry once on a fresh one
+                error = f"disconnected: {e}"
+                continue
+            except aiosmtplib.SMTPRecipientsRefused as e:
+                error = f"recipient refused: {e}"
+                break
+            except aiosmtplib.SMTPResponseException as e:
+                error = _describe(e.code, e.message)
+                break
+            except Exception as e:
+                smtp = None
+                error = str(e) or type(e).__name__
+                break
+
+            error = f"recipient refused: {_describe(*refused[to])}" if refused else None
+            break
+
+        result = {
+            "email": to,
+            "status": "failed" if error else "sent",
+            "attempts": attempt,
+            "seconds": round(time.perf_counter() - start, 4),
+        }
+        if error:
+            result["error"] = error
+        registry.counter("smtp_messages_total", status=result["status"]).inc()
+        registry.histogram("smtp_delivery_seconds", status=result["status"]).observe(result["seconds"])
+        results[index] = result
+
+    if smtp is not None:
+        try:
+            await smtp.quit()
+        except Exception:
+            pass
+
+
+async def asend_messages(messages: list) -> list:
+    """
+    send_messages for the event loop. With aiosmtplib installed, up to
+    SMTP_POOL_SIZE sessions send concurrently without occupying threads;
+    otherwise the pooled sync sender runs on a worker thread.
+    """
+    try:
+        import aiosmtplib
+    except ImportError:
+        return await asyncio.to_thread(send_messages, messages)
+
+    results = [None] * len(messages)
+    sessions = max(1, min(SMTP_POOL_SIZE, len(messages)))
+    indexed = list(enumerate(messages))
+    await asyncio.gather(*(
+        _adeliver_batch(aiosmtplib, indexed[i::sessions], results) for i in range(sessions)
+    ))
+    return results
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from team_optimizer.resources import EMBEDDING_BASE_MODEL
+from team_optimizer.embedders import ONNX_MODEL_PATH, export_onnx
+
+
+class Command(BaseCommand):
+    help = "Exports the SentenceTransformer to int8 ONNX for MOU_EMBEDDING_BACKEND=onnx."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=EMBEDDING_BASE_MODEL)
+        parser.add_argument("--out", default=ONNX_MODEL_PATH)
+        parser.add_argument("--opset", type=int, default=17)
+
+    def handle(self, *args, **options):
+        config = export_onnx(options["model"], options["out"], options["opset"])
+        self.stdout.write(f"✅ Exported {config['model_name']} ({config['dim']}-dim, {config['pooling']} pooling) "
+                          f"to {options['out']}")
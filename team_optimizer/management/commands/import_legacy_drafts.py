@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from team_optimizer.repository import drafts_collection
+from team_optimizer.version_store import import_legacy_drafts
+
+
+class Command(BaseCommand):
+    help = "Imports drafts saved to MoUDrafts before the version store into MoUVersions as snapshots."
+
+    def handle(self, *args, **options):
+        # Companies that already have versions are skipped, so this is safe to re-run
+        companies, imported = 0, 0
+        for company_name in drafts_collection().distinct("company_name"):
+            count = import_legacy_drafts(company_name)
+            companies += bool(count)
+            imported += count
+
+        self.stdout.write(f"🗂️ Imported {imported} legacy drafts for {companies} companies.")
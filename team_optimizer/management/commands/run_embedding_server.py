@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from team_optimizer.resources import EMBEDDING_SERVER_BACKEND, make_embedder
+from team_optimizer.embedding_server import SOCKET_PATH, MAX_BATCH, MAX_WAIT_MS, EmbeddingServer
+
+
+class Command(BaseCommand):
+    help = "Serves embeddings to web workers (MOU_EMBEDDING_BACKEND=server) over a Unix socket."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", default=EMBEDDING_SERVER_BACKEND, choices=["torch", "onnx", "fake"],
+                            help="model runtime (defaults to MOU_EMBEDDING_SERVER_BACKEND)")
+        parser.add_argument("--socket", default=SOCKET_PATH)
+        parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="texts per micro-batch")
+        parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                            help="how long a request waits for others to batch with")
+
+    def handle(self, *args, **options):
+        if options["backend"] != EMBEDDING_SERVER_BACKEND:
+            # Clients derive cache keys from MOU_EMBEDDING_SERVER_BACKEND
+            self.stderr.write(f"⚠️ --backend {options['backend']} differs from MOU_EMBEDDING_SERVER_BACKEND "
+                              f"({EMBEDDING_SERVER_BACKEND}); cached embeddings will be mislabelled")
+        embedder = make_embedder(options["backend"])
+        embedder.encode("warm-up")
+        server = EmbeddingServer(embedder, options["socket"], options["max_batch"], options["max_wait_ms"])
+        self.stdout.write(f"🧠 Embedding server ({options['backend']}) on {options['socket']} (Ctrl+C to stop)...")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.stop()
+        self.stdout.write(f"🧠 Served {server.texts} texts in {server.batches} batches")
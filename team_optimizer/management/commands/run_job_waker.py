@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from team_optimizer.jobs import resume_job, waker
+
+
+class Command(BaseCommand):
+    help = "Resumes parked and orphaned MoU workflows from their checkpoints."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job", action="append", default=[],
+                            help="Resume this job id now (e.g. a failed one) and exit.")
+
+    def handle(self, *args, **options):
+        if options["job"]:
+            for job_id in options["job"]:
+                resumed = resume_job(job_id)
+                self.stdout.write(f"{'♻️ Resuming' if resumed else '⚠️ Cannot resume'} {job_id}")
+            return
+
+        self.stdout.write("⏰ Job waker running (Ctrl+C to stop)...")
+        try:
+            waker.run_forever()
+        except KeyboardInterrupt:
+            waker.stop()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from team_optimizer.outbox import dispatcher
+
+
+class Command(BaseCommand):
+    help = "Delivers queued stakeholder emails from the MongoDB outbox, with retries."
+
+    def handle(self, *args, **options):
+        self.stdout.write("📮 Outbox dispatcher running (Ctrl+C to stop)...")
+        try:
+            dispatcher.run_forever()
+        except KeyboardInterrupt:
+            dispatcher.stop()
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from team_optimizer.pdf_artifacts import draft_hash
+from team_optimizer.repository import drafts_collection
+
+
+class Command(BaseCommand):
+    help = "Removes inline pdf_base64 from stored MoU drafts and records their content hash instead."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        from pymongo import UpdateOne
+
+        coll = drafts_collection()
+        batch, updated = [], 0
+        # PDFs are re-rendered on first download, so nothing is lost
+        for doc in coll.find({"pdf_base64": {"$exists": True}}, {"draft": 1}):
+            batch.append(UpdateOne(
+                {"_id": doc["_id"]},
+                {"$unset": {"pdf_base64": ""}, "$set": {"draft_sha256": draft_hash(doc.get("draft", ""))}}
+            ))
+            if len(batch) >= options["batch_size"]:
+                updated += coll.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += coll.bulk_write(batch, ordered=False).modified_count
+
+        self.stdout.write(f"🧹 Stripped inline PDFs from {updated} drafts.")
@@ -0,0 +1,143 @@
+#metrics.py
+
+import bisect
+import threading
+
+# Default latency buckets in seconds (upper bounds)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Counter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 6),
+                "max": round(self.max, 6),
+                "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+                "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.bucket_counts)),
+            }
+
+
+class Registry:
+    """Process-wide metric registry. Metrics are keyed by name plus labels."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get(self, kind, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = kind()
+            return metric
+
+    def counter(self, name, **labels) -> Counter:
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name, **labels) -> Gauge:
+        return self._get(Gauge, name, labels)
+
+    def histogram(self, name, **labels) -> Histogram:
+        return self._get(Histogram, name, labels)
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            items = sorted(self._metrics.items(), key=lambda item: item[0])
+
+        def fmt(labels, extra=()):
+            pairs = [*labels, *extra]
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        typed = set()
+        for (name, labels), metric in items:
+            kind = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}[type(metric)]
+            if name not in typed:
+                lines.append(f"# TYPE {name} {kind}")
+                typed.add(name)
+
+            if isinstance(metric, Histogram):
+                with metric._lock:
+                    counts = list(metric.bucket_counts)
+                    total, count = metric.sum, metric.count
+                cumulative = 0
+                for bound, bucket_count in zip([*map(str, metric.buckets), "+Inf"], counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_sum{fmt(labels)} {total}")
+                lines.append(f"{name}_count{fmt(labels)} {count}")
+            else:
+                lines.append(f"{name}{fmt(labels)} {metric.snapshot()}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Returns {name: [{"labels": {...}, "value": ...}, ...]} for every metric."""
+        with self._lock:
+            items = list(self._metrics.items())
+
+        result = {}
+        for (name, labels), metric in sorted(items, key=lambda item: item[0]):
+            result.setdefault(name, []).append({
+                "labels": dict(labels),
+                "value": metric.snapshot(),
+            })
+        return result
+
+
+registry = Registry()
@@ -0,0 +1,165 @@
+#mongo.py
+
+import os
+import asyncio
+import weakref
+import threading
+from dotenv import load_dotenv
+from pymongo import MongoClient, monitoring
+
+from .metrics import registry
+
+load_dotenv()
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "AgenticAI")
+
+POOL_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+}
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. METRICS LISTENERS
+# ──────────────────────────────────────────────────────────────────────────────
+
+class _CommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        registry.histogram("mongo_command_seconds", command=event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+
+    def failed(self, event):
+        registry.histogram("mongo_command_seconds", command=event.command_name).observe(
+            event.duration_micros / 1e6
+        )
+        registry.counter("mongo_command_failures_total", command=event.command_name).inc()
+
+
+class _PoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks open / checked-out connections and checkout waits to spot pool saturation."""
+
+    def pool_created(self, event):
+        registry.gauge("mongo_pool_max_size").set(POOL_OPTIONS["maxPoolSize"])
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        registry.counter("mongo_pool_cleared_total").inc()
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        registry.counter("mongo_connections_created_total").inc()
+        registry.gauge("mongo_connections_open").inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        registry.gauge("mongo_connections_open").dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        # reason "timeout" means the pool was exhausted for waitQueueTimeoutMS
+        registry.counter("mongo_checkout_failures_total", reason=str(event.reason)).inc()
+
+    def connection_checked_out(self, event):
+        registry.gauge("mongo_connections_in_use").inc()
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            registry.histogram("mongo_checkout_wait_seconds").observe(duration)
+
+    def connection_checked_in(self, event):
+        registry.gauge("mongo_connections_in_use").dec()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. PROCESS-WIDE CLIENT
+# ──────────────────────────────────────────────────────────────────────────────
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """
+    Returns the shared MongoClient for this process.
+
+    MongoClient is thread-safe but not fork-safe, so a forked worker builds its
+    own client the first time it asks instead of reusing the parent's sockets.
+    """
+    global _client, _client_pid
+
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            _client = MongoClient(
+                os.getenv("MONGO_URI"),
+                connect=False,  # no sockets until first use, so pre-fork creation is harmless
+                event_listeners=[_CommandMetrics(), _PoolMetrics()],
+                **POOL_OPTIONS
+            )
+            _client_pid = pid
+        return _client
+
+
+def get_db():
+    return get_client()[MONGO_DB_NAME]
+
+
+# The async driver's client belongs to the event loop it was first used on,
+# so there is one per loop (in practice: one per ASGI worker)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    """Returns this event loop's AsyncMongoClient (same pool settings and metrics)."""
+    from pymongo import AsyncMongoClient
+
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncMongoClient(
+            os.getenv("MONGO_URI"),
+            connect=False,
+            event_listeners=[_CommandMetrics(), _PoolMetrics()],
+            **POOL_OPTIONS
+        )
+    return client
+
+
+def get_async_db():
+    return get_async_client()[MONGO_DB_NAME]
+
+
+def _reset_after_fork():
+    # The parent's client (and its pools / monitor threads) must not be used here
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+    _async_clients.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
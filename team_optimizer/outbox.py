@@ -0,0 +1,374 @@
+#outbox.py
+
+import os
+import socket
+import asyncio
+import threading
+import traceback
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .mailer import send_messages, asend_messages
+from .mongo import get_db, get_async_db
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Outgoing stakeholder mail is written to the `outbox` collection by the graph
+# and delivered by a dispatcher (in-process thread and/or the
+# `run_outbox_dispatcher` management command). Each message is keyed by
+# (workflow, version, recipient, reminder round) so re-running a step never
+# queues the same mail twice.
+
+MAX_ATTEMPTS = int(os.getenv("MOU_OUTBOX_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE_SECONDS = float(os.getenv("MOU_OUTBOX_BACKOFF_SECONDS", "30"))
+BACKOFF_MAX_SECONDS = float(os.getenv("MOU_OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+LEASE_SECONDS = float(os.getenv("MOU_OUTBOX_LEASE_SECONDS", "300"))
+BATCH_SIZE = int(os.getenv("MOU_OUTBOX_BATCH_SIZE", "20"))
+POLL_SECONDS = float(os.getenv("MOU_OUTBOX_POLL_SECONDS", "10"))
+INPROCESS_DISPATCHER = os.getenv("MOU_OUTBOX_INPROCESS", "1") == "1"
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def outbox_collection():
+    return get_db()["outbox"]
+
+
+def async_outbox_collection():
+    return get_async_db()["outbox"]
+
+
+OUTBOX_INDEXES = [
+    [("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+    [("workflow_id", ASCENDING)],
+]
+
+_indexes_ready = False
+
+
+def ensure_indexes():
+    global _indexes_ready
+    if not _indexes_ready:
+        for keys in OUTBOX_INDEXES:
+            outbox_collection().create_index(keys)
+        _indexes_ready = True
+
+
+async def aensure_indexes():
+    # The async path must not block its event loop on the sync driver
+    global _indexes_ready
+    if not _indexes_ready:
+        collection = async_outbox_collection()
+        for keys in OUTBOX_INDEXES:
+            await collection.create_index(keys)
+        _indexes_ready = True
+
+
+def message_key(workflow_id, version, recipient, reminder_round) -> str:
+    return f"{workflow_id}:{version}:{recipient.lower()}:{reminder_round}"
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. ENQUEUE
+# ──────────────────────────────────────────────────────────────────────────────
+
+def enqueue(workflow_id, version, reminder_round, messages: list) -> list:
+    """
+    Queues [{"to", "subject", "body"}, ...] for delivery and returns
+    [{"email", "key", "status"}]. A key that is already queued (or sent) keeps
+    its existing record, so repeats are no-ops.
+    """
+    ensure_indexes()
+    now = _now()
+    queued = []
+
+    for message in messages:
+        key = message_key(workflow_id, version, message["to"], reminder_round)
+        try:
+            doc = _insert_if_absent(key, workflow_id, version, reminder_round, message, now)
+        except DuplicateKeyError:
+            # Lost an upsert race with an identical enqueue: the other one wins
+            doc = outbox_collection().find_one({"_id": key}, {"status": 1})
+        queued.append({"email": message["to"], "key": key, "status": doc["status"]})
+
+    if INPROCESS_DISPATCHER:
+        dispatcher.start()
+    dispatcher.wake()
+    return queued
+
+
+async def aenqueue(workflow_id, version, reminder_round, messages: list) -> list:
+    """enqueue() on the async driver; wakes this loop's async dispatcher."""
+    await aensure_indexes()
+    now = _now()
+    collection = async_outbox_collection()
+
+    async def queue_one(message):
+        key = message_key(workflow_id, version, message["to"], reminder_round)
+        try:
+            doc = await collection.find_one_and_update(
+                **_insert_if_absent_spec(key, workflow_id, version, reminder_round, message, now)
+            )
+        except DuplicateKeyError:
+            doc = await collection.find_one({"_id": key}, {"status": 1})
+        return {"email": message["to"], "key": key, "status": doc["status"]}
+
+    queued = list(await asyncio.gather(*map(queue_one, messages)))
+
+    if INPROCESS_DISPATCHER:
+        async_dispatcher.start()
+    async_dispatcher.wake()
+    return queued
+
+
+def _insert_if_absent(key, workflow_id, version, reminder_round, message, now):
+    return outbox_collection().find_one_and_update(
+        **_insert_if_absent_spec(key, workflow_id, version, reminder_round, message, now)
+    )
+
+
+def _insert_if_absent_spec(key, workflow_id, version, reminder_round, message, now) -> dict:
+    return dict(
+        filter={"_id": key},
+        update={"$setOnInsert": {
+            "workflow_id": workflow_id,
+            "version": version,
+            "reminder_round": reminder_round,
+            "recipient": message["to"],
+            "subject": message["subject"],
+            "body": message["body"],
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }},
+        upsert=True,
+        projection={"status": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def workflow_deliveries(workflow_id) -> list:
+    """
+    Current delivery state of every message queued for a workflow, oldest
+    first: [{"email", "key", "round", "status", "attempts", "error"?, "sent_at"?}].
+    """
+    docs = outbox_collection().find(
+        {"workflow_id": workflow_id},
+        {"recipient": 1, "reminder_round": 1, "status": 1, "attempts": 1, "last_error": 1, "sent_at": 1}
+    ).sort("created_at", ASCENDING)
+
+    deliveries = []
+    for doc in docs:
+        delivery = {
+            "email": doc["recipient"],
+            "key": doc["_id"],
+            "round": doc["reminder_round"],
+            "status": doc["status"],
+            "attempts": doc["attempts"],
+        }
+        if doc.get("last_error"):
+            delivery["error"] = doc["last_error"]
+        if doc.get("sent_at"):
+            delivery["sent_at"] = doc["sent_at"].isoformat()
+        deliveries.append(delivery)
+    return deliveries
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. DISPATCH
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1)))
+
+
+def _claim_spec(worker_id: str) -> dict:
+    now = _now()
+    return dict(
+        filter={
+            "$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                # A dispatcher that died mid-send: its lease has run out
+                {"status": "sending", "lease_until": {"$lte": now}},
+            ]
+        },
+        update={
+            "$set": {"status": "sending", "lease_until": now + timedelta(seconds=LEASE_SECONDS), "worker": worker_id},
+            "$inc": {"attempts": 1},
+        },
+        sort=[("next_attempt_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _claim(worker_id: str):
+    """Atomically leases one due message so no other dispatcher sends it concurrently."""
+    return outbox_collection().find_one_and_update(**_claim_spec(worker_id))
+
+
+def _outcome_update(doc: dict, result: dict, now) -> dict:
+    if result["status"] == "sent":
+        return {"$set": {"status": "sent", "sent_at": now}, "$unset": {"lease_until": "", "last_error": ""}}
+    if doc["attempts"] >= MAX_ATTEMPTS:
+        print(f"☠️ Giving up on {doc['_id']} after {doc['attempts']} attempts:", result["error"])
+        return {"$set": {"status": "dead", "last_error": result["error"]}, "$unset": {"lease_until": ""}}
+    return {
+        "$set": {
+            "status": "pending",
+            "last_error": result["error"],
+            "next_attempt_at": now + _backoff(doc["attempts"]),
+        },
+        "$unset": {"lease_until": ""},
+    }
+
+
+def _as_message(doc: dict) -> dict:
+    return {"to": doc["recipient"], "subject": doc["subject"], "body": doc["body"]}
+
+
+def dispatch_once(worker_id: str) -> int:
+    """Claims up to BATCH_SIZE due messages, sends them concurrently and records the outcome."""
+    ensure_indexes()
+    claimed = []
+    while len(claimed) < BATCH_SIZE:
+        doc = _claim(worker_id)
+        if doc is None:
+            break
+        claimed.append(doc)
+
+    if not claimed:
+        return 0
+
+    results = send_messages([_as_message(doc) for doc in claimed])
+
+    now = _now()
+    for doc, result in zip(claimed, results):
+        # Only the lease holder may record the outcome
+        outbox_collection().update_one(
+            {"_id": doc["_id"], "worker": worker_id, "status": "sending"},
+            _outcome_update(doc, result, now)
+        )
+
+    print(f"📮 Outbox: {sum(r['status'] == 'sent' for r in results)}/{len(results)} messages delivered")
+    return len(claimed)
+
+
+async def adispatch_once(worker_id: str) -> int:
+    """dispatch_once on the async driver and async SMTP."""
+    await aensure_indexes()
+    collection = async_outbox_collection()
+    claimed = []
+    while len(claimed) < BATCH_SIZE:
+        doc = await collection.find_one_and_update(**_claim_spec(worker_id))
+        if doc is None:
+            break
+        claimed.append(doc)
+
+    if not claimed:
+        return 0
+
+    results = await asend_messages([_as_message(doc) for doc in claimed])
+
+    now = _now()
+    await asyncio.gather(*(
+        collection.update_one(
+            {"_id": doc["_id"], "worker": worker_id, "status": "sending"},
+            _outcome_update(doc, result, now)
+        )
+        for doc, result in zip(claimed, results)
+    ))
+
+    print(f"📮 Outbox: {sum(r['status'] == 'sent' for r in results)}/{len(results)} messages delivered")
+    return len(claimed)
+
+
+class Dispatcher:
+    """Background thread draining the outbox; woken early by enqueue()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self.worker_id = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            self._stopping = False
+            self._thread = threading.Thread(target=self.run_forever, name="outbox-dispatcher", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopping = True
+        self._wake.set()
+
+    def run_forever(self):
+        self.worker_id = self.worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        while not self._stopping:
+            try:
+                # Keep draining while there is work; otherwise sleep until woken
+                if dispatch_once(self.worker_id):
+                    continue
+            except Exception:
+                traceback.print_exc()
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+
+
+dispatcher = Dispatcher()
+
+
+class AsyncDispatcher:
+    """The async pipeline's dispatcher: a task on the event loop instead of a thread."""
+
+    def __init__(self):
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self.worker_id = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = asyncio.Event()
+        self._loop = loop
+        self._task = loop.create_task(self.run_forever())
+
+    def wake(self):
+        if self._loop is None:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # loop closed
+
+    async def run_forever(self):
+        while True:
+            try:
+                if await adispatch_once(self.worker_id):
+                    continue
+            except Exception:
+                traceback.print_exc()
+            try:
+                await asyncio.wait_for(self._wake.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+
+async_dispatcher = AsyncDispatcher()
@@ -0,0 +1,83 @@
+#pdf_artifacts.py
+
+import os
+import uuid
+import hashlib
+from io import BytesIO
+
+# Draft PDFs are rendered on first download, not while drafting, and stored as
+# binary files named by the SHA-256 of the draft text. The same text always maps
+# to the same file, so a PDF is rendered at most once per distinct draft and its
+# hash doubles as a strong ETag.
+
+PDF_STORE_PATH = os.getenv("MOU_PDF_STORE_PATH", "./pdf_artifacts")
+
+PAGE_MARGIN = 50
+FONT_NAME = "Helvetica"
+FONT_SIZE = 12
+LINE_HEIGHT = 20
+
+
+def draft_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def artifact_path(digest: str, root=PDF_STORE_PATH) -> str:
+    # Two-character fan-out keeps directories small
+    return os.path.join(root, digest[:2], f"{digest}.pdf")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. RENDERING
+# ──────────────────────────────────────────────────────────────────────────────
+
+def render_pdf(text: str) -> bytes:
+    """Lays the draft out on A4 pages, wrapping lines that are wider than the page."""
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import simpleSplit
+
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    max_width = width - 2 * PAGE_MARGIN
+    p.setFont(FONT_NAME, FONT_SIZE)
+
+    y = height - PAGE_MARGIN
+    for paragraph in text.split("\n"):
+        # simpleSplit returns [] for a blank line; keep it as vertical space
+        for line in simpleSplit(paragraph.strip(), FONT_NAME, FONT_SIZE, max_width) or [""]:
+            if y < PAGE_MARGIN:
+                p.showPage()
+                p.setFont(FONT_NAME, FONT_SIZE)
+                y = height - PAGE_MARGIN
+            p.drawString(PAGE_MARGIN, y, line)
+            y -= LINE_HEIGHT
+
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. STORE
+# ──────────────────────────────────────────────────────────────────────────────
+
+def get_or_render(digest: str, load_text, root=PDF_STORE_PATH) -> str:
+    """
+    Path of the PDF for `digest`, rendering it from `load_text()` if it is not
+    stored yet. Concurrent renders of the same draft are harmless: each writes
+    a private temp file and the rename is atomic.
+    """
+    path = artifact_path(digest, root)
+    if os.path.exists(path):
+        return path
+
+    pdf_bytes = render_pdf(load_text())
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(pdf_bytes)
+    os.replace(tmp_path, path)
+    print(f"🖨️ Rendered PDF {digest[:12]} ({len(pdf_bytes)} bytes)")
+    return path
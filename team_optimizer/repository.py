@@ -0,0 +1,151 @@
+#repository.py
+
+import re
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .mongo import get_db, get_async_db
+
+# Collections are looked up per call (cheap) rather than cached at import time,
+# so a forked worker never holds a Collection bound to its parent's client.
+# The `a*` functions are the async-pipeline (AsyncMongoClient) counterparts.
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. MoU DRAFTS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def drafts_collection():
+    return get_db()["MoUDrafts"]
+
+
+def draft_counters_collection():
+    return get_db()["draft_counters"]
+
+
+_draft_indexes_ready = False
+
+
+def ensure_draft_indexes():
+    global _draft_indexes_ready
+    if not _draft_indexes_ready:
+        # Serves "latest draft of a company" from the index, newest first
+        drafts_collection().create_index([("company_name", ASCENDING), ("_id", DESCENDING)])
+        _draft_indexes_ready = True
+
+
+def _version_seq(version) -> int:
+    match = re.fullmatch(r"v(\d+)", str(version or ""))
+    return int(match.group(1)) if match else 0
+
+
+def next_draft_version(company_name: str) -> str:
+    """
+    Allocates the company's next version label ("v1", "v2", ...) from an atomic
+    per-company counter, so concurrent submissions never get the same number.
+    """
+    return reserve_draft_versions(company_name, 1)[0]
+
+
+def reserve_draft_versions(company_name: str, count: int) -> list:
+    """Allocates `count` consecutive version labels in one counter update."""
+    counters = draft_counters_collection()
+    if counters.find_one({"_id": company_name}, {"_id": 1}) is None:
+        # First allocation since counters were introduced: continue from the
+        # newest stored draft. Losing this insert race just means someone else seeded it.
+        latest = latest_company_draft(company_name, projection={"version": 1})
+        try:
+            counters.insert_one({"_id": company_name, "seq": _version_seq(latest and latest.get("version"))})
+        except DuplicateKeyError:
+            pass
+
+    counter = counters.find_one_and_update(
+        {"_id": company_name},
+        {"$inc": {"seq": count}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return [f"v{seq}" for seq in range(counter["seq"] - count + 1, counter["seq"] + 1)]
+
+
+def latest_company_draft(company_name: str, exclude_text: str = None, projection: dict = None):
+    """The company's most recent draft (optionally skipping one text), or None."""
+    ensure_draft_indexes()
+    query = {"company_name": company_name}
+    if exclude_text is not None:
+        query["draft"] = {"$ne": exclude_text}
+    return drafts_collection().find_one(query, projection, sort=[("_id", DESCENDING)])
+
+
+def find_draft(draft_id: str, projection: dict = None):
+    """One draft by its id string, or None (also for malformed ids)."""
+    try:
+        oid = ObjectId(draft_id)
+    except (InvalidId, TypeError):
+        return None
+    return drafts_collection().find_one({"_id": oid}, projection)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. STAKEHOLDERS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def stakeholders_collection():
+    return get_db()["stakeholders"]
+
+
+def list_stakeholders() -> list:
+    return list(stakeholders_collection().find({}, {"_id": 0}))
+
+
+async def alist_stakeholders() -> list:
+    return await get_async_db()["stakeholders"].find({}, {"_id": 0}).to_list()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. APPROVALS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def approvals_collection():
+    return get_db()["approvals"]
+
+
+def list_approvals() -> list:
+    return list(approvals_collection().find({}, {"_id": 0}))
+
+
+async def alist_approvals() -> list:
+    return await get_async_db()["approvals"].find({}, {"_id": 0}).to_list()
+
+
+def set_approval_status(email: str, status: str) -> bool:
+    """Returns True if the stored status actually changed."""
+    result = approvals_collection().update_one({"email": email}, {"$set": {"status": status}})
+    return result.modified_count > 0
+
+
+async def aset_approval_status(email: str, status: str) -> bool:
+    result = await get_async_db()["approvals"].update_one({"email": email}, {"$set": {"status": status}})
+    return result.modified_count > 0
+
+
+def _statuses_query(emails: list):
+    return {"email": {"$in": list(emails)}}, {"_id": 0, "email": 1, "status": 1}
+
+
+def _statuses_by_email(emails: list, docs) -> dict:
+    found = {doc["email"]: doc.get("status", "Pending") for doc in docs}
+    return {email: found.get(email, "Pending") for email in emails}
+
+
+def find_approval_statuses(emails: list) -> dict:
+    """Reads the status of every email with a single batched `$in` query."""
+    docs = approvals_collection().find(*_statuses_query(emails))
+    return _statuses_by_email(emails, docs)
+
+
+async def afind_approval_statuses(emails: list) -> dict:
+    docs = await get_async_db()["approvals"].find(*_statuses_query(emails)).to_list()
+    return _statuses_by_email(emails, docs)
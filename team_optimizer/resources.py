@@ -0,0 +1,184 @@
+#resources.py
+
+import os
+import time
+import threading
+from dotenv import load_dotenv
+
+from .embedders import ONNX_QUANTIZED
+
+load_dotenv()
+
+# Heavy clients (Gemini, SentenceTransformer, Chroma) are created on first use
+# instead of at import time, so `manage.py` commands, migrations and worker
+# boot do not pay for them. The heavy libraries themselves are imported inside
+# the factories for the same reason.
+
+# Embedding backend:
+#   torch   SentenceTransformer + PyTorch in this process (default)
+#   onnx    the same model exported to int8 (or float32) ONNX, run by ONNX Runtime (embedders.py)
+#   server  a shared embedding server process over a Unix socket (embedding_server.py)
+#   fake    the hashing fake in fakes.py (also MOU_FAKE_EMBEDDER=1)
+USE_FAKE_EMBEDDER = os.getenv("MOU_FAKE_EMBEDDER") == "1"
+EMBEDDING_BACKEND = "fake" if USE_FAKE_EMBEDDER else os.getenv("MOU_EMBEDDING_BACKEND", "torch")
+# What the embedding server runs ("torch", "onnx" or "fake"); clients need it too
+EMBEDDING_SERVER_BACKEND = os.getenv("MOU_EMBEDDING_SERVER_BACKEND", "torch")
+EMBEDDING_BASE_MODEL = os.getenv("MOU_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+
+def embedding_model_id(backend: str) -> str:
+    # ONNX vectors (int8 or float32 export) are close to, not equal to, the
+    # PyTorch ones: they get their own embedding-cache keys and Chroma content hashes
+    if backend == "server":
+        return embedding_model_id(EMBEDDING_SERVER_BACKEND)
+    if backend == "onnx":
+        return f"{EMBEDDING_BASE_MODEL}:onnx-{'int8' if ONNX_QUANTIZED else 'fp32'}"
+    return "fake" if backend == "fake" else EMBEDDING_BASE_MODEL
+
+
+EMBEDDING_MODEL_NAME = embedding_model_id(EMBEDDING_BACKEND)
+CHROMA_PATH = os.getenv("MOU_CHROMA_PATH", "./clause_chromadb")
+CHROMA_COLLECTION = os.getenv("MOU_CHROMA_COLLECTION", "clauses")
+
+# MOU_FAKE_LLM=1 swaps Gemini for the deterministic fake in fakes.py
+USE_FAKE_LLM = os.getenv("MOU_FAKE_LLM") == "1"
+LLM_MODEL_NAME = "fake" if USE_FAKE_LLM else os.getenv("MOU_LLM_MODEL", "gemini-1.5-flash")
+
+# "chroma" (PersistentClient) or "numpy" (in-process memory-mapped clause_index)
+CLAUSE_BACKEND = os.getenv("MOU_CLAUSE_BACKEND", "chroma")
+
+_instances = {}
+_lock = threading.RLock()  # factories may resolve other lazy resources
+
+
+def _lazy(name, factory):
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. FACTORIES
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _make_llm():
+    if USE_FAKE_LLM:
+        from .fakes import FakeStreamingLLM
+        return FakeStreamingLLM(
+            first_token_latency=float(os.getenv("MOU_FAKE_LLM_FIRST_TOKEN_SECONDS", "0.2")),
+            token_latency=float(os.getenv("MOU_FAKE_LLM_TOKEN_SECONDS", "0.005")),
+        )
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    # LLM for drafting
+    return ChatGoogleGenerativeAI(
+        model=LLM_MODEL_NAME,
+        temperature=0.5
+    )
+
+
+def make_embedder(backend: str = None):
+    """A new embedder for `backend` (default MOU_EMBEDDING_BACKEND); use get_embedder() to share one."""
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "fake":
+        from .fakes import FakeEmbedder
+        return FakeEmbedder(
+            batch_latency=float(os.getenv("MOU_FAKE_EMBEDDER_BATCH_SECONDS", "0.002")),
+            text_latency=float(os.getenv("MOU_FAKE_EMBEDDER_TEXT_SECONDS", "0.001")),
+        )
+
+    if backend == "onnx":
+        from .embedders import OnnxEmbedder
+        return OnnxEmbedder()
+
+    if backend == "server":
+        from .embedding_server import EmbeddingClient
+        return EmbeddingClient()
+
+    if backend != "torch":
+        raise ValueError(f"Unknown embedding backend: {backend!r}")
+
+    from sentence_transformers import SentenceTransformer
+
+    # Sentence-Transformer for embeddings
+    return SentenceTransformer(EMBEDDING_BASE_MODEL)
+
+
+def _make_chroma_collection():
+    import chromadb
+
+    # ChromaDB vector store (ingested already by Chroma.py)
+    chroma_client = chromadb.PersistentClient(path=CHROMA_PATH)
+    return chroma_client.get_or_create_collection(name=CHROMA_COLLECTION)
+
+
+def _make_clause_collection():
+    if CLAUSE_BACKEND == "numpy":
+        from .clause_index import NumpyClauseIndex
+        return NumpyClauseIndex()
+    return get_chroma_collection()
+
+
+def get_llm():
+    return _lazy("llm", _make_llm)
+
+
+def get_embedder():
+    return _lazy("embedder", make_embedder)
+
+
+def get_chroma_collection():
+    """Always the Chroma collection (ingestion writes here even with the numpy backend)."""
+    return _lazy("chroma_collection", _make_chroma_collection)
+
+
+def get_clause_collection():
+    """The collection retrieval queries: Chroma or the numpy index (MOU_CLAUSE_BACKEND)."""
+    return _lazy("clause_collection", _make_clause_collection)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. WARM-UP
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _warm_graph():
+    from .langgraph_flow import get_graph
+    return get_graph()
+
+
+def _warm_mongo():
+    from .mongo import get_client
+    return get_client().admin.command("ping")
+
+
+WARMERS = {
+    "llm": get_llm,
+    "embedder": lambda: get_embedder().encode("warm-up"),
+    "clauses": get_clause_collection,
+    "graph": _warm_graph,
+    "mongo": _warm_mongo,
+}
+
+
+def warm_up(names=None):
+    """
+    Initializes the named resources now rather than on the first request.
+
+    `names` defaults to the comma-separated MOU_WARMUP setting ("all" for
+    everything). Chroma and Mongo open sockets / file handles, so only warm
+    `llm`, `embedder` and `graph` in a pre-fork master process.
+    """
+    if names is None:
+        names = [n.strip() for n in os.getenv("MOU_WARMUP", "").split(",") if n.strip()]
+    if "all" in names:
+        names = list(WARMERS)
+
+    for name in names:
+        start = time.perf_counter()
+        WARMERS[name]()
+        print(f"🔥 Warmed up {name} in {time.perf_counter() - start:.2f}s")
@@ -1,3 +1,661 @@
-from django.test import TestCase
+#tests.py
 
-# Create your tests here.
+import io
+import os
+import socket
+import smtplib
+import asyncio
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from unittest import mock, skipUnless
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from . import mailer, mongo, outbox, repository, resources, version_store
+from .clause_index import NumpyClauseIndex, write_index
+from .embedding_server import EmbeddingClient, EmbeddingServer
+from .fakes import FakeEmbedder
+from .llm_cache import LLMResponseCache
+from .metrics import registry
+
+try:
+    import mongomock  # in-memory Mongo, as in the benchmarks
+except ImportError:
+    mongomock = None
+
+try:
+    from aiosmtpd.controller import Controller  # local SMTP sink, as in the benchmarks
+except ImportError:
+    Controller = None
+
+# Run with: python manage.py test team_optimizer
+# Nothing here needs Gemini, Atlas, SMTP or a downloaded model. Tests that
+# touch Mongo run against mongomock, and mailer tests against a local aiosmtpd
+# sink; each is skipped without its package.
+
+
+class PatchMixin:
+    def start(self, patcher):
+        value = patcher.start()
+        self.addCleanup(patcher.stop)
+        return value
+
+
+@skipUnless(mongomock, "needs mongomock (pip install mongomock)")
+class MongoTestCase(PatchMixin, SimpleTestCase):
+    """Each test gets an empty in-memory database behind mongo.get_client()."""
+
+    def setUp(self):
+        client = mongomock.MongoClient()
+        self.db = client[mongo.MONGO_DB_NAME]
+        self.start(mock.patch.object(mongo, "get_client", return_value=client))
+        # The pipeline logs every step
+        self.start(mock.patch("sys.stdout", new_callable=io.StringIO))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. EMBEDDING BACKENDS
+# ──────────────────────────────────────────────────────────────────────────────
+
+TEXTS = [
+    "The parties shall keep all shared information confidential.",
+    "This MoU may be terminated by either party with thirty days notice.",
+    "Governing law is the law of the state of the first party.",
+    "Intellectual property created jointly is owned jointly.",
+    "Interns work on research projects in the partner's labs.",
+    "Each party bears its own costs unless agreed otherwise in writing.",
+    "Notices are sent to the addresses given in the schedule.",
+    "Nothing in this MoU creates a legally binding obligation.",
+]
+
+
+class EmbeddingServerTests(SimpleTestCase):
+    """The server (fake backend) must return exactly what the embedder returns in-process."""
+
+    def start_server(self, max_wait_ms=2):
+        path = os.path.join(tempfile.mkdtemp(prefix="mou_embed_test_"), "embedder.sock")
+        server = EmbeddingServer(FakeEmbedder(batch_latency=0, text_latency=0), path, max_wait_ms=max_wait_ms)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.stop)
+
+        deadline = time.monotonic() + 5
+        while not os.path.exists(path):
+            self.assertLess(time.monotonic(), deadline, "embedding server did not start")
+            time.sleep(0.01)
+        return server, EmbeddingClient(path, timeout=5)
+
+    def expected(self, texts):
+        return FakeEmbedder(batch_latency=0, text_latency=0).encode(texts, normalize_embeddings=True)
+
+    def test_batch_matches_in_process(self):
+        _server, client = self.start_server()
+        vectors = client.encode(TEXTS)
+
+        self.assertEqual(vectors.dtype, np.float32)
+        np.testing.assert_array_equal(vectors, self.expected(TEXTS))
+
+    def test_single_text_returns_a_vector(self):
+        _server, client = self.start_server()
+        vector = client.encode(TEXTS[0])
+
+        self.assertEqual(vector.shape, (FakeEmbedder().dim,))
+        np.testing.assert_array_equal(vector, self.expected(TEXTS[0]))
+
+    def test_concurrent_clients_are_micro_batched(self):
+        # A long batching window, so requests sent together share one encode
+        server, client = self.start_server(max_wait_ms=200)
+        results = [None] * len(TEXTS)
+        barrier = threading.Barrier(len(TEXTS))
+
+        def request(i):
+            barrier.wait()
+            results[i] = client.encode([TEXTS[i]])[0]
+
+        threads = [threading.Thread(target=request, args=(i,)) for i in range(len(TEXTS))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        # Every client gets its own text's vector back, however the batch was cut
+        np.testing.assert_array_equal(np.stack(results), self.expected(TEXTS))
+        self.assertEqual(server.texts, len(TEXTS))
+        self.assertLess(server.batches, len(TEXTS))
+
+    def test_encoder_errors_reach_the_client(self):
+        server, client = self.start_server()
+        server.embedder = mock.Mock(encode=mock.Mock(side_effect=ValueError("boom")))
+
+        with self.assertRaisesRegex(RuntimeError, "ValueError: boom"):
+            client.encode(TEXTS)
+
+
+class EmbedderSelectionTests(PatchMixin, SimpleTestCase):
+    def setUp(self):
+        # get_embedder() caches its instance process-wide
+        self.start(mock.patch.dict(resources._instances, clear=True))
+
+    def test_get_embedder_follows_the_configured_backend(self):
+        with mock.patch.object(resources, "EMBEDDING_BACKEND", "fake"):
+            self.assertIsInstance(resources.get_embedder(), FakeEmbedder)
+
+        resources._instances.clear()
+        with mock.patch.object(resources, "EMBEDDING_BACKEND", "server"):
+            self.assertIsInstance(resources.get_embedder(), EmbeddingClient)
+
+    def test_get_embedder_is_shared(self):
+        with mock.patch.object(resources, "EMBEDDING_BACKEND", "fake"):
+            self.assertIs(resources.get_embedder(), resources.get_embedder())
+
+    def test_unknown_backend(self):
+        with self.assertRaisesRegex(ValueError, "Unknown embedding backend"):
+            resources.make_embedder("tensorflow")
+
+    def test_model_ids_keep_onnx_vectors_apart(self):
+        base = resources.EMBEDDING_BASE_MODEL
+        self.assertEqual(resources.embedding_model_id("torch"), base)
+        self.assertEqual(resources.embedding_model_id("fake"), "fake")
+        with mock.patch.object(resources, "ONNX_QUANTIZED", True):
+            self.assertEqual(resources.embedding_model_id("onnx"), f"{base}:onnx-int8")
+            # The server's vectors are those of whatever it runs
+            with mock.patch.object(resources, "EMBEDDING_SERVER_BACKEND", "onnx"):
+                self.assertEqual(resources.embedding_model_id("server"), f"{base}:onnx-int8")
+        with mock.patch.object(resources, "ONNX_QUANTIZED", False):
+            self.assertEqual(resources.embedding_model_id("onnx"), f"{base}:onnx-fp32")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. VERSION STORE
+# ──────────────────────────────────────────────────────────────────────────────
+
+class DeltaTests(SimpleTestCase):
+    CASES = [
+        ("", ""),
+        ("", "a\nb\n"),
+        ("a\nb\n", ""),
+        ("a\nb", "a\nb\n"),            # trailing newline added
+        ("a\nb\n", "a\nb"),            # ... and removed
+        ("a\r\nb\r\nc\r\n", "a\r\nB\r\nc\r\n"),
+        ("a\nb\r\nc", "a\r\nb\nc\r\n"),  # mixed line endings
+        ("one\u2028two\n", "one\u2028three\n"),
+        ("x\n" * 50, "x\n" * 20 + "y\n" + "x\n" * 30),
+    ]
+
+    def test_round_trips(self):
+        for base, text in self.CASES:
+            with self.subTest(base=base, text=text):
+                self.assertEqual(version_store.apply_delta(base, version_store.make_delta(base, text)), text)
+
+    def test_unchanged_text_is_a_single_copy(self):
+        text = "a\nb\nc\n"
+        self.assertEqual(version_store.make_delta(text, text), [{"c": [0, 3]}])
+
+
+class VersionStoreTests(MongoTestCase):
+    COMPANY = "Acme Labs"
+
+    def setUp(self):
+        super().setUp()
+        self.start(mock.patch.object(version_store, "_indexes_ready", False))
+        self.start(mock.patch.object(version_store, "_legacy_checked", set()))
+        self.start(mock.patch.object(version_store, "_texts", OrderedDict()))
+        self.start(mock.patch.object(repository, "_draft_indexes_ready", False))
+
+    def text(self, edit=None):
+        lines = [f"Clause {i}: the parties agree to term {i}.\n" for i in range(40)]
+        if edit is not None:
+            lines[edit] = f"Clause {edit}: amended in revision.\n"
+        return "".join(lines)
+
+    def save(self, text, partnership_type="Research"):
+        return version_store.save_version(self.COMPANY, text, partnership_type)
+
+    def test_snapshot_every_n_versions(self):
+        texts = [self.text(edit) for edit in (None, 1, 2, 3, 4, 5, 6)]
+        with mock.patch.object(version_store, "SNAPSHOT_EVERY", 3):
+            saved = [self.save(text) for text in texts]
+
+        docs = list(self.db.MoUVersions.find({}, sort=[("seq", 1)]))
+        self.assertEqual([s["version"] for s in saved], [f"v{i}" for i in range(1, 8)])
+        self.assertEqual([d["kind"] for d in docs], ["snapshot", "delta", "delta"] * 2 + ["snapshot"])
+        self.assertEqual([d["chain_length"] for d in docs], [0, 1, 2, 0, 1, 2, 0])
+        self.assertTrue(all(d["base_seq"] == d["seq"] - 1 for d in docs if d["kind"] == "delta"))
+
+        # Rebuilt from the chain, not from the cache
+        version_store._texts.clear()
+        for version, text in zip(saved, texts):
+            self.assertEqual(version_store.get_version_text(self.COMPANY, version["version"]), text)
+
+    def test_rewrite_is_stored_as_a_snapshot(self):
+        self.save(self.text())
+        saved = self.save("A completely different MoU.\n")
+        self.assertEqual(saved["kind"], "snapshot")
+
+    def test_diff_versions(self):
+        self.save("a\nb\nc\n")
+        self.save("a\nB\nc\nd\n")
+
+        self.assertEqual(
+            version_store.diff_versions(self.COMPANY, "v1", "v2"),
+            "--- v1\n+++ v2\n@@ -1,3 +1,4 @@\n a\n-b\n+B\n c\n+d",
+        )
+        self.assertEqual(version_store.diff_versions(self.COMPANY, "v2", "v2"), "")
+        self.assertIsNone(version_store.diff_versions(self.COMPANY, "v1", "v9"))
+        self.assertIsNone(version_store.diff_versions(self.COMPANY, "v1", "latest"))
+
+    def test_identical_resubmission_reuses_the_version(self):
+        from .langgraph_flow import persist_draft, version_controller_agent
+
+        form = {"company_name": self.COMPANY, "partnership_type": "Research", "draft_text": self.text()}
+        results = []
+        for _ in range(2):
+            state = {**form, **persist_draft(form)}
+            results.append({**state, **version_controller_agent(state)})
+
+        first, second = results
+        self.assertEqual((first["version_number"], first["version_diff"]), ("v1", "Initial version created."))
+        self.assertEqual((second["version_number"], second["version_diff"]), ("v1", "No change from previous version."))
+        self.assertEqual(second["draft_id"], first["draft_id"])
+        self.assertEqual(second["pdf_url"], first["pdf_url"])
+        self.assertEqual(self.db.MoUVersions.count_documents({}), 1)
+        self.assertEqual(self.db.draft_counters.find_one({"_id": self.COMPANY})["seq"], 1)
+
+        # A changed partnership type is a new version, even with the same text
+        self.assertEqual(self.save(self.text(), "Internship")["version"], "v2")
+
+    def test_bulk_resubmission_stores_each_text_once(self):
+        self.save(self.text())
+        saved = version_store.save_versions([
+            (self.COMPANY, self.text(), "Research"),   # same as v1
+            (self.COMPANY, self.text(1), "Research"),  # new: v2
+            (self.COMPANY, self.text(1), "Research"),  # same as v2
+            ("Other Co", self.text(), "Research"),     # new company: v1
+        ])
+
+        self.assertEqual([(s["version"], s["unchanged"]) for s in saved],
+                         [("v1", True), ("v2", False), ("v2", True), ("v1", False)])
+        self.assertEqual(saved[2]["draft_id"], saved[1]["draft_id"])
+        self.assertEqual(self.db.MoUVersions.count_documents({"company_name": self.COMPANY}), 2)
+        self.assertEqual(self.db.draft_counters.find_one({"_id": self.COMPANY})["seq"], 2)
+
+    def test_new_versions_continue_from_legacy_drafts(self):
+        self.db.MoUDrafts.insert_many([
+            {"company_name": self.COMPANY, "draft": self.text(), "type": "Research", "version": "v1"},
+            {"company_name": self.COMPANY, "draft": self.text(1), "type": "Research", "version": "v2"},
+            # The old version controller could store a label twice
+            {"company_name": self.COMPANY, "draft": self.text(1), "type": "Research", "version": "v2"},
+        ])
+
+        saved = self.save(self.text(2))
+        self.assertEqual(saved["version"], "v3")
+        self.assertEqual(saved["previous"]["version"], "v2")
+        self.assertEqual(saved["kind"], "delta")
+
+        history = version_store.list_versions(self.COMPANY)
+        self.assertEqual([v["version"] for v in history], ["v1", "v2", "v3"])
+        self.assertIn("+Clause 1: amended in revision.", version_store.diff_versions(self.COMPANY, "v1", "v2"))
+        self.assertEqual(version_store.get_version_text(self.COMPANY, "v3"), self.text(2))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. OUTBOX
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _utc(value: datetime) -> datetime:
+    # mongomock, like pymongo without tz_aware, hands back naive UTC datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class OutboxTests(MongoTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start(mock.patch.object(outbox, "_indexes_ready", False))
+        self.start(mock.patch.object(outbox, "INPROCESS_DISPATCHER", False))
+        self.send = self.start(mock.patch.object(outbox, "send_messages"))
+
+    def message(self, to="Alice@Example.com"):
+        return {"to": to, "subject": "MoU Draft for Review", "body": "Please review."}
+
+    def test_enqueue_is_idempotent_per_key(self):
+        first = outbox.enqueue("wf-1", "v1", 0, [self.message()])
+        again = outbox.enqueue("wf-1", "v1", 0, [self.message("alice@example.com")])
+
+        # Recipients are keyed case-insensitively
+        self.assertEqual(first[0]["key"], "wf-1:v1:alice@example.com:0")
+        self.assertEqual([(q["key"], q["status"]) for q in again], [(first[0]["key"], "pending")])
+        self.assertEqual(self.db.outbox.count_documents({}), 1)
+
+        # Another reminder round, version or recipient is another message
+        outbox.enqueue("wf-1", "v1", 1, [self.message()])
+        outbox.enqueue("wf-1", "v2", 0, [self.message()])
+        outbox.enqueue("wf-1", "v1", 0, [self.message("bob@example.com")])
+        self.assertEqual(self.db.outbox.count_documents({}), 4)
+
+    def test_enqueue_keeps_the_status_of_a_sent_message(self):
+        outbox.enqueue("wf-1", "v1", 0, [self.message()])
+        self.send.return_value = [{"status": "sent"}]
+        outbox.dispatch_once("worker-a")
+
+        queued = outbox.enqueue("wf-1", "v1", 0, [self.message()])
+        self.assertEqual(queued[0]["status"], "sent")
+        self.assertEqual(self.send.call_count, 1)
+        self.assertEqual(outbox.dispatch_once("worker-a"), 0)
+
+    def test_failed_send_is_retried_with_backoff(self):
+        (queued,) = outbox.enqueue("wf-1", "v1", 0, [self.message()])
+        self.send.return_value = [{"status": "failed", "error": "421 try later"}]
+
+        for attempt in (1, 2):
+            before = datetime.now(timezone.utc)
+            self.assertEqual(outbox.dispatch_once("worker-a"), 1)
+            doc = self.db.outbox.find_one({"_id": queued["key"]})
+
+            self.assertEqual((doc["status"], doc["attempts"], doc["last_error"]), ("pending", attempt, "421 try later"))
+            self.assertNotIn("lease_until", doc)
+            backoff = outbox.BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)
+            self.assertAlmostEqual((_utc(doc["next_attempt_at"]) - before).total_seconds(), backoff, delta=5)
+
+            # Not due yet: nothing to send
+            self.assertEqual(outbox.dispatch_once("worker-a"), 0)
+            self.db.outbox.update_one({"_id": queued["key"]}, {"$set": {"next_attempt_at": before}})
+
+    def test_gives_up_after_max_attempts(self):
+        (queued,) = outbox.enqueue("wf-1", "v1", 0, [self.message()])
+        self.send.return_value = [{"status": "failed", "error": "550 no such user"}]
+        with mock.patch.object(outbox, "MAX_ATTEMPTS", 2):
+            for _ in range(2):
+                outbox.dispatch_once("worker-a")
+                self.db.outbox.update_one({"_id": queued["key"]}, {"$set": {"next_attempt_at": datetime.now(timezone.utc)}})
+
+        doc = self.db.outbox.find_one({"_id": queued["key"]})
+        self.assertEqual((doc["status"], doc["attempts"]), ("dead", 2))
+        self.assertEqual(outbox.dispatch_once("worker-a"), 0)
+
+    def test_expired_lease_is_reclaimed(self):
+        (queued,) = outbox.enqueue("wf-1", "v1", 0, [self.message()])
+        self.assertEqual(outbox._claim("worker-a")["worker"], "worker-a")
+
+        # worker-a still holds a live lease: nobody else may send it
+        self.assertIsNone(outbox._claim("worker-b"))
+
+        # worker-a died mid-send: once the lease runs out, worker-b takes over
+        expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+        self.db.outbox.update_one({"_id": queued["key"]}, {"$set": {"lease_until": expired}})
+        self.send.return_value = [{"status": "sent"}]
+        self.assertEqual(outbox.dispatch_once("worker-b"), 1)
+
+        doc = self.db.outbox.find_one({"_id": queued["key"]})
+        self.assertEqual((doc["status"], doc["worker"], doc["attempts"]), ("sent", "worker-b", 2))
+
+    def test_only_the_lease_holder_records_the_outcome(self):
+        (queued,) = outbox.enqueue("wf-1", "v1", 0, [self.message()])
+        stale = outbox._claim("worker-a")
+        self.db.outbox.update_one({"_id": queued["key"]}, {"$set": {"lease_until": datetime.now(timezone.utc)}})
+        outbox._claim("worker-b")
+
+        # worker-a comes back late with a failure: worker-b's lease is untouched
+        self.db.outbox.update_one(
+            {"_id": stale["_id"], "worker": "worker-a", "status": "sending"},
+            outbox._outcome_update(stale, {"status": "failed", "error": "timeout"}, datetime.now(timezone.utc)),
+        )
+        doc = self.db.outbox.find_one({"_id": queued["key"]})
+        self.assertEqual((doc["status"], doc["worker"]), ("sending", "worker-b"))
+
+    def test_workflow_deliveries_report_each_recipient(self):
+        outbox.enqueue("wf-1", "v1", 0, [self.message("alice@example.com"), self.message("bob@example.com")])
+        outbox.enqueue("wf-2", "v1", 0, [self.message("carol@example.com")])
+        self.send.side_effect = lambda messages: [
+            {"status": "sent"} if m["to"] == "alice@example.com" else {"status": "failed", "error": "550 no such user"}
+            for m in messages
+        ]
+        outbox.dispatch_once("worker-a")
+
+        deliveries = {d["email"]: d for d in outbox.workflow_deliveries("wf-1")}
+        self.assertEqual(set(deliveries), {"alice@example.com", "bob@example.com"})
+        self.assertEqual((deliveries["alice@example.com"]["status"], deliveries["alice@example.com"]["attempts"]), ("sent", 1))
+        self.assertIn("sent_at", deliveries["alice@example.com"])
+        self.assertEqual(deliveries["bob@example.com"]["status"], "pending")
+        self.assertEqual(deliveries["bob@example.com"]["error"], "550 no such user")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 4. LLM RESPONSE CACHE
+# ──────────────────────────────────────────────────────────────────────────────
+
+class LLMCacheTests(PatchMixin, SimpleTestCase):
+    CALLERS = 8
+
+    def setUp(self):
+        self.cache = LLMResponseCache(ttl=60, max_items=16)
+        self.clock = self.start(mock.patch("team_optimizer.llm_cache.time"))
+        self.clock.monotonic.return_value = 1000.0
+
+    def coalesced(self) -> int:
+        return registry.counter("llm_cache_requests_total", result="coalesced").value
+
+    def wait_for_waiters(self, before: int, count: int):
+        deadline = time.monotonic() + 10
+        while self.coalesced() - before < count:
+            self.assertLess(time.monotonic(), deadline, "callers did not coalesce")
+            time.sleep(0.005)
+
+    def test_concurrent_callers_share_one_call(self):
+        release = threading.Event()
+        calls = []
+        results = [None] * self.CALLERS
+        waiting_before = self.coalesced()
+
+        def compute():
+            calls.append(1)
+            release.wait(10)
+            return "draft"
+
+        def call(i):
+            results[i] = self.cache.get_or_compute("key", compute)
+
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(self.CALLERS)]
+        for thread in threads:
+            thread.start()
+        # Hold the one LLM call open until every other caller is waiting on it
+        self.wait_for_waiters(waiting_before, self.CALLERS - 1)
+        release.set()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("draft", "coalesced")] * (self.CALLERS - 1) + [("draft", "miss")])
+        self.assertEqual(self.cache.get_or_compute("key", compute), ("draft", "hit"))
+        self.assertEqual(self.cache.stats(), {"items": 1, "in_flight": 0})
+
+    def test_errors_reach_waiters_and_are_not_cached(self):
+        release = threading.Event()
+        errors = []
+        waiting_before = self.coalesced()
+
+        def compute():
+            release.wait(10)
+            raise RuntimeError("quota exceeded")
+
+        def call():
+            try:
+                self.cache.get_or_compute("key", compute)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.wait_for_waiters(waiting_before, 2)
+        release.set()
+        for thread in threads:
+            thread.join(10)
+
+        self.assertEqual(errors, ["quota exceeded"] * 3)
+        self.assertEqual(self.cache.get_or_compute("key", lambda: "draft"), ("draft", "miss"))
+
+    def test_async_callers_share_one_call(self):
+        calls = []
+
+        async def acompute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "draft"
+
+        async def main():
+            return await asyncio.gather(*(
+                self.cache.aget_or_compute("key", acompute) for _ in range(self.CALLERS)
+            ))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("draft", "coalesced")] * (self.CALLERS - 1) + [("draft", "miss")])
+
+    def test_entries_expire_after_ttl(self):
+        self.cache.get_or_compute("key", lambda: "first")
+
+        self.clock.monotonic.return_value += 59
+        self.assertEqual(self.cache.get_or_compute("key", lambda: "second"), ("first", "hit"))
+
+        self.clock.monotonic.return_value += 1
+        self.assertEqual(self.cache.get_or_compute("key", lambda: "second"), ("second", "miss"))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LLMResponseCache(ttl=60, max_items=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        cache.get("a")  # "b" is now the least recently used
+        cache.put("c", "C")
+
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), ("A", None, "C"))
+
+    def test_force_replaces_the_cached_value(self):
+        self.cache.get_or_compute("key", lambda: "first")
+
+        self.assertEqual(self.cache.get_or_compute("key", lambda: "second", force=True), ("second", "miss"))
+        self.assertEqual(self.cache.get_or_compute("key", lambda: "third"), ("second", "hit"))
+
+    def test_zero_ttl_disables_caching(self):
+        cache = LLMResponseCache(ttl=0)
+        cache.get_or_compute("key", lambda: "first")
+        self.assertEqual(cache.get_or_compute("key", lambda: "second"), ("second", "miss"))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 5. CLAUSE INDEX
+# ──────────────────────────────────────────────────────────────────────────────
+
+class ClauseIndexTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        write_index(
+            tmp.name,
+            ids=["a", "b", "c"],
+            documents=["A", "B", "C"],
+            metadatas=[{"type": "x"}, {"type": "x"}, {"type": "y"}],
+            embeddings=[[3, 0], [1, 1], [0, 2]],
+        )
+        self.index = NumpyClauseIndex(tmp.name)
+
+    def test_distances_are_cosine_for_unnormalized_queries(self):
+        result = self.index.query([[5, 0]], n_results=3)
+
+        self.assertEqual(result["ids"], [["a", "b", "c"]])
+        np.testing.assert_allclose(result["distances"][0], [0, 1 - np.sqrt(0.5), 1], atol=1e-6)
+
+    def test_where_filters_rows(self):
+        result = self.index.query([[0, 1]], n_results=3, where={"type": {"$in": ["x"]}})
+        self.assertEqual(result["ids"], [["b", "a"]])
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 6. MAILER
+# ──────────────────────────────────────────────────────────────────────────────
+
+class SmtpSink:
+    """aiosmtpd handler: records accepted messages and refuses REFUSED."""
+
+    REFUSED = "nobody@example.com"
+
+    def __init__(self):
+        self.received = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == self.REFUSED:
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+@skipUnless(Controller, "needs aiosmtpd (pip install aiosmtpd)")
+class MailerTests(PatchMixin, SimpleTestCase):
+    def setUp(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self.sink = SmtpSink()
+        controller = Controller(self.sink, hostname="127.0.0.1", port=port)
+        controller.start()
+        self.addCleanup(controller.stop)
+
+        for name, value in {"SMTP_HOST": "127.0.0.1", "SMTP_PORT": port, "SMTP_USE_SSL": False,
+                            "SMTP_STARTTLS": False}.items():
+            self.start(mock.patch.object(mailer, name, value))
+        self.start(mock.patch.object(mailer, "_password", return_value=None))
+        self.start(mock.patch.object(mailer, "_limiter", mailer.RateLimiter(0)))
+
+        # One session, so every send must reuse it
+        self.pool = mailer.SMTPPool(size=1)
+        self.addCleanup(self.pool.close)
+        self.start(mock.patch.object(mailer, "_pool", self.pool))
+        self.connect = self.start(mock.patch.object(self.pool, "_connect", wraps=self.pool._connect))
+
+    def _messages(self, *recipients):
+        return [{"to": to, "subject": "MoU approval", "body": "Please review."} for to in recipients]
+
+    def test_messages_share_a_pooled_session(self):
+        recipients = [f"approver{i}@example.com" for i in range(4)]
+        results = mailer.send_messages(self._messages(*recipients))
+
+        self.assertEqual([(r["email"], r["status"], r["attempts"]) for r in results],
+                         [(to, "sent", 1) for to in recipients])
+        self.assertEqual(sorted(self.sink.received), recipients)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_results_are_per_recipient(self):
+        results = mailer.send_messages(self._messages("a@example.com", SmtpSink.REFUSED, "b@example.com"))
+
+        self.assertEqual([r["status"] for r in results], ["sent", "failed", "sent"])
+        self.assertEqual(results[1]["email"], SmtpSink.REFUSED)
+        self.assertIn("recipient refused: 550", results[1]["error"])
+        self.assertNotIn("error", results[0])
+        self.assertEqual(sorted(self.sink.received), ["a@example.com", "b@example.com"])
+        # A refused recipient does not cost the session
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_stale_session_is_retried_once_on_a_fresh_one(self):
+        mailer.prewarm_smtp()
+        stale, _ = self.pool._idle.queue[0]
+        stale.close()  # as if the server had dropped the idle connection
+
+        [result] = mailer.send_messages(self._messages("a@example.com"))
+
+        self.assertEqual((result["status"], result["attempts"]), ("sent", 2))
+        self.assertEqual(self.sink.received, ["a@example.com"])
+        self.assertEqual(self.connect.call_count, 2)
+
+    def test_gives_up_after_one_retry(self):
+        with mock.patch.object(smtplib.SMTP, "sendmail", side_effect=smtplib.SMTPServerDisconnected("gone")):
+            [result] = mailer.send_messages(self._messages("a@example.com"))
+
+        self.assertEqual((result["status"], result["attempts"]), ("failed", 2))
+        self.assertEqual(result["error"], "disconnected: gone")
+        self.assertEqual(self.sink.received, [])
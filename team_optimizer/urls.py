@@ -1,9 +1,20 @@
 from django.urls import path
 from .views import *
 from .langgraph_flow import *
+from .jobs import ASYNC_PIPELINE
 
 urlpatterns = [
-    path('generate-draft/', generate_mou_view),
+    path('generate-draft/', generate_mou_async_view if ASYNC_PIPELINE else generate_mou_view),
+    path('generate-draft/bulk/', generate_mou_bulk_async_view if ASYNC_PIPELINE else generate_mou_bulk_view),
+    path('generate-draft/stream/', generate_mou_stream_async_view if ASYNC_PIPELINE else generate_mou_stream_view),
+    path('jobs/<str:job_id>/', job_status_view),
+    path('jobs/<str:job_id>/result/', job_result_view),
+    path('jobs/<str:job_id>/trace/', job_trace_view),
+    path('drafts/<str:draft_id>/pdf/', draft_pdf_view),
+    path('companies/<str:company_name>/versions/', version_history_view),
+    path('companies/<str:company_name>/versions/<str:version>/', version_text_view),
+    path('companies/<str:company_name>/diff/', version_diff_view),
     path('approvals/', get_approvals),
-    path('update-approval/', update_approval),  # ✅ Add this
+    path('update-approval/', update_approval_async if ASYNC_PIPELINE else update_approval),  # ✅ Add this
+    path('metrics/', metrics_view),
 ]
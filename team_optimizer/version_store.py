@@ -0,0 +1,402 @@
+#version_store.py
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from difflib import SequenceMatcher, unified_diff
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError
+
+from . import repository
+from .mongo import get_db
+from .pdf_artifacts import draft_hash
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 1. CONFIGURATION
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Each company's MoU history lives in `MoUVersions` as a chain of line deltas
+# against the previous version, with a full snapshot every SNAPSHOT_EVERY
+# versions (or whenever the delta would not be much smaller than the text).
+# Storage grows with the size of the edits, and rebuilding any version replays
+# at most SNAPSHOT_EVERY deltas.
+
+SNAPSHOT_EVERY = int(os.getenv("MOU_VERSION_SNAPSHOT_EVERY", "10"))
+TEXT_CACHE_ITEMS = int(os.getenv("MOU_VERSION_TEXT_CACHE_ITEMS", "64"))
+
+
+def versions_collection():
+    return get_db()["MoUVersions"]
+
+
+_indexes_ready = False
+
+
+def ensure_indexes():
+    global _indexes_ready
+    if not _indexes_ready:
+        versions_collection().create_index([("company_name", ASCENDING), ("seq", DESCENDING)], unique=True)
+        _indexes_ready = True
+
+
+def _seq(version: str) -> int:
+    return int(str(version).lstrip("v"))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 2. DELTAS
+# ──────────────────────────────────────────────────────────────────────────────
+
+def make_delta(base: str, text: str) -> list:
+    """
+    Line-level delta turning `base` into `text`: a list of
+    {"c": [start, end]} (copy base lines) and {"i": [lines]} (insert) ops.
+    """
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops = []
+    matcher = SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append({"c": [i1, i2]})
+        elif j2 > j1:  # replace / insert; a delete is just the absence of a copy
+            ops.append({"i": lines[j1:j2]})
+    return ops
+
+
+def apply_delta(base: str, ops: list) -> str:
+    base_lines = base.splitlines(keepends=True)
+    out = []
+    for op in ops:
+        if "c" in op:
+            start, end = op["c"]
+            out.extend(base_lines[start:end])
+        else:
+            out.extend(op["i"])
+    return "".join(out)
+
+
+def _delta_size(ops: list) -> int:
+    return sum(16 if "c" in op else sum(len(line) for line in op["i"]) for op in ops)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 3. READ
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Versions never change once written, so rebuilt texts can be cached freely
+_texts = OrderedDict()
+_texts_lock = threading.Lock()
+
+
+def _cache_text(key, text):
+    with _texts_lock:
+        _texts[key] = text
+        _texts.move_to_end(key)
+        while len(_texts) > TEXT_CACHE_ITEMS:
+            _texts.popitem(last=False)
+
+
+def _cached_text(key):
+    with _texts_lock:
+        text = _texts.get(key)
+        if text is not None:
+            _texts.move_to_end(key)
+        return text
+
+
+def find_version(company_name: str, version: str, projection: dict = None):
+    try:
+        seq = _seq(version)
+    except ValueError:
+        return None
+    import_legacy_drafts(company_name)
+    return versions_collection().find_one({"company_name": company_name, "seq": seq}, projection)
+
+
+def find_version_by_id(draft_id: str, projection: dict = None):
+    try:
+        oid = ObjectId(draft_id)
+    except (InvalidId, TypeError):
+        return None
+    return versions_collection().find_one({"_id": oid}, projection)
+
+
+def version_text(doc: dict) -> str:
+    """Rebuilds a version's full text by replaying deltas from its nearest snapshot."""
+    company = doc["company_name"]
+    chain = []
+    text = None
+    while text is None:
+        key = (company, doc["seq"])
+        text = _cached_text(key)
+        if text is not None:
+            break
+        if doc.get("kind") == "snapshot":
+            text = doc["text"]
+            _cache_text(key, text)
+            break
+        chain.append(doc)
+        doc = versions_collection().find_one({"company_name": company, "seq": doc["base_seq"]})
+        if doc is None:
+            raise LookupError(f"Broken version chain for {company}: missing v{chain[-1]['base_seq']}")
+
+    for delta_doc in reversed(chain):
+        text = apply_delta(text, delta_doc["delta"])
+        _cache_text((company, delta_doc["seq"]), text)
+    return text
+
+
+def get_version_text(company_name: str, version: str):
+    doc = find_version(company_name, version)
+    return None if doc is None else version_text(doc)
+
+
+def list_versions(company_name: str) -> list:
+    """History metadata, oldest first (no texts or deltas)."""
+    import_legacy_drafts(company_name)
+    docs = versions_collection().find(
+        {"company_name": company_name},
+        {"text": 0, "delta": 0}
+    ).sort("seq", ASCENDING)
+    return [
+        {
+            "draft_id": str(doc["_id"]),
+            "version": doc["version"],
+            "type": doc.get("type", ""),
+            "kind": doc["kind"],
+            "stored_bytes": doc.get("stored_bytes"),
+            "text_bytes": doc.get("text_bytes"),
+            "created_at": doc["created_at"].isoformat(),
+        }
+        for doc in docs
+    ]
+
+
+def diff_texts(prev_text: str, curr_text: str, prev_label="Previous Draft", curr_label="Current Draft") -> str:
+    return "\n".join(unified_diff(
+        prev_text.splitlines(),
+        curr_text.splitlines(),
+        fromfile=prev_label,
+        tofile=curr_label,
+        lineterm=''
+    ))
+
+
+def diff_versions(company_name: str, from_version: str, to_version: str):
+    """Unified diff between two stored versions, or None if either is missing."""
+    from_text = get_version_text(company_name, from_version)
+    to_text = get_version_text(company_name, to_version)
+    if from_text is None or to_text is None:
+        return None
+    return diff_texts(from_text, to_text, from_version, to_version)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 4. WRITE
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _version_doc(company_name: str, text: str, partnership_type: str, version: str,
+                 previous: dict, previous_text: str = None) -> dict:
+    """The document for a new version: a delta against `previous`, or a snapshot."""
+    doc = {
+        "company_name": company_name,
+        "seq": _seq(version),
+        "version": version,
+        "type": partnership_type,
+        "draft_sha256": draft_hash(text),
+        "text_bytes": len(text.encode("utf-8")),
+        "created_at": datetime.now(timezone.utc),
+    }
+
+    delta = None
+    if previous is not None and previous.get("chain_length", 0) + 1 < SNAPSHOT_EVERY:
+        base = previous_text if previous_text is not None else version_text(previous)
+        delta = make_delta(base, text)
+        if 2 * _delta_size(delta) >= len(text):
+            delta = None  # mostly rewritten: a snapshot is as small and faster to read
+
+    if delta is None:
+        doc.update(kind="snapshot", text=text, chain_length=0, stored_bytes=doc["text_bytes"])
+    else:
+        doc.update(
+            kind="delta",
+            base_seq=previous["seq"],
+            delta=delta,
+            chain_length=previous.get("chain_length", 0) + 1,
+            stored_bytes=_delta_size(delta),
+        )
+    return doc
+
+
+def _saved(draft_id, doc: dict, previous: dict, unchanged: bool = False) -> dict:
+    return {
+        "draft_id": str(draft_id),
+        "version": doc["version"],
+        "seq": doc["seq"],
+        "kind": doc["kind"],
+        "unchanged": unchanged,
+        "previous": None if previous is None else {
+            key: previous.get(key) for key in ("seq", "version", "type", "draft_sha256")
+        },
+    }
+
+
+def _latest_before(company_name: str, seq: int):
+    return versions_collection().find_one(
+        {"company_name": company_name, "seq": {"$lt": seq}},
+        sort=[("seq", DESCENDING)]
+    )
+
+
+def _latest(company_name: str):
+    import_legacy_drafts(company_name)
+    return versions_collection().find_one({"company_name": company_name}, sort=[("seq", DESCENDING)])
+
+
+def _same_version(doc: dict, text_sha256: str, partnership_type: str) -> bool:
+    return doc is not None and doc.get("draft_sha256") == text_sha256 and doc.get("type") == partnership_type
+
+
+def save_version(company_name: str, text: str, partnership_type: str) -> dict:
+    """
+    Stores a new version (allocating its number) as a delta against the latest
+    stored one, or as a snapshot. Returns {"draft_id", "version", "seq", "kind",
+    "unchanged", "previous"} where `previous` is the prior version's metadata,
+    or None. Resubmitting the latest version's text and type stores nothing:
+    that version is returned with unchanged=True (and as its own `previous`).
+    """
+    ensure_indexes()
+    latest = _latest(company_name)
+    if _same_version(latest, draft_hash(text), partnership_type):
+        print(f"🗂️ {company_name} {latest['version']} unchanged, nothing stored")
+        return _saved(latest["_id"], latest, latest, unchanged=True)
+
+    version = repository.next_draft_version(company_name)
+    previous = _latest_before(company_name, _seq(version))
+    doc = _version_doc(company_name, text, partnership_type, version, previous)
+
+    inserted = versions_collection().insert_one(doc)
+    _cache_text((company_name, doc["seq"]), text)
+    print(f"🗂️ Stored {company_name} {version} as {doc['kind']} ({doc['stored_bytes']} of {doc['text_bytes']} bytes)")
+    return _saved(inserted.inserted_id, doc, previous)
+
+
+def save_versions(drafts: list) -> list:
+    """
+    save_version for a batch of (company_name, text, partnership_type): one
+    counter update per company and a single insert_many. Drafts of the same
+    company are chained in batch order, and one that repeats the version
+    before it is not stored again. Returns one save_version result per draft.
+    """
+    ensure_indexes()
+    by_company = {}
+    for i, (company_name, _text, _type) in enumerate(drafts):
+        by_company.setdefault(company_name, []).append(i)
+
+    docs = []
+    # Per draft: (stored doc, its previous, unchanged). insert_many sets each
+    # new doc's _id in place, so results are built after the insert
+    outcomes = [None] * len(drafts)
+    for company_name, members in by_company.items():
+        latest = _latest(company_name)
+        current = None if latest is None else (latest["draft_sha256"], latest.get("type"))
+        plan = []
+        for i in members:
+            _company, text, partnership_type = drafts[i]
+            key = (draft_hash(text), partnership_type)
+            plan.append((i, key != current))
+            current = key
+
+        fresh = sum(is_new for _i, is_new in plan)
+        versions = iter(repository.reserve_draft_versions(company_name, fresh) if fresh else [])
+        previous, previous_text, first = latest, None, True
+        for i, is_new in plan:
+            _company, text, partnership_type = drafts[i]
+            if not is_new:
+                outcomes[i] = (previous, previous, True)
+                continue
+            version = next(versions)
+            if first:
+                previous, first = _latest_before(company_name, _seq(version)), False
+            doc = _version_doc(company_name, text, partnership_type, version, previous, previous_text)
+            docs.append(doc)
+            outcomes[i] = (doc, previous, False)
+            previous, previous_text = doc, text
+
+    if docs:
+        versions_collection().insert_many(docs)
+    for (doc, _previous, unchanged), (company_name, text, _type) in zip(outcomes, drafts):
+        if not unchanged:
+            _cache_text((company_name, doc["seq"]), text)
+    print(f"🗂️ Stored {len(docs)} versions for {len(by_company)} companies "
+          f"({len(drafts) - len(docs)} unchanged)")
+    return [_saved(doc["_id"], doc, previous, unchanged) for doc, previous, unchanged in outcomes]
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# 5. LEGACY DRAFTS
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Drafts saved before the version store are full texts in `MoUDrafts`, and the
+# version counter continues from them. A company's legacy drafts are imported
+# as snapshots the first time its history is read or extended, so new versions
+# are diffed against them and history / diff endpoints see them. Run
+# `python manage.py import_legacy_drafts` to import every company up front.
+
+_legacy_checked = set()
+
+
+def import_legacy_drafts(company_name: str) -> int:
+    """
+    Copies the company's MoUDrafts into MoUVersions as snapshots, unless it
+    already has versions there. Returns the number of versions imported.
+    """
+    if company_name in _legacy_checked:
+        return 0
+    ensure_indexes()
+
+    docs = []
+    if versions_collection().find_one({"company_name": company_name}, {"_id": 1}) is None:
+        seen = set()
+        # Newest first: the old version controller could save a label twice
+        legacy_drafts = repository.drafts_collection().find(
+            {"company_name": company_name}, {"draft": 1, "type": 1, "version": 1}
+        ).sort("_id", DESCENDING)
+        for legacy in legacy_drafts:
+            try:
+                seq = _seq(legacy.get("version"))
+            except ValueError:
+                continue
+            if seq <= 0 or seq in seen:
+                continue
+            seen.add(seq)
+            text = legacy.get("draft", "")
+            text_bytes = len(text.encode("utf-8"))
+            docs.append({
+                "company_name": company_name,
+                "seq": seq,
+                "version": f"v{seq}",
+                "type": legacy.get("type", ""),
+                "draft_sha256": draft_hash(text),
+                "text_bytes": text_bytes,
+                "created_at": legacy["_id"].generation_time,
+                "kind": "snapshot",
+                "text": text,
+                "chain_length": 0,
+                "stored_bytes": text_bytes,
+                "legacy_draft_id": legacy["_id"],
+            })
+
+    if docs:
+        try:
+            versions_collection().insert_many(sorted(docs, key=lambda doc: doc["seq"]), ordered=False)
+        except BulkWriteError:
+            pass  # another worker imported (some of) them first: the unique index keeps one of each
+        print(f"🗂️ Imported {len(docs)} legacy drafts of {company_name}")
+    _legacy_checked.add(company_name)
+    return len(docs)
@@ -1,10 +1,18 @@
 #views.py
 
 import json
+import queue
+import asyncio
 import traceback
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from .langgraph_flow import build_graph
+from . import repository
+from .jobs import submit_job, asubmit_job, get_job, get_job_result
+from .metrics import registry
+from .instrumentation import TRACE_ENABLED, get_trace
+from . import version_store
+from .pdf_artifacts import draft_hash, get_or_render
+from .bulk import generate_bulk, BULK_MAX_ITEMS
 
 
 @csrf_exempt
@@ -12,23 +20,296 @@ def generate_mou_view(request):
     if request.method == "POST":
         try:
             data = json.loads(request.body)
-            graph = build_graph()
-            result = graph.invoke(data)
 
-            # Return both draft_text and the list of {clause_id,text}
+            # The pipeline can wait on approvals for hours, so it runs as a job
+            job_id = submit_job(data)
+
             return JsonResponse({
-                "result": {
-                    "draft_text": result.get("draft_text", ""),
-                    "retrieved_clauses": result.get("retrieved_clauses", []),
-                    "emails_sent": result.get("emails_sent", []),
-                    "approval_status": result.get("approval_status", {}), 
-                    "overall_mou_status": result.get("overall_mou_status", ""),
-                    "version_number": result.get("version_number", ""),
-                    "version_diff": result.get("version_diff", "")
-                }
-            })
+                "job_id": job_id,
+                "status": "queued",
+                "status_url": f"/api/jobs/{job_id}/",
+                "result_url": f"/api/jobs/{job_id}/result/"
+            }, status=202)
 
         except Exception as e:
             traceback.print_exc()
             return JsonResponse({"error": str(e)}, status=500)
 
+    return JsonResponse({"error": "Invalid request method"}, status=405)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@csrf_exempt
+def generate_mou_stream_view(request):
+    """
+    Same job as generate_mou_view, but the response is a server-sent event
+    stream: `job`, then `token` events while the draft is written, `node`
+    events as each agent finishes, and finally `done`, `error` or `waiting`
+    (the run is parked until approvals arrive; poll the job for the rest).
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    events = queue.Queue()
+    job_id = submit_job(data, listener=events.put)
+
+    def event_stream():
+        yield _sse("job", {"job_id": job_id, "status_url": f"/api/jobs/{job_id}/"})
+        while True:
+            try:
+                event = events.get(timeout=15)
+            except queue.Empty:
+                yield ": keep-alive\n\n"  # stops proxies from closing an idle stream
+                continue
+
+            kind = event.pop("event")
+            yield _sse(kind, event)
+            if kind in ("done", "error", "waiting"):
+                return
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+def _bulk_items(request):
+    """The bulk request's items, or a JsonResponse explaining why there are none."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"error": "'items' must be a non-empty list"}, status=400)
+    if len(items) > BULK_MAX_ITEMS:
+        return JsonResponse({"error": f"At most {BULK_MAX_ITEMS} items per request"}, status=400)
+    return items
+
+
+def _ndjson_response(lines) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(lines, content_type="application/x-ndjson")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@csrf_exempt
+def generate_mou_bulk_view(request):
+    """
+    Drafts many MoUs in one request: {"items": [<generate-draft payload>, ...]}.
+    The response is NDJSON, one line per item as it completes, each carrying
+    the item's `index` in the request.
+    """
+    items = _bulk_items(request)
+    if isinstance(items, JsonResponse):
+        return items
+
+    def lines():
+        for result in generate_bulk(items):
+            yield json.dumps(result, default=str) + "\n"
+
+    return _ndjson_response(lines())
+
+
+# ── Async pipeline (MOU_ASYNC_PIPELINE=1, served by an ASGI server) ──────────
+# The job runs as a task on the server's event loop and the SSE stream awaits
+# its events, so neither occupies a thread while waiting on the LLM, Mongo or SMTP.
+
+@csrf_exempt
+async def generate_mou_async_view(request):
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        job_id = await asubmit_job(data)
+
+        return JsonResponse({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/api/jobs/{job_id}/",
+            "result_url": f"/api/jobs/{job_id}/result/"
+        }, status=202)
+
+    except Exception as e:
+        traceback.print_exc()
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+async def generate_mou_stream_async_view(request):
+    """generate_mou_stream_view for the async pipeline (same events)."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Invalid request method"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Events are emitted by the job task on this same loop
+    events = asyncio.Queue()
+    job_id = await asubmit_job(data, listener=events.put_nowait)
+
+    async def event_stream():
+        yield _sse("job", {"job_id": job_id, "status_url": f"/api/jobs/{job_id}/"})
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), timeout=15)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            kind = event.pop("event")
+            yield _sse(kind, event)
+            if kind in ("done", "error", "waiting"):
+                return
+
+    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@csrf_exempt
+async def generate_mou_bulk_async_view(request):
+    """
+    generate_mou_bulk_view for the async pipeline. ASGI only streams async
+    iterators (a sync one is buffered whole), so each result is awaited
+    from generate_bulk on a worker thread.
+    """
+    items = _bulk_items(request)
+    if isinstance(items, JsonResponse):
+        return items
+
+    results = generate_bulk(items)
+
+    async def lines():
+        try:
+            while (result := await asyncio.to_thread(next, results, None)) is not None:
+                yield json.dumps(result, default=str) + "\n"
+        finally:
+            # Cancels queued drafts if the client went away
+            await asyncio.to_thread(results.close)
+
+    return _ndjson_response(lines())
+
+
+def job_status_view(request, job_id):
+    job = get_job(job_id)
+    if job is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    return JsonResponse(job)
+
+
+def job_result_view(request, job_id):
+    job = get_job_result(job_id)
+    if job is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    if job["status"] == "failed":
+        return JsonResponse({"status": job["status"], "error": job.get("error", "")}, status=500)
+
+    if job["status"] != "succeeded":
+        # Not finished yet: tell the client where the pipeline currently is
+        return JsonResponse({
+            "status": job["status"],
+            "current_node": job.get("current_node")
+        }, status=202)
+
+    # Return both draft_text and the list of {clause_id,text}
+    return JsonResponse({"status": job["status"], "result": job["result"]})
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def draft_pdf_view(request, draft_id):
+    """Streams a draft's PDF, rendering it on the first download."""
+    if request.method not in ("GET", "HEAD"):
+        return JsonResponse({"error": "Invalid request method"}, status=405)
+
+    projection = {"draft_sha256": 1, "company_name": 1, "version": 1}
+    doc = version_store.find_version_by_id(draft_id, projection)
+    if doc is not None:
+        def load_text():
+            return version_store.version_text(version_store.find_version_by_id(draft_id))
+    else:
+        # Full-text drafts saved before the version store
+        doc = repository.find_draft(draft_id, projection)
+        if doc is None:
+            return JsonResponse({"error": "Draft not found"}, status=404)
+
+        def load_text():
+            return repository.find_draft(draft_id, {"draft": 1}).get("draft", "")
+
+    digest = doc.get("draft_sha256") or draft_hash(load_text())
+
+    # A draft's text never changes, so its hash is a strong validator
+    etag = f'"{digest}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if _etag_matches(request.headers.get("If-None-Match", ""), etag):
+        return HttpResponse(status=304, headers=headers)
+
+    path = get_or_render(digest, load_text)
+    filename = f"MoU_{doc.get('company_name', 'draft')}_{doc.get('version', '')}.pdf".replace(" ", "_")
+    response = FileResponse(open(path, "rb"), content_type="application/pdf", as_attachment=True, filename=filename)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def version_history_view(request, company_name):
+    """Every stored version of a company's MoU, oldest first."""
+    return JsonResponse({"company_name": company_name, "versions": version_store.list_versions(company_name)})
+
+
+def version_text_view(request, company_name, version):
+    text = version_store.get_version_text(company_name, version)
+    if text is None:
+        return JsonResponse({"error": "Version not found"}, status=404)
+    return JsonResponse({"company_name": company_name, "version": version, "text": text})
+
+
+def version_diff_view(request, company_name):
+    """Unified diff between ?from=vN and ?to=vM."""
+    from_version = request.GET.get("from")
+    to_version = request.GET.get("to")
+    if not from_version or not to_version:
+        return JsonResponse({"error": "Both 'from' and 'to' are required"}, status=400)
+
+    diff = version_store.diff_versions(company_name, from_version, to_version)
+    if diff is None:
+        return JsonResponse({"error": "Version not found"}, status=404)
+    return JsonResponse({"company_name": company_name, "from": from_version, "to": to_version, "diff": diff})
+
+
+def metrics_view(request):
+    # Node / LLM / embedding / Chroma / SMTP / Mongo metrics for this process;
+    # ?format=prometheus returns the text format for scraping
+    if request.GET.get("format") == "prometheus":
+        return HttpResponse(registry.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+    return JsonResponse({"metrics": registry.snapshot()})
+
+
+def job_trace_view(request, job_id):
+    # Spans are recorded only with MOU_TRACE=1
+    if get_job(job_id) is None:
+        return JsonResponse({"error": "Job not found"}, status=404)
+    return JsonResponse({"job_id": job_id, "tracing": TRACE_ENABLED, "spans": get_trace(job_id)})